@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import weakref
+from itertools import islice
+from urllib.parse import parse_qsl
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from rest_framework.utils.encoders import JSONEncoder
+from . import feed
+
+logger = logging.getLogger(__name__)
+
+FEED_PATH = "/api/flight/changes/stream/"
+
+
+class Broadcaster:
+    """
+    Polls the flight change log once for every subscriber of the process and
+    hands each change to the queues of the subscribers it matches, so an idle
+    subscriber costs a queue and a suspended coroutine instead of a thread.
+    """
+
+    def __init__(self):
+        self.subscribers = {}  # queue -> subscription
+        self.ready = asyncio.Event()
+        self.task = None
+
+    async def subscribe(self, subscription):
+        queue = asyncio.Queue()
+        self.subscribers[queue] = subscription
+        if self.task is None or self.task.done():
+            self.ready.clear()
+            self.task = asyncio.ensure_future(self.run())
+        # changes committed from now on reach the queue
+        await self.ready.wait()
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+
+    async def run(self):
+        reader = None
+        while self.subscribers:
+            try:
+                if reader is None:
+                    reader = await sync_to_async(feed.ChangeReader)()
+                    self.ready.set()
+                changes = await sync_to_async(reader.read)()
+            except DatabaseError:
+                logger.exception("Reading the flight change log failed")
+                await sync_to_async(connections.close_all)()
+                changes = []
+            for change in changes:
+                for queue, subscription in list(self.subscribers.items()):
+                    if not subscription.matches(change):
+                        continue
+                    if queue.qsize() >= settings.FEED_QUEUE_SIZE:
+                        # too slow, it resumes from its cursor on reconnection
+                        self.unsubscribe(queue)
+                        queue.put_nowait(None)
+                    else:
+                        queue.put_nowait(change)
+            if len(changes) < settings.FEED_BATCH_SIZE:
+                await asyncio.sleep(settings.FEED_POLL_INTERVAL)
+
+
+broadcasters = weakref.WeakKeyDictionary()  # event loop -> Broadcaster
+
+
+def get_broadcaster():
+    loop = asyncio.get_running_loop()
+    if loop not in broadcasters:
+        broadcasters[loop] = Broadcaster()
+    return broadcasters[loop]
+
+
+async def wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def respond(send, status: int, body: dict):
+    content = JSONEncoder().encode(body).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": content})
+
+
+async def change_feed(scope, receive, send):
+    """ASGI app streaming the flight change log as Server-Sent Events."""
+    headers = {key.decode().lower(): value.decode() for key, value in scope["headers"]}
+    params = dict(parse_qsl(scope["query_string"].decode()))
+    try:
+        await sync_to_async(feed.authenticate)(
+            headers.get("authorization"), params.get("token")
+        )
+        subscription = await sync_to_async(feed.Subscription.from_params)(
+            params, headers.get("last-event-id")
+        )
+    except feed.FeedError as e:
+        await respond(send, e.status, {"status": False, "message": str(e)})
+        return
+    broadcaster = get_broadcaster()
+    queue = await broadcaster.subscribe(subscription)
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    get = None
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        sent = set()
+        backlog = subscription.backlog()
+        while True:
+            changes = await sync_to_async(list)(
+                islice(backlog, settings.FEED_BATCH_SIZE)
+            )
+            if not changes:
+                break
+            sent.update(change.id for change in changes)
+            body = b"".join(feed.event(change) for change in changes)
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+        while True:
+            get = get or asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {get, disconnected},
+                timeout=settings.FEED_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                return
+            if get not in done:
+                body = feed.HEARTBEAT
+            else:
+                change, get = get.result(), None
+                if change is None:
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+                if change.id in sent:
+                    continue
+                body = feed.event(change)
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        broadcaster.unsubscribe(queue)
+        disconnected.cancel()
+        if get is not None:
+            get.cancel()
+
+
+class FeedRouter:
+    """Serves the change feed path with `change_feed` and the rest with Django."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == FEED_PATH:
+            await change_feed(scope, receive, send)
+        else:
+            await self.application(scope, receive, send)
@@ -0,0 +1,322 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user, get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    MethodNotAllowed,
+    NotAuthenticated,
+    PermissionDenied,
+)
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from . import fastpath, schedules, stats
+from .authentication import StatelessJWTAuthentication
+from .fieldsets import Fieldset, InvalidFieldset
+from .models import Aircraft, Airport, Flight
+from .pagination import FlightPagination, InvalidCursor, KeysetPagination
+from .renderers import FastJSONRenderer
+from .serializers import (
+    AirCraftSerializer,
+    AirportSerializer,
+    DepartureFlightSerializer,
+    DepartureSearchSerializer,
+    FlightListSerializer,
+)
+from .utils import parse_interval
+from .views import (
+    aircraft_resource,
+    airport_resource,
+    flight_resource,
+    departures_resource,
+    flight_search_filter,
+    flights_resource,
+    pending_departures,
+)
+
+# Async versions of the read-only endpoints of views.py, served when
+# ASYNC_VIEWS is set under an ASGI server: a request waiting on the database
+# suspends a coroutine instead of holding one of the worker's threads.
+
+
+def render(data, status_code: int = status.HTTP_200_OK):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status_code,
+        content_type="application/json",
+    )
+
+
+def exception_response(request, exc: APIException):
+    """Response of DRF's default exception handler for `exc`."""
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {"detail": exc.detail}
+    response = render(data, exc.status_code)
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        auth = StatelessJWTAuthentication()
+        response["WWW-Authenticate"] = auth.authenticate_header(request)
+    return response
+
+
+async def authenticate(request):
+    """
+    User of the bearer JWT of `request` or else of its session, like the
+    DEFAULT_AUTHENTICATION_CLASSES. None for anonymous requests.
+    """
+    auth = StatelessJWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header is not None else None
+    if raw is None:
+        if not hasattr(request, "session"):
+            return None
+        user = await sync_to_async(get_user)(request)
+        return user if user.is_authenticated and user.is_active else None
+    token = auth.get_validated_token(raw)
+    if "role" in token:
+        return await auth.aget_user(token)
+    try:
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+    try:
+        user = await get_user_model().objects.aget(
+            **{api_settings.USER_ID_FIELD: user_id}
+        )
+    except get_user_model().DoesNotExist:
+        raise AuthenticationFailed("User not found", code="user_not_found")
+    if not user.is_active:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+    return user
+
+
+def read_view(*roles):
+    """
+    Async counterpart of `@api_view(["GET"])`, restricted to the users of
+    `roles` when given like `IsUser | IsAdmin`.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            try:
+                if request.method not in ("GET", "HEAD"):
+                    raise MethodNotAllowed(request.method)
+                user = await authenticate(request)
+                if roles and user is None:
+                    raise NotAuthenticated()
+                if roles and user.role not in roles:
+                    raise PermissionDenied()
+            except APIException as e:
+                return exception_response(request, e)
+            return await view(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+def reads(async_view, sync_view):
+    """
+    View sending GET and HEAD requests to `async_view` and the writes to the
+    DRF `sync_view`.
+    """
+
+    async def view(request, *args, **kwargs):
+        if request.method in ("GET", "HEAD"):
+            return await async_view(request, *args, **kwargs)
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
+
+
+def bad_request(message: str):
+    return render({"status": False, "message": message}, status.HTTP_400_BAD_REQUEST)
+
+
+async def page(request, pagination, queryset, serialize):
+    try:
+        rows = await pagination.apaginate_queryset(queryset, request)
+    except InvalidCursor as e:
+        return bad_request(str(e))
+    return render(pagination.get_paginated_data(serialize(rows)))
+
+
+@read_view("user", "admin")
+@aircraft_resource.asynchronous
+async def aircraft(request, uid: str = None):
+    try:
+        fieldset = Fieldset.from_params(request.GET, AirCraftSerializer)
+    except InvalidFieldset as e:
+        return bad_request(str(e))
+    queryset = fieldset.queryset(
+        Aircraft.objects.all(), AirCraftSerializer, *KeysetPagination.ordering
+    )
+    if not uid:
+        return await page(
+            request,
+            KeysetPagination(),
+            queryset,
+            lambda rows: fieldset.serializer(AirCraftSerializer, rows, many=True).data,
+        )
+    try:
+        obj = await queryset.aget(uid=uid)
+    except (Aircraft.DoesNotExist, ValidationError):
+        return render(
+            {"status": False, "message": "Aircraft Not Found."},
+            status.HTTP_404_NOT_FOUND,
+        )
+    ser = fieldset.serializer(AirCraftSerializer, obj)
+    return render({"status": True, "data": ser.data})
+
+
+@read_view("user", "admin")
+@airport_resource.asynchronous
+async def airport(request, uid: str = None):
+    try:
+        fieldset = Fieldset.from_params(request.GET, AirportSerializer)
+    except InvalidFieldset as e:
+        return bad_request(str(e))
+    queryset = fieldset.queryset(
+        Airport.objects.select_related("location"),
+        AirportSerializer,
+        *KeysetPagination.ordering,
+    )
+    if not uid:
+        return await page(
+            request,
+            KeysetPagination(),
+            queryset,
+            lambda rows: fieldset.serializer(AirportSerializer, rows, many=True).data,
+        )
+    try:
+        obj = await queryset.aget(uid=uid)
+    except (Airport.DoesNotExist, ValidationError):
+        return render(
+            {"status": False, "message": "Aircraft Not Found."},
+            status.HTTP_404_NOT_FOUND,
+        )
+    ser = fieldset.serializer(AirportSerializer, obj)
+    return render({"status": True, "data": ser.data})
+
+
+@read_view("user", "admin")
+@flight_resource.asynchronous
+async def flight(request, uid: str = None):
+    try:
+        fieldset = Fieldset.from_params(request.GET, FlightListSerializer)
+    except InvalidFieldset as e:
+        return bad_request(str(e))
+    if not uid and settings.FAST_READ_PATH:
+        serializer = fastpath.flight_list.narrow(fieldset)
+        return await page(
+            request,
+            FlightPagination(),
+            serializer.values(Flight.objects.all(), *FlightPagination.ordering),
+            serializer.many,
+        )
+    queryset = fieldset.queryset(
+        Flight.objects.with_related(),
+        FlightListSerializer,
+        *FlightPagination.ordering,
+    )
+    if not uid:
+        return await page(
+            request,
+            FlightPagination(),
+            queryset,
+            lambda rows: fieldset.serializer(
+                FlightListSerializer, rows, many=True
+            ).data,
+        )
+    try:
+        obj = await queryset.aget(uid=uid)
+    except (Flight.DoesNotExist, ValidationError):
+        return render(
+            {"status": False, "message": "Aircraft Not Found."},
+            status.HTTP_404_NOT_FOUND,
+        )
+    ser = fieldset.serializer(FlightListSerializer, obj)
+    return render({"status": True, "data": ser.data})
+
+
+@read_view()
+@flights_resource.asynchronous
+async def flight_search(request):
+    try:
+        query = flight_search_filter(request.GET)
+        fieldset = Fieldset.from_params(request.GET, FlightListSerializer)
+    except InvalidFieldset as e:
+        return bad_request(str(e))
+    except (TypeError, ValueError):
+        return render(
+            {"status": False, "message": "Invalid time range"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    if query is None:
+        return render(
+            {"status": False, "message": "No seach Parameters Entered"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    flights = Flight.objects.with_related().filter(query)
+    if settings.FAST_READ_PATH:
+        serializer = fastpath.flight_list.narrow(fieldset)
+        rows = [row async for row in serializer.values(flights)]
+        return render({"status": True, "data": serializer.many(rows)})
+    flights = fieldset.queryset(flights, FlightListSerializer)
+    flights = [flight async for flight in flights]
+    ser = fieldset.serializer(FlightListSerializer, flights, many=True)
+    return render({"status": True, "data": ser.data})
+
+
+@read_view()
+@departures_resource.asynchronous
+async def departure_search(request):
+    try:
+        dept_dt, arr_dt = parse_interval(request.GET.get("interval"))
+    except (ValueError, IndexError, AttributeError):
+        return render(
+            {"status": False, "message": "Invalid interval"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    departures = await stats.adeparture_totals(dept_dt, arr_dt)
+    departures = await sync_to_async(schedules.departure_totals)(
+        departures, dept_dt, arr_dt
+    )
+    ser = DepartureSearchSerializer(departures, many=True)
+    return render({"status": True, "data": ser.data})
+
+
+@read_view()
+@departures_resource.asynchronous
+async def departure_flights(request, uid: str):
+    try:
+        dept_dt, arr_dt = parse_interval(request.GET.get("interval"))
+    except (ValueError, IndexError, AttributeError):
+        return render(
+            {"status": False, "message": "Invalid interval"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    query = (
+        Q(departure_dt__gte=dept_dt) & Q(arrival_dt__lte=arr_dt) & Q(departure__uid=uid)
+    )
+    flights = Flight.objects.select_related("aircraft").filter(query)
+    try:
+        pending = await sync_to_async(pending_departures)(uid, dept_dt, arr_dt)
+    except ValueError:
+        pending = []
+    if settings.FAST_READ_PATH:
+        rows = [row async for row in fastpath.departure_flight.values(flights)]
+        data = fastpath.departure_flight.many(rows)
+    else:
+        flights = [flight async for flight in flights]
+        data = DepartureFlightSerializer(flights, many=True).data
+    data += DepartureFlightSerializer(pending, many=True).data
+    return render({"status": True, "data": data})
@@ -0,0 +1,101 @@
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser as BaseTokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .cache import LRUCache
+from .models import User
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair carrying the role of the user, refreshed access tokens copy it."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["role"] = user.role
+        return token
+
+
+class TokenUser(BaseTokenUser):
+    """User of a validated token, with the role of its `role` claim."""
+
+    @property
+    def role(self):
+        return self.token["role"]
+
+
+class UserStates:
+    """
+    (is_active, role) of users by uid, cached per process for AUTH_STATE_TTL
+    seconds. Saving or deleting a user drops its entry in the process doing
+    it, the other processes see the change within the TTL.
+    """
+
+    # state of the uids without a user
+    MISSING = (False, None)
+
+    def __init__(self):
+        self.local = LRUCache(settings.AUTH_STATE_CACHE_SIZE, settings.AUTH_STATE_TTL)
+
+    def queryset(self, uid):
+        return User.objects.filter(uid=uid).values_list("is_active", "role")
+
+    def get(self, uid: str):
+        state = self.local.get(uid)
+        if state is None:
+            state = self.queryset(uid).first() or self.MISSING
+            self.local.set(uid, state)
+        return state
+
+    async def aget(self, uid: str):
+        state = self.local.get(uid)
+        if state is None:
+            state = await self.queryset(uid).afirst() or self.MISSING
+            self.local.set(uid, state)
+        return state
+
+    def invalidate(self, uid):
+        self.local.delete(str(uid))
+
+
+user_states = UserStates()
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication trusting the `role` claim instead of loading the user:
+    the request user is a TokenUser, so permission checks need no query.
+
+    Tokens of deactivated or deleted users and tokens issued before a role
+    change are refused from the cached `user_states`. Tokens without a role
+    claim, issued before it was added, load the user as before.
+    """
+
+    def user_id(self, validated_token):
+        try:
+            return str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+    def check(self, validated_token, state):
+        is_active, role = state
+        if role is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if role != validated_token["role"]:
+            raise AuthenticationFailed("Token role is outdated", code="role_changed")
+        return TokenUser(validated_token)
+
+    def get_user(self, validated_token):
+        if "role" not in validated_token:
+            return super().get_user(validated_token)
+        state = user_states.get(self.user_id(validated_token))
+        return self.check(validated_token, state)
+
+    async def aget_user(self, validated_token):
+        """`get_user` of a token with a role claim, for async views."""
+        state = await user_states.aget(self.user_id(validated_token))
+        return self.check(validated_token, state)
@@ -0,0 +1,243 @@
+import re
+import string
+import unicodedata
+from bisect import bisect_left, bisect_right
+from .cache import LocalIndex
+from .models import Aircraft, Airport
+
+EXACT, PREFIX, FUZZY = "exact", "prefix", "fuzzy"
+
+# queries shorter than this are not corrected, too many terms are one edit away,
+# nor longer than the max, the number of variants grows with the length
+FUZZY_MIN_LENGTH = 3
+FUZZY_MAX_LENGTH = 24
+# characters tried by the substitutions and insertions of the fuzzy search
+FUZZY_ALPHABET = string.ascii_lowercase + string.digits
+
+NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def normalize(text: str):
+    """Lower case words without accents or punctuation, joined by one space."""
+    text = text or ""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(NON_ALNUM.split(text.casefold())).strip()
+
+
+def edits(word: str):
+    """Strings one deletion, transposition, substitution or insertion away."""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    variants = set()
+    for left, right in splits:
+        if right:
+            variants.add(left + right[1:])
+            if len(right) > 1:
+                variants.add(left + right[1] + right[0] + right[2:])
+            for char in FUZZY_ALPHABET:
+                variants.add(left + char + right[1:])
+        for char in FUZZY_ALPHABET:
+            variants.add(left + char + right)
+    variants.discard(word)
+    return variants
+
+
+class PrefixIndex:
+    """
+    Sorted terms and their keys, one pair of parallel arrays per tier,
+    searched with bisect.
+
+    A term matches a query it equals or starts with. Matches are ranked by
+    kind (exact, then prefix, then fuzzy, i.e one edit away from a prefix),
+    then by tier and then alphabetically. The search stops once `limit`
+    keys were found, the first tiers hold the terms ranked first.
+    """
+
+    def __init__(self, tiers: int, fuzzy_tiers=()):
+        self.terms = [[] for _ in range(tiers)]
+        self.keys = [[] for _ in range(tiers)]
+        self.fuzzy_tiers = fuzzy_tiers
+        self.items = {}
+        self.indexed = {}
+
+    @classmethod
+    def build(cls, tiers: int, fuzzy_tiers, entries):
+        """Index `entries`, (key, item, [(tier, term), ...]) tuples, at once."""
+        index = cls(tiers, fuzzy_tiers)
+        for key, item, terms in entries:
+            index.items[key] = item
+            index.indexed[key] = terms
+            for tier, term in terms:
+                index.terms[tier].append(term)
+                index.keys[tier].append(key)
+        for tier, terms in enumerate(index.terms):
+            order = sorted(range(len(terms)), key=terms.__getitem__)
+            index.terms[tier] = [terms[i] for i in order]
+            index.keys[tier] = [index.keys[tier][i] for i in order]
+        return index
+
+    def copy(self):
+        index = PrefixIndex(len(self.terms), self.fuzzy_tiers)
+        index.terms = [terms.copy() for terms in self.terms]
+        index.keys = [keys.copy() for keys in self.keys]
+        index.items = self.items.copy()
+        index.indexed = self.indexed.copy()
+        return index
+
+    def add(self, key, item, terms):
+        self.remove(key)
+        self.items[key] = item
+        self.indexed[key] = terms
+        for tier, term in terms:
+            i = bisect_left(self.terms[tier], term)
+            self.terms[tier].insert(i, term)
+            self.keys[tier].insert(i, key)
+
+    def remove(self, key):
+        self.items.pop(key, None)
+        for tier, term in self.indexed.pop(key, ()):
+            terms, keys = self.terms[tier], self.keys[tier]
+            try:
+                i = keys.index(key, bisect_left(terms, term), bisect_right(terms, term))
+            except ValueError:
+                continue
+            del terms[i], keys[i]
+
+    def scan(self, tier: int, prefix: str):
+        """Yield the (term, key) pairs of `tier` starting with `prefix` in order."""
+        terms, keys = self.terms[tier], self.keys[tier]
+        for i in range(bisect_left(terms, prefix), len(terms)):
+            if not terms[i].startswith(prefix):
+                break
+            yield terms[i], keys[i]
+
+    def search(self, query: str, limit: int):
+        """Return up to `limit` (item, kind) pairs, best first."""
+        found = {}
+        for kind in (EXACT, PREFIX):
+            for tier in range(len(self.terms)):
+                for term, key in self.scan(tier, query):
+                    if len(found) >= limit:
+                        break
+                    if kind == PREFIX or term == query:
+                        found.setdefault(key, kind)
+                    else:
+                        # exact matches sort first among the prefix matches
+                        break
+        if len(found) < limit and FUZZY_MIN_LENGTH <= len(query) <= FUZZY_MAX_LENGTH:
+            fuzzy = []
+            variants = edits(query)
+            for rank, tier in enumerate(self.fuzzy_tiers):
+                terms = self.terms[tier]
+                for variant in variants:
+                    i = bisect_left(terms, variant)
+                    # most variants match nothing, skip the generator for them
+                    if i == len(terms) or not terms[i].startswith(variant):
+                        continue
+                    for n, (term, key) in enumerate(self.scan(tier, variant)):
+                        if n >= limit:
+                            break
+                        if key not in found:
+                            fuzzy.append((rank, term, key))
+            for _, _, key in sorted(fuzzy):
+                if len(found) >= limit:
+                    break
+                found.setdefault(key, FUZZY)
+        return [(self.items[key], kind) for key, kind in found.items()]
+
+
+class Autocomplete(LocalIndex):
+    """
+    In-process typeahead index of a model. Each row is indexed under the
+    normalized value of every field of `fields`, one tier per field in
+    ranking order, and under every word of those values in a last tier, so
+    queries can start at any word. Fuzzy matches are looked up in the
+    first tier and the words.
+    """
+
+    fields = ()
+
+    def queryset(self):
+        raise NotImplementedError
+
+    def item(self, row):
+        raise NotImplementedError
+
+    def entry(self, row):
+        words = len(self.fields)
+        terms = []
+        for tier, field in enumerate(self.fields):
+            value = normalize(row[field])
+            if value:
+                terms.append((tier, value))
+                if tier:
+                    terms.extend((words, word) for word in set(value.split()))
+        return str(row["uid"]), self.item(row), terms
+
+    def index(self, entries):
+        words = len(self.fields)
+        return PrefixIndex.build(words + 1, (0, words), entries)
+
+    def build(self):
+        return self.index(self.entry(row) for row in self.queryset().iterator())
+
+    def copy(self, index):
+        return index.copy()
+
+    def apply(self, index, uids):
+        rows = {str(row["uid"]): row for row in self.queryset().filter(uid__in=uids)}
+        for uid in map(str, uids):
+            if uid in rows:
+                index.add(*self.entry(rows[uid]))
+            else:
+                index.remove(uid)
+
+    def search(self, query: str, limit: int):
+        """Return up to `limit` items matching `query` with their `match` kind."""
+        query = normalize(query)
+        if not query:
+            return []
+        return [
+            {**item, "match": kind} for item, kind in self.get().search(query, limit)
+        ]
+
+
+class AirportAutocomplete(Autocomplete):
+    """Airports by ICAO code, name, city and country."""
+
+    name = "autocomplete:airports"
+    fields = ("icao", "name", "location__city", "location__country")
+
+    def queryset(self):
+        return Airport.objects.values("uid", *self.fields)
+
+    def item(self, row):
+        return {
+            "uid": str(row["uid"]),
+            "icao": row["icao"],
+            "name": row["name"],
+            "city": row["location__city"],
+            "country": row["location__country"],
+        }
+
+
+class AircraftAutocomplete(Autocomplete):
+    """Aircraft by serial number and manufacturer."""
+
+    name = "autocomplete:aircraft"
+    fields = ("serial_number", "manufacturer")
+
+    def queryset(self):
+        return Aircraft.objects.values("uid", *self.fields)
+
+    def item(self, row):
+        return {
+            "uid": str(row["uid"]),
+            "serial_number": row["serial_number"],
+            "manufacturer": row["manufacturer"],
+        }
+
+
+airports = AirportAutocomplete()
+aircraft = AircraftAutocomplete()
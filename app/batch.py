@@ -0,0 +1,220 @@
+import uuid
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from . import cache, geo, signals
+from .models import Aircraft, Airport, Flight
+from .scheduling import CONFLICT_MESSAGE, AircraftSchedule
+from .serializers import AirCraftSerializer, AirportSerializer, CreateFlightSerializer
+from .signals import flights_changed
+from .utils import minute_of_day
+
+OPERATIONS = ("create", "update", "delete")
+
+
+class BatchFlightSerializer(CreateFlightSerializer):
+    def validate_schedule(self, attrs):
+        # the bookings of a batch are checked together, see Batch.apply_flights
+        pass
+
+
+class Rollback(Exception):
+    pass
+
+
+class Batch:
+    """
+    Apply create, update and delete operations on aircraft, airports and
+    flights in one transaction, all or nothing.
+
+    Operations are dicts `{"op", "resource", "uid", "data"}` where `data`
+    takes the fields of the resource's create / update endpoint. The rows
+    they update or delete are loaded with one query per resource, aircraft
+    and airport operations are applied before flight operations so flights
+    can refer to them, updates are written with one `bulk_update` per
+    resource and aircraft and flights are created with `bulk_create`. The
+    aircraft bookings of the flights are checked together with one query.
+    """
+
+    # resource -> (model, serializer class), in the order they are applied
+    RESOURCES = {
+        "aircraft": (Aircraft, AirCraftSerializer),
+        "airport": (Airport, AirportSerializer),
+        "flight": (Flight, BatchFlightSerializer),
+    }
+
+    def __init__(self, operations, context: dict = None):
+        self.operations = operations
+        self.context = context or {}
+        self.results = [{"index": i, "status": True} for i in range(len(operations))]
+        self.failed = False
+        self.message = None
+
+    def fail(self, index, errors):
+        self.results[index] = {"index": index, "status": False, "errors": errors}
+        self.failed = True
+
+    def succeed(self, index, uid):
+        self.results[index]["uid"] = uid
+
+    def run(self):
+        """Apply the operations, returns True unless the batch was rolled back."""
+        grouped = self.parse()
+        if self.failed:
+            return False
+        try:
+            with transaction.atomic():
+                for resource, (model, serializer_class) in self.RESOURCES.items():
+                    if resource == "flight":
+                        self.apply_flights(grouped[resource])
+                    else:
+                        self.apply(model, serializer_class, grouped[resource])
+                if self.failed:
+                    raise Rollback
+        except Rollback:
+            pass
+        except IntegrityError:
+            # e.g duplicate ICAO codes in the batch or a concurrent write
+            self.failed = True
+            self.message = "Conflicting write."
+        if self.failed:
+            # lookups inside the transaction may have cached rolled back rows
+            cache.airports.invalidate()
+            cache.aircraft.invalidate()
+            geo.airports.invalidate()
+            for result in self.results:
+                result.pop("uid", None)
+        return not self.failed
+
+    def parse(self):
+        grouped = {resource: [] for resource in self.RESOURCES}
+        for index, operation in enumerate(self.operations):
+            if not isinstance(operation, dict):
+                self.fail(index, {"non_field_errors": ["Invalid operation."]})
+                continue
+            errors = {}
+            op, resource = operation.get("op"), operation.get("resource")
+            uid, data = operation.get("uid"), operation.get("data", {})
+            if op not in OPERATIONS:
+                errors["op"] = [f"Expected one of {', '.join(OPERATIONS)}."]
+            if resource not in self.RESOURCES:
+                errors["resource"] = [f"Expected one of {', '.join(self.RESOURCES)}."]
+            if op in ("update", "delete"):
+                try:
+                    uid = uuid.UUID(str(uid))
+                except ValueError:
+                    errors["uid"] = ["Must be a valid UUID."]
+            if op in ("create", "update") and not isinstance(data, dict):
+                errors["data"] = ["Expected an object."]
+            if errors:
+                self.fail(index, errors)
+            else:
+                grouped[resource].append((index, op, uid, data))
+        return grouped
+
+    def load(self, model, operations):
+        uids = [uid for _, op, uid, _ in operations if op != "create"]
+        instances = model.objects.in_bulk(uids) if uids else {}
+        for index, op, uid, _ in operations:
+            if op != "create" and uid not in instances:
+                self.fail(index, {"uid": ["Not Found"]})
+        return instances
+
+    def validate(self, serializer_class, operations, instances):
+        """Yield (index, op, instance, serializer) of the valid operations."""
+        for index, op, uid, data in operations:
+            instance = instances.get(uid)
+            if op != "create" and instance is None:
+                continue
+            if op == "delete":
+                yield index, op, instance, None
+                continue
+            ser = serializer_class(
+                instance, data=data, partial=op == "update", context=self.context
+            )
+            if ser.is_valid():
+                yield index, op, instance, ser
+            else:
+                self.fail(index, ser.errors)
+
+    def apply(self, model, serializer_class, operations):
+        if not operations:
+            return
+        instances = self.load(model, operations)
+        created, updated, deleted, fields = [], [], [], {"updated_at"}
+        for index, op, instance, ser in self.validate(
+            serializer_class, operations, instances
+        ):
+            if op == "delete":
+                deleted.append(instance.uid)
+            elif op == "update" and "location" in ser.validated_data:
+                self.fail(index, {"location": ["Cannot be updated."]})
+                continue
+            elif op == "update":
+                for field, value in ser.validated_data.items():
+                    setattr(instance, field, value)
+                    fields.add(field)
+                instance.updated_at = timezone.now()
+                updated.append(instance)
+            elif model is Airport:
+                # creates its location too
+                instance = ser.save()
+            else:
+                instance = model(**ser.validated_data)
+                created.append(instance)
+            self.succeed(index, instance.uid)
+        if self.failed:
+            return
+        model.objects.bulk_create(created)
+        model.objects.bulk_update(updated, fields)
+        model.objects.filter(uid__in=deleted).delete()
+        if model is Airport:
+            signals.invalidate_airports(Airport)
+        else:
+            signals.invalidate_aircraft(Aircraft)
+
+    def apply_flights(self, operations):
+        if not operations:
+            return
+        instances = self.load(Flight, operations)
+        created, updated, deleted, fields = [], [], [], {"updated_at"}
+        booked = []
+        for index, op, instance, ser in self.validate(
+            BatchFlightSerializer, operations, instances
+        ):
+            if op == "delete":
+                deleted.append(instance.uid)
+                self.succeed(index, instance.uid)
+                continue
+            data = dict(ser.validated_data)
+            if op == "create":
+                instance = Flight(**data)
+                created.append(instance)
+            else:
+                for field, value in data.items():
+                    setattr(instance, field, value)
+                    fields.add(field)
+                instance.updated_at = timezone.now()
+                updated.append(instance)
+            instance.departure_minute = minute_of_day(instance.departure_dt)
+            booked.append((index, instance))
+        schedule = AircraftSchedule([flight for _, flight in booked], deleted)
+        for index, flight in booked:
+            conflict = schedule.book(flight)
+            if conflict:
+                message = CONFLICT_MESSAGE.format(*conflict)
+                self.fail(index, {"aircraft": [message]})
+            else:
+                self.succeed(index, flight.uid)
+        if self.failed:
+            return
+        if "departure_dt" in fields:
+            fields.add("departure_minute")
+        Flight.objects.bulk_create(created)
+        if updated:
+            Flight.objects.bulk_update(updated, fields)
+        changes = [(None, flight.snapshot()) for flight in created]
+        changes += [(flight._snapshot, flight.snapshot()) for flight in updated]
+        if changes:
+            flights_changed.send(sender=Flight, changes=changes)
+        # deletes send flights_changed through post_delete
+        Flight.objects.filter(uid__in=deleted).delete()
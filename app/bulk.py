@@ -0,0 +1,54 @@
+from django.db import connections, transaction
+from django.utils import timezone
+from .models import Flight
+from .signals import flights_bulk_changed
+
+# Writes to every flight matching a filter with one statement, instead of
+# loading and saving each flight. Their effects on the rollups, the change
+# log, the route timetable and the ETag clocks go through
+# `flights_bulk_changed`, whose receivers are set based as well.
+
+
+def lock(queryset):
+    """
+    Lock the rows of `queryset` until the end of the transaction, so the
+    receivers and the write see the same flights in the same state.
+    """
+    list(queryset.select_for_update().values_list("pk", flat=True))
+
+
+def delete_rows(queryset) -> int:
+    """
+    Delete the rows of `queryset` with one DELETE statement, without the
+    cascades and signals of `QuerySet.delete()`. Returns how many were deleted.
+    """
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    opts = queryset.model._meta
+    subquery = queryset.order_by().values("pk").query
+    sql, params = subquery.get_compiler(queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(opts.db_table)} "
+            f"WHERE {quote(opts.pk.column)} IN ({sql})",
+            params,
+        )
+        return cursor.rowcount
+
+
+def update_status(queryset, status: str) -> int:
+    """Set the status of the flights of `queryset`, returns how many changed."""
+    queryset = queryset.exclude(status=status)
+    with transaction.atomic():
+        lock(queryset)
+        flights_bulk_changed.send(sender=Flight, queryset=queryset, status=status)
+        return queryset.update(status=status, updated_at=timezone.now())
+
+
+def delete(queryset) -> int:
+    """Delete the flights of `queryset`, returns how many were deleted."""
+    with transaction.atomic():
+        lock(queryset)
+        flights_bulk_changed.send(sender=Flight, queryset=queryset, status=None)
+        # `delete()` would load every flight to send post_delete
+        return delete_rows(queryset)
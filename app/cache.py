@@ -0,0 +1,200 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+from django.conf import settings
+from django.core.cache import cache
+from .models import Aircraft, Airport
+
+
+class LRUCache:
+    """Small thread safe in-process LRU cache with a TTL per entry."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedVersion:
+    """
+    Version counter kept in the Django cache. Processes compare it with the
+    version their in-memory data was built from to notice writes made by any
+    other process.
+    """
+
+    def __init__(self, name: str):
+        self.key = f"version:{name}"
+
+    def get(self):
+        # seeded from the clock so an evicted version never revives old data
+        return cache.get_or_set(self.key, time.time_ns, None)
+
+    def bump(self):
+        try:
+            return cache.incr(self.key)
+        except ValueError:
+            version = time.time_ns()
+            cache.set(self.key, version, None)
+            return version
+
+
+class LocalIndex:
+    """
+    In-process structure built lazily by `build()` and rebuilt on the next
+    access once `invalidate()` has been called by any process.
+
+    `update()` publishes incremental changes under the version it bumps, any
+    process that is at most `max_catch_up` versions behind applies them to a
+    copy of its structure instead of rebuilding it. Changes are applied to a
+    copy swapped in once complete, readers never see a structure mutate.
+    """
+
+    name = None
+    # versions behind after which a process rebuilds rather than catches up
+    max_catch_up = 100
+    # how long the changes of a version stay in the Django cache, in seconds
+    changes_ttl = 600
+
+    def __init__(self):
+        self.version = SharedVersion(self.name)
+        self.built_version = None
+        self.value = None
+        self.lock = threading.Lock()
+
+    def build(self):
+        raise NotImplementedError
+
+    def apply(self, value, changes):
+        raise NotImplementedError
+
+    def copy(self, value):
+        """Copy of `value` that `apply` can change while readers use `value`."""
+        return copy.deepcopy(value)
+
+    def changes_key(self, version):
+        return f"{self.version.key}:changes:{version}"
+
+    def get(self):
+        version = self.version.get()
+        if version != self.built_version:
+            with self.lock:
+                if version != self.built_version:
+                    self.refresh(version)
+        return self.value
+
+    def refresh(self, version):
+        changes = None
+        if self.value is not None and 0 < version - self.built_version <= (
+            self.max_catch_up
+        ):
+            keys = [
+                self.changes_key(v) for v in range(self.built_version + 1, version + 1)
+            ]
+            published = cache.get_many(keys)
+            # a version bumped by invalidate() or whose changes expired
+            if len(published) == len(keys):
+                changes = [published[key] for key in keys]
+        if changes is None:
+            value = self.build()
+        else:
+            value = self.copy(self.value)
+            for batch in changes:
+                self.apply(value, batch)
+        self.value, self.built_version = value, version
+
+    def invalidate(self):
+        self.version.bump()
+
+    def update(self, changes):
+        """
+        Publish `changes` and apply them right away if the local copy is
+        current, otherwise they are caught up with on the next access.
+        """
+        with self.lock:
+            version = self.version.bump()
+            cache.set(self.changes_key(version), changes, self.changes_ttl)
+            if self.value is not None and self.built_version == version - 1:
+                value = self.copy(self.value)
+                self.apply(value, changes)
+                self.value, self.built_version = value, version
+
+
+class ReferenceCache:
+    """
+    Read-through cache for rarely changing reference rows looked up by a
+    case insensitive natural key (airport ICAO, aircraft serial number).
+
+    Lookups go to a per-process LRU first, then to the Django cache and
+    finally to the database. Writes to the model clear the local LRU and bump
+    a version shared through the Django cache, which retires every entry
+    stored under the previous version. Other processes drop their local copy
+    at the latest after REFERENCE_CACHE_TTL seconds.
+    """
+
+    def __init__(self, model, field: str):
+        self.model = model
+        self.field = field
+        self.prefix = f"ref:{model._meta.label_lower}"
+        self.version = SharedVersion(self.prefix)
+        self.local = LRUCache(
+            settings.REFERENCE_CACHE_SIZE, settings.REFERENCE_CACHE_TTL
+        )
+
+    @staticmethod
+    def normalize(key: str):
+        return key.strip().upper()
+
+    def get(self, key: str):
+        """Return a copy of the instance for `key` or None if it does not exist."""
+        key = self.normalize(key)
+        obj = self.local.get(key)
+        if obj is None:
+            shared_key = f"{self.prefix}:{self.version.get()}:{quote(key)}"
+            obj = cache.get(shared_key)
+            if obj is None:
+                obj = self.model.objects.filter(
+                    **{f"{self.field}__iexact": key}
+                ).first()
+                if obj is None:
+                    return None
+                cache.set(shared_key, obj, settings.REFERENCE_CACHE_TTL)
+            self.local.set(key, obj)
+        return copy.copy(obj)
+
+    def invalidate(self):
+        self.local.clear()
+        self.version.bump()
+
+
+airports = ReferenceCache(Airport, "icao")
+aircraft = ReferenceCache(Aircraft, "serial_number")
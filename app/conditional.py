@@ -0,0 +1,131 @@
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+from hashlib import blake2b
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+
+def clock_key(model, uid=None):
+    key = f"clock:{model._meta.label_lower}"
+    return f"{key}:{uid}" if uid is not None else key
+
+
+def touch(model, uids=(), every_row: bool = False):
+    """
+    Record a write to the rows of `model`, and to the rows `uids` in
+    particular or, with `every_row`, to any of its rows (bulk writes).
+    """
+    now = time.time_ns()
+    clocks = {clock_key(model): now}
+    clocks.update((clock_key(model, uid), now) for uid in uids)
+    if every_row:
+        clocks[clock_key(model, "*")] = now
+    cache.set_many(clocks, None)
+
+
+class Conditional:
+    """
+    ETag and Last-Modified of a GET endpoint computed from the write clocks
+    of the models it renders, so a matching conditional request is answered
+    with a 304 after one cache lookup, without touching the database.
+
+    Clocks are moved by `touch()` once the writing transaction commits. With
+    `per_row`, the clock of a single row is used instead of the clock of
+    `model` when the view is called with the `uid` of a `model` row, along
+    with the clock of the bulk writes to `model`. `moved` returns the last
+    datetime the responses changed without a write, e.g a time window
+    sliding with the day, and is used as one more clock.
+    """
+
+    def __init__(self, model, *related, per_row: bool = False, moved=None):
+        self.model = model
+        self.related = related
+        self.per_row = per_row
+        self.moved = moved
+
+    def clock(self):
+        """Clock of `moved`, in nanoseconds like the write clocks."""
+        return int(self.moved().timestamp()) * 10**9
+
+    def keys(self, uid):
+        keys = [clock_key(model) for model in self.related]
+        if uid is None or not self.per_row:
+            keys.append(clock_key(self.model))
+        else:
+            try:
+                uid = uuid.UUID(str(uid))
+            except ValueError:
+                pass
+            keys.append(clock_key(self.model, "*"))
+            keys.append(clock_key(self.model, uid))
+        return keys
+
+    def clocks(self, request, uid):
+        if not hasattr(request, "_clocks"):
+            keys = self.keys(uid)
+            clocks = cache.get_many(keys)
+            missing = [key for key in keys if key not in clocks]
+            if missing:
+                # evicted or never written, start from now
+                now = time.time_ns()
+                for key in missing:
+                    cache.add(key, now, None)
+                clocks.update(cache.get_many(missing))
+            request._clocks = [clocks.get(key, 0) for key in keys]
+            if self.moved is not None:
+                request._clocks.append(self.clock())
+        return request._clocks
+
+    async def aclocks(self, request, uid):
+        if not hasattr(request, "_clocks"):
+            keys = self.keys(uid)
+            clocks = await cache.aget_many(keys)
+            missing = [key for key in keys if key not in clocks]
+            if missing:
+                now = time.time_ns()
+                for key in missing:
+                    await cache.aadd(key, now, None)
+                clocks.update(await cache.aget_many(missing))
+            request._clocks = [clocks.get(key, 0) for key in keys]
+            if self.moved is not None:
+                request._clocks.append(self.clock())
+        return request._clocks
+
+    def etag(self, request, uid=None, **kwargs):
+        return self.tag(request, self.clocks(request, uid))
+
+    def tag(self, request, clocks):
+        key = f"{clocks}|{request.get_full_path()}|{request.META.get('HTTP_ACCEPT')}"
+        return blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def last_modified(self, request, uid=None, **kwargs):
+        clock = max(self.clocks(request, uid))
+        return datetime.fromtimestamp(clock / 1e9, timezone.utc)
+
+    def __call__(self, view):
+        return condition(self.etag, self.last_modified)(view)
+
+    def asynchronous(self, view):
+        """`__call__` for async views, which `condition` does not wrap."""
+
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            clocks = await self.aclocks(request, kwargs.get("uid"))
+            etag = quote_etag(self.tag(request, clocks))
+            last_modified = max(clocks) // 10**9
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                if not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(last_modified)
+                response.headers.setdefault("ETag", etag)
+            return response
+
+        return inner
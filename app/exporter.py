@@ -0,0 +1,57 @@
+import csv
+import json
+import uuid
+from datetime import datetime
+
+# Exported column -> Flight lookup. The columns match the import format.
+EXPORT_FIELDS = {
+    "uid": "uid",
+    "aircraft": "aircraft__serial_number",
+    "departure": "departure__icao",
+    "arrival": "arrival__icao",
+    "departure_dt": "departure_dt",
+    "arrival_dt": "arrival_dt",
+    "status": "status",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+
+
+class Echo:
+    """File like object handing back what is written to it, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size: int):
+    """Iterate over the export columns of `queryset` with a server side cursor."""
+    rows = queryset.values_list(*EXPORT_FIELDS.values())
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield [
+            value.isoformat()
+            if isinstance(value, datetime)
+            else str(value)
+            if isinstance(value, uuid.UUID)
+            else value
+            for value in row
+        ]
+
+
+def to_ndjson(rows):
+    columns = list(EXPORT_FIELDS)
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), separators=(",", ":")) + "\n"
+
+
+def to_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+EXPORT_FORMATS = {
+    "ndjson": (to_ndjson, "application/x-ndjson"),
+    "csv": (to_csv, "text/csv"),
+}
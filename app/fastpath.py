@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .metrics import timed
+from .serializers import DepartureFlightSerializer, FlightListSerializer
+
+FIELD, DATETIME, NESTED, METHOD = range(4)
+
+
+class ValuesSerializer:
+    """
+    Read only fast path producing the representation of a (nested)
+    ModelSerializer from `.values()` rows.
+
+    The mapping from columns to output fields is computed once from the
+    serializer fields, so serializing a row is a few dict lookups and the DRF
+    fields' `to_representation` calls, without building serializer instances
+    or loading model objects. `SerializerMethodField`s are computed by the
+    `methods` callables, given as `{field: (columns, callable(row))}`.
+    """
+
+    def __init__(self, serializer_class, methods: dict = None, serializer=None):
+        self.serializer_class = serializer_class
+        self.methods = methods or {}
+        self.columns = []
+        self.plan = self.compile(serializer or serializer_class(), "")
+        self.narrowed = {}
+
+    def narrow(self, fieldset):
+        """
+        ValuesSerializer of the `fieldset` representation, selecting only its
+        columns. Compiled once per fieldset.
+        """
+        if fieldset.full:
+            return self
+        if fieldset.key not in self.narrowed:
+            self.narrowed[fieldset.key] = ValuesSerializer(
+                self.serializer_class,
+                self.methods,
+                fieldset.restrict(self.serializer_class()),
+            )
+        return self.narrowed[fieldset.key]
+
+    def add_column(self, column: str):
+        if column not in self.columns:
+            self.columns.append(column)
+
+    def compile(self, serializer, prefix: str):
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                nested_prefix = f"{prefix}{field.source}__"
+                pk = nested_prefix + field.Meta.model._meta.pk.name
+                self.add_column(pk)
+                plan.append((name, NESTED, (pk, self.compile(field, nested_prefix))))
+            elif isinstance(field, serializers.SerializerMethodField):
+                columns, method = self.methods[prefix + name]
+                for column in columns:
+                    self.add_column(prefix + column)
+                plan.append((name, METHOD, method))
+            elif isinstance(field, serializers.RelatedField):
+                # the foreign key column of a relation that is not expanded
+                column = prefix + field.source
+                self.add_column(column)
+                plan.append((name, FIELD, (column, primary_key)))
+            elif self.is_iso_datetime(field):
+                column = prefix + field.source
+                self.add_column(column)
+                plan.append((name, DATETIME, column))
+            else:
+                column = prefix + field.source
+                self.add_column(column)
+                plan.append((name, FIELD, (column, field.to_representation)))
+        return plan
+
+    @staticmethod
+    def is_iso_datetime(field):
+        # Formatted inline with the timezone looked up once per call instead
+        # of once per value, as DateTimeField.to_representation does.
+        return (
+            isinstance(field, serializers.DateTimeField)
+            and settings.USE_TZ
+            and not hasattr(field, "timezone")
+            and getattr(field, "format", api_settings.DATETIME_FORMAT) == ISO_8601
+        )
+
+    def values(self, queryset, *required):
+        """`required` columns (e.g the pagination ordering) are selected too."""
+        extra = [column for column in required if column not in self.columns]
+        return queryset.values(*self.columns, *extra)
+
+    def build(self, plan, row, tz):
+        ret = {}
+        for name, kind, arg in plan:
+            if kind == FIELD:
+                value = row[arg[0]]
+                ret[name] = None if value is None else arg[1](value)
+            elif kind == DATETIME:
+                value = row[arg]
+                if value is not None:
+                    value = value.astimezone(tz).isoformat()
+                    if value.endswith("+00:00"):
+                        value = value[:-6] + "Z"
+                ret[name] = value
+            elif kind == NESTED:
+                ret[name] = None if row[arg[0]] is None else self.build(arg[1], row, tz)
+            else:
+                ret[name] = arg(row)
+        return ret
+
+    @timed
+    def many(self, rows):
+        plan, tz = self.plan, timezone.get_current_timezone()
+        return [self.build(plan, row, tz) for row in rows]
+
+    def data(self, queryset):
+        # fetched before serializing, so the query is not timed as serialization
+        return self.many(list(self.values(queryset)))
+
+
+def primary_key(value):
+    return value
+
+
+def stored(row):
+    return False
+
+
+def inflight_minutes(row):
+    return (row["arrival_dt"] - row["departure_dt"]).total_seconds() / 60
+
+
+flight_list = ValuesSerializer(FlightListSerializer)
+departure_flight = ValuesSerializer(
+    DepartureFlightSerializer,
+    methods={
+        "inflight_time": (("departure_dt", "arrival_dt"), inflight_minutes),
+        # stored flights, never a pending occurrence
+        "pending": ((), stored),
+    },
+)
@@ -0,0 +1,261 @@
+import json
+import time
+from itertools import islice
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.exceptions import InvalidToken
+from . import cache
+from .authentication import StatelessJWTAuthentication
+from .models import FlightChange
+from .serializers import FlightChangeSerializer
+
+# changes to any other field are not logged
+LOGGED_FIELDS = (
+    "aircraft_id",
+    "departure_id",
+    "arrival_id",
+    "departure_dt",
+    "arrival_dt",
+    "status",
+)
+
+HEARTBEAT = b": keepalive\n\n"
+
+
+class FeedError(Exception):
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+def log_changes(changes):
+    """Append the `flights_changed` changes that matter to subscribers to the log."""
+    entries = []
+    for before, after in changes:
+        if before is None:
+            kind, values = "created", after
+        elif after is None:
+            kind, values = "deleted", before
+        elif any(before[field] != after[field] for field in LOGGED_FIELDS):
+            kind, values = "updated", after
+        else:
+            continue
+        entries.append(
+            FlightChange(
+                flight=values["uid"],
+                kind=kind,
+                status=values["status"],
+                previous_status=before["status"] if before else None,
+                aircraft=values["aircraft_id"],
+                departure=values["departure_id"],
+                arrival=values["arrival_id"],
+                departure_dt=values["departure_dt"],
+                arrival_dt=values["arrival_dt"],
+            )
+        )
+    FlightChange.objects.bulk_create(entries)
+
+
+def log_bulk_changes(queryset, status=None):
+    """
+    `log_changes` for `flights_bulk_changed`: log the flights of `queryset`
+    as set to `status`, or deleted, with one bulk insert per chunk of
+    FEED_BATCH_SIZE flights.
+    """
+    kind = "deleted" if status is None else "updated"
+    created_at = timezone.now()
+    rows = (
+        queryset.order_by()
+        .values_list(
+            "uid",
+            "status",
+            "aircraft_id",
+            "departure_id",
+            "arrival_id",
+            "departure_dt",
+            "arrival_dt",
+        )
+        .iterator(chunk_size=settings.FEED_BATCH_SIZE)
+    )
+    while True:
+        chunk = list(islice(rows, settings.FEED_BATCH_SIZE))
+        if not chunk:
+            break
+        FlightChange.objects.bulk_create(
+            FlightChange(
+                flight=uid,
+                kind=kind,
+                status=status or previous_status,
+                previous_status=previous_status,
+                aircraft=aircraft,
+                departure=departure,
+                arrival=arrival,
+                departure_dt=departure_dt,
+                arrival_dt=arrival_dt,
+                created_at=created_at,
+            )
+            for (
+                uid,
+                previous_status,
+                aircraft,
+                departure,
+                arrival,
+                departure_dt,
+                arrival_dt,
+            ) in chunk
+        )
+
+
+def authenticate(header: str = None, token: str = None):
+    """
+    Return the user of a JWT given as a bearer `Authorization` header or, for
+    EventSource clients which cannot set headers, as a `token` query param.
+    """
+    auth = StatelessJWTAuthentication()
+    try:
+        raw = auth.get_raw_token(header.encode()) if header else token
+        if not raw:
+            raise FeedError("Authentication credentials were not provided.", 401)
+        user = auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, AuthenticationFailed) as e:
+        detail = e.detail["detail"] if isinstance(e.detail, dict) else e.detail
+        raise FeedError(str(detail), 401)
+    if user.role not in ("user", "admin"):
+        raise FeedError("You do not have permission to perform this action.", 403)
+    return user
+
+
+class Subscription:
+    """
+    Filters of a feed subscriber: changes after the `after` cursor, of the
+    flights departing from or arriving at `airport`, flown by `aircraft`.
+    """
+
+    def __init__(self, after=None, airport=None, aircraft=None):
+        self.after = after
+        self.airport = airport
+        self.aircraft = aircraft
+
+    @classmethod
+    def from_params(cls, params, last_event_id=None):
+        """Subscription for the `after`, `airport` (ICAO) and `aircraft` (serial) params."""
+        after = last_event_id or params.get("after")
+        try:
+            after = int(after) if after else None
+        except ValueError:
+            raise FeedError("Invalid cursor", 400)
+        airport = aircraft = None
+        if params.get("airport"):
+            airport = cache.airports.get(params["airport"])
+            if airport is None:
+                raise FeedError("Airport Not Found.", 404)
+        if params.get("aircraft"):
+            aircraft = cache.aircraft.get(params["aircraft"])
+            if aircraft is None:
+                raise FeedError("Aircraft Not Found.", 404)
+        return cls(
+            after,
+            airport.uid if airport else None,
+            aircraft.uid if aircraft else None,
+        )
+
+    def queryset(self):
+        queryset = FlightChange.objects.order_by("id")
+        if self.after is not None:
+            queryset = queryset.filter(id__gt=self.after)
+        if self.airport:
+            queryset = queryset.filter(
+                Q(departure=self.airport) | Q(arrival=self.airport)
+            )
+        if self.aircraft:
+            queryset = queryset.filter(aircraft=self.aircraft)
+        return queryset
+
+    def matches(self, change):
+        if self.airport and self.airport not in (change.departure, change.arrival):
+            return False
+        return not self.aircraft or change.aircraft == self.aircraft
+
+    def backlog(self):
+        """Changes after the cursor, read in batches."""
+        if self.after is None:
+            return
+        while True:
+            changes = list(self.queryset()[: settings.FEED_BATCH_SIZE])
+            yield from changes
+            if len(changes) < settings.FEED_BATCH_SIZE:
+                return
+            self.after = changes[-1].id
+
+
+class ChangeReader:
+    """
+    Reads new changes from the log in id order.
+
+    Ids are allocated when a change is inserted but become visible when its
+    transaction commits, so a lower id can show up after a higher one was
+    read. Skipped ids are read again for FEED_GAP_TIMEOUT seconds.
+    """
+
+    def __init__(self):
+        self.last = FlightChange.objects.aggregate(last=Max("id"))["last"] or 0
+        self.gaps = {}  # id -> monotonic deadline
+
+    def read(self):
+        now = time.monotonic()
+        self.gaps = {pk: end for pk, end in self.gaps.items() if end > now}
+        query = Q(id__gt=self.last)
+        if self.gaps:
+            query |= Q(id__in=list(self.gaps))
+        changes = list(
+            FlightChange.objects.filter(query).order_by("id")[
+                : settings.FEED_BATCH_SIZE
+            ]
+        )
+        deadline = now + settings.FEED_GAP_TIMEOUT
+        for change in changes:
+            if change.id > self.last:
+                # the last 1000 skipped ids at most
+                skipped = range(max(self.last + 1, change.id - 1000), change.id)
+                self.gaps.update((pk, deadline) for pk in skipped)
+                self.last = change.id
+            else:
+                self.gaps.pop(change.id, None)
+        return changes
+
+
+def event(change):
+    """Server-Sent Event frame of a change, its id is the resume cursor."""
+    data = json.dumps(
+        FlightChangeSerializer(change).data, cls=JSONEncoder, separators=(",", ":")
+    )
+    return f"id: {change.id}\nevent: {change.kind}\ndata: {data}\n\n".encode()
+
+
+def stream(subscription):
+    """
+    Blocking event stream polling the log, for WSGI servers where each
+    subscriber holds a thread. core/asgi.py serves the feed without one.
+    """
+    reader = ChangeReader()
+    sent = set()
+    for change in subscription.backlog():
+        sent.add(change.id)
+        yield event(change)
+    idle = 0.0
+    while True:
+        changes = reader.read()
+        for change in changes:
+            if change.id not in sent and subscription.matches(change):
+                yield event(change)
+        if changes:
+            idle = 0.0
+            continue
+        if idle >= settings.FEED_HEARTBEAT:
+            idle = 0.0
+            yield HEARTBEAT
+        time.sleep(settings.FEED_POLL_INTERVAL)
+        idle += settings.FEED_POLL_INTERVAL
@@ -0,0 +1,92 @@
+from rest_framework import serializers
+
+
+class InvalidFieldset(Exception):
+    pass
+
+
+def split(value: str):
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class Fieldset:
+    """
+    Representation requested with the `fields` (top level fields to render)
+    and `expand` (relations rendered as nested objects, the other relations
+    are rendered as their uid) query params. Every field and relation is
+    rendered when a param is not given.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = frozenset(fields) if fields is not None else None
+        self.expand = frozenset(expand) if expand is not None else None
+        self.key = (self.fields, self.expand)
+
+    @property
+    def full(self):
+        return self.fields is None and self.expand is None
+
+    @classmethod
+    def from_params(cls, params, serializer_class):
+        fields = split(params["fields"]) if "fields" in params else None
+        expand = split(params["expand"]) if "expand" in params else None
+        readable = {
+            name: field
+            for name, field in serializer_class().fields.items()
+            if not field.write_only
+        }
+        if fields is not None and not fields <= set(readable):
+            raise InvalidFieldset("Invalid fields")
+        relations = {
+            name
+            for name, field in readable.items()
+            if isinstance(field, serializers.BaseSerializer)
+        }
+        if expand is not None and not expand <= relations:
+            raise InvalidFieldset("Invalid expand")
+        return cls(fields, expand)
+
+    def restrict(self, serializer):
+        """Drop the fields of `serializer` left out and collapse its relations."""
+        fields = getattr(serializer, "child", serializer).fields
+        for name, field in list(fields.items()):
+            if self.fields is not None and name not in self.fields:
+                del fields[name]
+            elif (
+                self.expand is not None
+                and isinstance(field, serializers.BaseSerializer)
+                and name not in self.expand
+            ):
+                source = {} if field.source == name else {"source": field.source}
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True, **source
+                )
+        return serializer
+
+    def serializer(self, serializer_class, *args, **kwargs):
+        serializer = serializer_class(*args, **kwargs)
+        return serializer if self.full else self.restrict(serializer)
+
+    def queryset(self, queryset, serializer_class, *required):
+        """
+        Narrow `queryset` to the columns and joins of the representation,
+        `required` columns (e.g the pagination ordering) are loaded too.
+        """
+        if self.full:
+            return queryset
+        columns, related = list(required), []
+        self.paths(self.restrict(serializer_class()), "", columns, related)
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+    def paths(self, serializer, prefix, columns, related):
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            path = prefix + field.source
+            columns.append(path)
+            if isinstance(field, serializers.BaseSerializer):
+                related.append(path)
+                self.paths(field, f"{path}__", columns, related)
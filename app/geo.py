@@ -0,0 +1,127 @@
+import heapq
+import math
+from .cache import LocalIndex
+from .models import Airport
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_vector(lat: float, lng: float):
+    lat, lng = math.radians(lat), math.radians(lng)
+    return (
+        math.cos(lat) * math.cos(lng),
+        math.cos(lat) * math.sin(lng),
+        math.sin(lat),
+    )
+
+
+def km_to_chord(km: float):
+    """Straight line distance through the unit sphere for a great circle distance."""
+    angle = min(km / EARTH_RADIUS_KM, math.pi)
+    return 2 * math.sin(angle / 2)
+
+
+def chord_to_km(chord: float):
+    return 2 * math.asin(min(chord / 2, 1.0)) * EARTH_RADIUS_KM
+
+
+class KDTree:
+    """
+    KD-tree over points on the unit sphere stored as 3D vectors.
+
+    The chord between two vectors grows with the great circle distance, so
+    nearest neighbours by chord are nearest neighbours on the earth and no
+    haversine is needed while searching. Leaves hold up to `leaf_size` points
+    which are scanned linearly.
+    """
+
+    leaf_size = 16
+
+    def __init__(self, points):
+        self.points = points
+        self.root = self.build(list(range(len(points)))) if points else None
+
+    def build(self, indexes):
+        if len(indexes) <= self.leaf_size:
+            return (None, None, indexes, None)
+        points = self.points
+        # split on the axis with the widest spread
+        columns = list(zip(*(points[i] for i in indexes)))
+        spreads = [max(column) - min(column) for column in columns]
+        axis = spreads.index(max(spreads))
+        indexes.sort(key=lambda i: points[i][axis])
+        mid = len(indexes) // 2
+        return (
+            axis,
+            points[indexes[mid]][axis],
+            self.build(indexes[:mid]),
+            self.build(indexes[mid:]),
+        )
+
+    def nearest(self, point, k: int, max_chord: float = 2.0):
+        """
+        Return up to `k` (chord, index) pairs closest to `point` and no
+        further than `max_chord`, nearest first.
+        """
+        if self.root is None or k < 1:
+            return []
+        heap = []  # max heap of (-distance, index) holding the best k so far
+        bound = max_chord * max_chord
+        points = self.points
+        px, py, pz = point
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, lower = stack.pop()
+            if lower > bound:
+                continue
+            axis, split, left, right = node
+            if axis is None:
+                for i in left:
+                    x, y, z = points[i]
+                    d = (x - px) ** 2 + (y - py) ** 2 + (z - pz) ** 2
+                    if d <= bound:
+                        if len(heap) < k:
+                            heapq.heappush(heap, (-d, i))
+                        elif d < -heap[0][0]:
+                            heapq.heapreplace(heap, (-d, i))
+                        if len(heap) == k:
+                            bound = min(bound, -heap[0][0])
+                continue
+            diff = point[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            # the far side is pushed first so the near side is searched first
+            # and has usually shrunk the bound by the time the far side pops
+            stack.append((far, diff * diff))
+            stack.append((near, lower))
+        return sorted((math.sqrt(-d), i) for d, i in heap)
+
+
+class AirportIndex(LocalIndex):
+    """Spatial index of every airport with a location."""
+
+    name = "geo:airports"
+
+    def build(self):
+        rows = list(
+            Airport.objects.filter(location__isnull=False).values_list(
+                "uid", "location__lat", "location__lng"
+            )
+        )
+        uids = [uid for uid, _, _ in rows]
+        tree = KDTree([to_unit_vector(float(lat), float(lng)) for _, lat, lng in rows])
+        return uids, tree
+
+    def nearest(self, lat: float, lng: float, k: int, radius: float = None):
+        """
+        Return up to `k` (uid, distance in km) pairs for the airports closest
+        to the point, optionally limited to `radius` km, nearest first.
+        """
+        uids, tree = self.get()
+        max_chord = km_to_chord(radius) if radius is not None else 2.0
+        return [
+            (uids[i], chord_to_km(chord))
+            for chord, i in tree.nearest(to_unit_vector(lat, lng), k, max_chord)
+        ]
+
+
+airports = AirportIndex()
@@ -0,0 +1,192 @@
+import codecs
+import csv
+import json
+from itertools import islice
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from .models import Aircraft, Airport, Flight
+from .scheduling import CONFLICT_MESSAGE, AircraftSchedule, is_booking_conflict
+from .signals import flights_changed
+from .utils import minute_of_day
+from .validators import flight_times_validator
+
+STATUSES = {choice for choice, _ in Flight.STATUS_CHOICES}
+
+
+def read_csv(stream, encoding: str = "utf-8"):
+    """Yield one dict per row of a CSV byte stream with a header line."""
+    yield from csv.DictReader(codecs.iterdecode(stream, encoding))
+
+
+def read_ndjson(stream, encoding: str = "utf-8"):
+    """Yield one dict per line of a newline delimited JSON byte stream."""
+    for line in codecs.iterdecode(stream, encoding):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # reported as an invalid row by the importer
+                yield None
+
+
+class FlightImporter:
+    """
+    Validate and insert flights in bulk.
+
+    Rows are dicts with the fields accepted by `CreateFlightSerializer`. They
+    are consumed lazily in chunks of `batch_size`. Airport and aircraft
+    references are resolved with one query per chunk and each chunk is
+    inserted with `bulk_create` in its own transaction. Invalid rows are
+    skipped and reported by their index in the input.
+    """
+
+    def __init__(self, batch_size: int = None):
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.airports = {}
+        self.aircraft = {}
+        self.created = 0
+        self.errors = []
+
+    def run(self, rows):
+        rows = enumerate(rows)
+        while True:
+            chunk = list(islice(rows, self.batch_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+        return {"created": self.created, "errors": self.errors}
+
+    def import_chunk(self, chunk):
+        self.resolve(chunk)
+        self.tz = timezone.get_current_timezone()
+        built = []
+        for index, row in chunk:
+            try:
+                built.append((index, self.build(row)))
+            except serializers.ValidationError as e:
+                self.errors.append({"row": index, "errors": e.detail})
+        schedule = AircraftSchedule([flight for _, flight in built])
+        accepted = []
+        for index, flight in built:
+            conflict = schedule.book(flight)
+            if conflict:
+                message = CONFLICT_MESSAGE.format(*conflict)
+                self.errors.append({"row": index, "errors": {"aircraft": [message]}})
+            else:
+                accepted.append((index, flight))
+        try:
+            with transaction.atomic():
+                flights = Flight.objects.bulk_create([flight for _, flight in accepted])
+                flights_changed.send(
+                    sender=Flight,
+                    changes=[(None, flight.snapshot()) for flight in flights],
+                )
+        except IntegrityError as e:
+            if is_booking_conflict(e):
+                # a concurrent write booked one of the aircraft in the meantime
+                errors = {"aircraft": ["Conflicting booking."]}
+            else:
+                # e.g an airport or aircraft deleted in the meantime
+                errors = {"non_field_errors": ["Conflicting write."]}
+            for index, _ in accepted:
+                self.errors.append({"row": index, "errors": errors})
+            return
+        self.created += len(accepted)
+
+    def resolve(self, chunk):
+        icaos, serials = set(), set()
+        for _, row in chunk:
+            if not isinstance(row, dict):
+                continue
+            for field in ("departure", "arrival"):
+                if isinstance(row.get(field), str):
+                    icaos.add(row[field].strip().upper())
+            if isinstance(row.get("aircraft"), str):
+                serials.add(row["aircraft"].strip().upper())
+        icaos.difference_update(self.airports)
+        serials.difference_update(self.aircraft)
+        if icaos:
+            self.airports.update(
+                Airport.objects.annotate(key=Upper("icao"))
+                .filter(key__in=icaos)
+                .values_list("key", "uid")
+            )
+        if serials:
+            self.aircraft.update(
+                Aircraft.objects.annotate(key=Upper("serial_number"))
+                .filter(key__in=serials)
+                .values_list("key", "uid")
+            )
+
+    def reference(self, row, field, lookup, message, errors):
+        value = row.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors[field] = ["This field is required."]
+            return None
+        uid = lookup.get(value.strip().upper())
+        if uid is None:
+            errors[field] = [message]
+        return uid
+
+    def parse_datetime(self, value):
+        if not isinstance(value, str):
+            raise TypeError
+        value = parse_datetime(value)
+        if value is None:
+            raise ValueError
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, self.tz)
+        return value
+
+    def build(self, row):
+        if not isinstance(row, dict):
+            raise serializers.ValidationError({"non_field_errors": ["Invalid row."]})
+        errors = {}
+        departure = self.reference(
+            row, "departure", self.airports, "Airport With ICAO does not exist.", errors
+        )
+        arrival = self.reference(
+            row, "arrival", self.airports, "Airport With ICAO does not exist.", errors
+        )
+        aircraft = None
+        if row.get("aircraft"):
+            aircraft = self.reference(
+                row,
+                "aircraft",
+                self.aircraft,
+                "Aircraft with serial number does not exist.",
+                errors,
+            )
+        times = {}
+        for field in ("departure_dt", "arrival_dt"):
+            if not row.get(field):
+                errors[field] = ["This field is required."]
+                continue
+            try:
+                times[field] = self.parse_datetime(row[field])
+            except (TypeError, ValueError):
+                errors[field] = ["Datetime has wrong format."]
+        status = row.get("status") or Flight._meta.get_field("status").default
+        if row.get("status") and status not in STATUSES:
+            errors["status"] = [f'"{status}" is not a valid choice.']
+        if not errors and len(times) == 2:
+            try:
+                flight_times_validator(times["departure_dt"], times["arrival_dt"])
+            except serializers.ValidationError as e:
+                errors["non_field_errors"] = e.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        return Flight(
+            aircraft_id=aircraft,
+            departure_id=departure,
+            arrival_id=arrival,
+            departure_dt=times["departure_dt"],
+            arrival_dt=times["arrival_dt"],
+            departure_minute=minute_of_day(times["departure_dt"], self.tz),
+            status=status,
+        )
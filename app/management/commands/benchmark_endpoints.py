@@ -0,0 +1,178 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from app.authentication import RoleTokenObtainPairSerializer
+from app.models import Flight, User
+from app.seeding import START, Seeder
+from app.utils import format_datetime_str
+
+INTERVAL_FORMAT = "%Y-%m-%d %H:%M"
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Time the flight list and detail, the three flight search modes, the "
+        "departure search and departure flights at each of --sizes flights, "
+        "seeded with `seed_flights`'s generator in a throwaway test database. "
+        "Reports latency percentiles and query counts, --save writes them as "
+        "a baseline and --baseline compares against one, failing on latency "
+        "regressions over --tolerance and on any added query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000")
+        parser.add_argument("--requests", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--save", help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", help="Compare against this JSON file.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed p50 latency increase over the baseline, 0.25 is 25%%.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options["sizes"].split(","))
+        except ValueError:
+            raise CommandError("Invalid --sizes, expected e.g 1000,10000")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        results = {
+            "database": connection.vendor,
+            "seed": options["seed"],
+            "requests": options["requests"],
+            "sizes": results,
+        }
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write("\n")
+            self.stdout.write(f"results written to {options['save']}")
+        if baseline is not None:
+            self.compare(results, baseline, options["tolerance"])
+
+    def run(self, sizes, options):
+        seeder = Seeder(options["seed"], format_datetime_str(START))
+        seeder.seed_airports(200)
+        seeder.seed_aircraft(500)
+        user = User.objects.create_user(email="bench@nuvolar.com", password="bench")
+        # the token carries the role claim like the ones /api/login/ issues
+        token = RoleTokenObtainPairSerializer.get_token(user).access_token
+        client = Client(headers={"Authorization": f"Bearer {token}"})
+        results, seeded = {}, 0
+        for size in sizes:
+            seeder.seed_flights(size - seeded)
+            seeded = size
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{size} flights"))
+            results[str(size)] = {}
+            for name, paths in self.cases(seeder).items():
+                result = self.measure(client, paths, options)
+                results[str(size)][name] = result
+                self.stdout.write(
+                    f"{name:<24} p50 {result['p50_ms']:8.2f}ms  "
+                    f"p95 {result['p95_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+                    f"queries {result['queries']:3d}  rows {result['rows']}"
+                )
+        return results
+
+    def cases(self, seeder):
+        hub = seeder.airports[0]
+        day = seeder.start + timezone.timedelta(days=1)
+        interval = (
+            f"{day.strftime(INTERVAL_FORMAT)};"
+            f"{(day + timezone.timedelta(days=1)).strftime(INTERVAL_FORMAT)}"
+        )
+        uids = Flight.objects.order_by("uid").values_list("uid", flat=True)[:50]
+        return {
+            "flight list": ["/api/flight/"],
+            "flight detail": [f"/api/flight/{uid}/" for uid in uids],
+            "flight_search dept": [f"/api/flight/search/?dept={hub.icao.lower()}"],
+            "flight_search arr": [f"/api/flight/search/?arr={hub.icao.lower()}"],
+            "flight_search dept_rng": ["/api/flight/search/?dept_rng=07:00;07:30"],
+            "departure_search": [f"/api/departures/search/?interval={interval}"],
+            "departure_flights": [
+                f"/api/departures/flights/{hub.uid}/?interval={interval}"
+            ],
+        }
+
+    def measure(self, client, paths, options):
+        for i in range(options["warmup"]):
+            client.get(paths[i % len(paths)])
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = client.get(paths[0])
+        if response.status_code != 200:
+            raise CommandError(f"GET {paths[0]} returned {response.status_code}")
+        data = response.json()["data"]
+        latencies = []
+        for i in range(options["requests"]):
+            began = time.perf_counter()
+            client.get(paths[i % len(paths)])
+            latencies.append((time.perf_counter() - began) * 1000)
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return {
+            "p50_ms": round(percentile(0.5), 3),
+            "p95_ms": round(percentile(0.95), 3),
+            "p99_ms": round(percentile(0.99), 3),
+            "mean_ms": round(statistics.mean(latencies), 3),
+            "queries": len(queries),
+            "rows": len(data) if isinstance(data, list) else 1,
+        }
+
+    def compare(self, results, baseline, tolerance):
+        if baseline.get("database") != results["database"]:
+            self.stderr.write(
+                f"The baseline was recorded on {baseline.get('database')}, "
+                f"latencies are not comparable"
+            )
+        regressions = 0
+        self.stdout.write(self.style.MIGRATE_HEADING("Compared to the baseline"))
+        for size, cases in results["sizes"].items():
+            for name, result in cases.items():
+                base = baseline.get("sizes", {}).get(size, {}).get(name)
+                if base is None:
+                    continue
+                change = result["p50_ms"] / base["p50_ms"] - 1
+                problems = []
+                if change > tolerance:
+                    problems.append("slower")
+                if result["queries"] > base["queries"]:
+                    problems.append(f"{base['queries']} -> {result['queries']} queries")
+                line = f"{size:>8} {name:<24} p50 {change:+7.1%}"
+                if problems:
+                    regressions += 1
+                    self.stdout.write(
+                        self.style.ERROR(f"{line}  {', '.join(problems)}")
+                    )
+                else:
+                    self.stdout.write(line)
+        if regressions:
+            raise CommandError(f"{regressions} regressions against the baseline")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -0,0 +1,64 @@
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from app import fastpath
+from app.models import Flight
+from app.renderers import FastJSONRenderer
+from app.serializers import DepartureFlightSerializer, FlightListSerializer
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Compare the per row cost of the model serializers + stdlib JSON "
+        "renderer against the values fast path + FastJSONRenderer on the "
+        "first --rows flights (seed some with `explain_searches --seed`)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def best(self, func, repeat: int):
+        timings = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - began)
+        return min(timings), result
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        flights = Flight.objects.order_by("departure_dt", "uid")[:rows]
+        cases = [
+            ("FlightListSerializer", FlightListSerializer, fastpath.flight_list),
+            (
+                "DepartureFlightSerializer",
+                DepartureFlightSerializer,
+                fastpath.departure_flight,
+            ),
+        ]
+        for name, serializer_class, values_serializer in cases:
+            queryset = flights.select_related(
+                "aircraft", "departure__location", "arrival__location"
+            )
+
+            # the loop variables are bound as defaults, not looked up late
+            def slow(serializer_class=serializer_class, queryset=queryset):
+                data = serializer_class(queryset.all(), many=True).data
+                return JSONRenderer().render({"status": True, "data": data})
+
+            def fast(values_serializer=values_serializer):
+                data = values_serializer.data(flights.all())
+                return FastJSONRenderer().render({"status": True, "data": data})
+
+            slow_time, slow_body = self.best(slow, repeat)
+            fast_time, fast_body = self.best(fast, repeat)
+            count = len(values_serializer.data(flights.all())) or 1
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({count} rows)"))
+            self.stdout.write(
+                f"serializer: {slow_time / count * 1e6:.1f}us/row  "
+                f"fast path: {fast_time / count * 1e6:.1f}us/row  "
+                f"speedup: {slow_time / fast_time:.1f}x  "
+                f"identical output: {slow_body == fast_body}"
+            )
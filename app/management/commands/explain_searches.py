@@ -0,0 +1,128 @@
+import importlib
+import time
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from app.models import Aircraft, Airport, DepartureStats, Flight
+from app.seeding import Seeder
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Print the EXPLAIN plan and timings of the flight search queries. "
+        "Run it once more with --without-indexes to compare the plans "
+        "without the search indexes of migration 0004. Dropping them locks "
+        "app_flight and app_airport (ACCESS EXCLUSIVE on postgres) until the "
+        "queries ran, so it only runs with DEBUG on or --own-database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Insert this many random flights before running the queries.",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--without-indexes",
+            action="store_true",
+            help="Drop the indexes of migration 0004 in a transaction rolled "
+            "back once the queries ran, blocking every other query on the "
+            "flights and airports meanwhile.",
+        )
+        parser.add_argument(
+            "--own-database",
+            action="store_true",
+            help="Allow --without-indexes with DEBUG off, on a database no one "
+            "else uses.",
+        )
+
+    def handle(self, *args, **options):
+        if options["without_indexes"] and not (
+            settings.DEBUG or options["own_database"]
+        ):
+            raise CommandError(
+                "--without-indexes locks the flight and airport tables while "
+                "it runs, pass --own-database to run it with DEBUG off."
+            )
+        if options["seed"]:
+            self.seed(options["seed"], options["batch_size"])
+        if not options["without_indexes"]:
+            self.explain(options["repeat"])
+            return
+        with transaction.atomic():
+            self.drop_search_indexes()
+            self.explain(options["repeat"])
+            transaction.set_rollback(True)
+
+    def drop_search_indexes(self):
+        migration = importlib.import_module("app.migrations.0004_flight_search_indexes")
+        # the SQL only, the schema editor refuses to run in a transaction on sqlite
+        editor = connection.schema_editor(collect_sql=True)
+        with connection.cursor() as cursor:
+            for operation in migration.Migration.operations:
+                model = apps.get_model("app", operation.model_name)
+                cursor.execute(str(operation.index.remove_sql(model, editor)))
+
+    def explain(self, repeat: int):
+        airport = Airport.objects.order_by("icao").first()
+        aircraft = Aircraft.objects.order_by("serial_number").first()
+        if airport is None:
+            self.stderr.write("No airports found, run with --seed first.")
+            return
+        start = timezone.now()
+        end = start + timezone.timedelta(days=7)
+        queries = {
+            "flight_search dept": Flight.objects.filter(
+                departure__icao__iexact=airport.icao.lower()
+            ),
+            "flight_search arr": Flight.objects.filter(
+                arrival__icao__iexact=airport.icao.lower()
+            ),
+            "flight_search dept_rng": Flight.objects.filter(
+                departure_minute__gte=22 * 60, departure_minute__lte=23 * 60
+            ),
+            "departure_flights": Flight.objects.filter(
+                Q(departure_dt__gte=start)
+                & Q(arrival_dt__lte=end)
+                & Q(departure__uid=airport.uid)
+            ),
+            "aircraft schedule": Flight.objects.filter(
+                aircraft=aircraft, departure_dt__gte=start, departure_dt__lte=end
+            ),
+            "departure_search rollups": DepartureStats.objects.filter(
+                day__range=(start.date(), end.date())
+            ),
+        }
+        analyze = connection.vendor == "postgresql"
+        for name, queryset in queries.items():
+            queryset = queryset.values_list("pk", flat=True)
+            timings = []
+            for _ in range(repeat):
+                began = time.perf_counter()
+                rows = len(list(queryset.all()))
+                timings.append((time.perf_counter() - began) * 1000)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(
+                queryset.explain(analyze=analyze) if analyze else queryset.explain()
+            )
+            self.stdout.write(
+                f"rows={rows} best={min(timings):.2f}ms "
+                f"avg={sum(timings) / len(timings):.2f}ms\n"
+            )
+
+    def seed(self, count: int, batch_size: int):
+        seeder = Seeder(start=timezone.now(), batch_size=batch_size)
+        if not Airport.objects.exists():
+            seeder.seed_airports(200)
+        if not Aircraft.objects.exists():
+            seeder.seed_aircraft(500)
+        seeder.seed_flights(
+            count, progress=lambda n: self.stdout.write(f"seeded {n}/{count} flights")
+        )
@@ -0,0 +1,41 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from app.importer import FlightImporter, read_csv, read_ndjson
+
+
+class Command(BaseCommand):
+
+    help = "Bulk import flights from a CSV, NDJSON or JSON array file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, `-` reads from stdin.")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "ndjson", "json"),
+            help="Input format, guessed from the file extension by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] is not None and options["batch_size"] < 1:
+            raise CommandError("--batch-size must be >= 1")
+        path = options["path"]
+        fmt = options["format"] or path.rsplit(".", 1)[-1].lower()
+        if fmt not in ("csv", "ndjson", "json"):
+            raise CommandError("Unable to guess the format, pass --format.")
+        stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+        with stream:
+            if fmt == "csv":
+                rows = read_csv(stream)
+            elif fmt == "ndjson":
+                rows = read_ndjson(stream)
+            else:
+                rows = json.load(stream)
+            result = FlightImporter(options["batch_size"]).run(rows)
+        for error in result["errors"]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(
+            self.style.SUCCESS(f"{result['created']} flights imported")
+            + f", {len(result['errors'])} rows rejected"
+        )
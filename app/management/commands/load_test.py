@@ -0,0 +1,127 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Client:
+    """Minimal keep-alive HTTP/1.1 client, one connection per instance."""
+
+    def __init__(self, host: str, port: int, request: bytes):
+        self.host, self.port, self.request = host, port, request
+        self.reader = self.writer = None
+
+    async def get(self):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        self.writer.write(self.request)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, value = line.decode("latin1").split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        else:
+            await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Send --requests GET requests to URL from --concurrency clients and "
+        "report the throughput and latency percentiles, to compare a WSGI "
+        "worker against an ASGI one (ASYNC_VIEWS) serving the same endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--token", help="JWT access token of the requests")
+
+    async def client(self, client, count, latencies, statuses):
+        for _ in range(count):
+            began = time.perf_counter()
+            try:
+                status = await client.get()
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                client.close()
+                status = 0
+            latencies.append(time.perf_counter() - began)
+            statuses[status] = statuses.get(status, 0) + 1
+        client.close()
+
+    async def run(self, url, concurrency, total, token):
+        path = url.path or "/"
+        if url.query:
+            path = f"{path}?{url.query}"
+        lines = [f"GET {path} HTTP/1.1", f"Host: {url.netloc}", "Accept: */*"]
+        if token:
+            lines.append(f"Authorization: Bearer {token}")
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode()
+        latencies, statuses = [], {}
+        counts = [total // concurrency] * concurrency
+        for i in range(total % concurrency):
+            counts[i] += 1
+        began = time.perf_counter()
+        await asyncio.gather(
+            *(
+                self.client(
+                    Client(url.hostname, url.port or 80, request),
+                    count,
+                    latencies,
+                    statuses,
+                )
+                for count in counts
+            )
+        )
+        return time.perf_counter() - began, latencies, statuses
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("Expected an http:// URL")
+        concurrency = max(1, min(options["concurrency"], options["requests"]))
+        elapsed, latencies, statuses = asyncio.run(
+            self.run(url, concurrency, options["requests"], options["token"])
+        )
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e3
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"{len(latencies)} requests, {concurrency} concurrent clients"
+            )
+        )
+        self.stdout.write(
+            "statuses: "
+            + ", ".join(f"{status}: {n}" for status, n in sorted(statuses.items()))
+        )
+        self.stdout.write(f"throughput: {len(latencies) / elapsed:.1f} req/s")
+        self.stdout.write(
+            f"latency: mean {statistics.mean(latencies) * 1e3:.1f}ms  "
+            f"p50 {percentile(0.5):.1f}ms  p95 {percentile(0.95):.1f}ms  "
+            f"p99 {percentile(0.99):.1f}ms  max {latencies[-1] * 1e3:.1f}ms"
+        )
@@ -0,0 +1,30 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from app import schedules
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Expand the recurring schedules into flights up to the horizon "
+        "(SCHEDULE_HORIZON_DAYS ahead). Run it at least daily, e.g from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Horizon in days, SCHEDULE_HORIZON_DAYS by default.",
+        )
+
+    def handle(self, *args, **options):
+        until = None
+        if options["days"] is not None:
+            until = timezone.now() + timedelta(days=options["days"])
+        created, skipped = schedules.materialize_all(until)
+        self.stdout.write(self.style.SUCCESS(f"{created} flights created"))
+        if skipped:
+            self.stderr.write(
+                f"{skipped} occurrences skipped, their aircraft is already booked"
+            )
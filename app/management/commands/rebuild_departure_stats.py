@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from app import stats
+
+
+class Command(BaseCommand):
+
+    help = "Recompute the per airport and day departure rollups from the flights."
+
+    def handle(self, *args, **options):
+        count = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{count} departure rollups rebuilt"))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from app.bulk import delete_rows
+from app.models import Aircraft, Airport, Flight, Location
+from app.seeding import START, Seeder
+from app.utils import format_datetime_str
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Generate synthetic airports, aircraft and flights with bulk inserts. "
+        "The same --seed, --start and counts generate the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("flights", type=int, help="Number of flights to create.")
+        parser.add_argument("--airports", type=int, default=200)
+        parser.add_argument("--aircraft", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--start",
+            default=START,
+            help="First departure day, `YYYY-MM-DD HH:MM`.",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete every flight, aircraft and airport first.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = format_datetime_str(options["start"])
+        except ValueError:
+            raise CommandError("Invalid --start, expected YYYY-MM-DD HH:MM")
+        if options["clear"]:
+            with transaction.atomic():
+                delete_rows(Flight.objects.all())
+                Airport.objects.all().delete()
+                Location.objects.all().delete()
+                Aircraft.objects.all().delete()
+        seeder = Seeder(options["seed"], start, options["batch_size"])
+        seeder.seed_airports(options["airports"])
+        seeder.seed_aircraft(options["aircraft"])
+        self.stdout.write(
+            f"seeded {options['airports']} airports, {options['aircraft']} aircraft"
+        )
+        count = options["flights"]
+        seeder.seed_flights(
+            count, progress=lambda n: self.stdout.write(f"seeded {n}/{count} flights")
+        )
+        self.stdout.write(self.style.SUCCESS(f"{count} flights seeded"))
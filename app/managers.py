@@ -1,4 +1,5 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 
@@ -29,3 +30,17 @@ class UserManager(BaseUserManager):
         if extra_fields.get("is_superuser") is not True:
             raise ValueError(_("Superuser must have is_superuser=True."))
         return self.create_user(email, password, **extra_fields)
+
+
+class FlightQuerySet(models.QuerySet):
+    def with_related(self):
+        """
+        Join the aircraft and both airports (with their locations) rendered by
+        the flight list serializers, so listing flights costs a single query.
+        """
+        return self.select_related(
+            "aircraft", "departure__location", "arrival__location"
+        )
+
+
+FlightManager = models.Manager.from_queryset(FlightQuerySet)
@@ -0,0 +1,257 @@
+import bisect
+import logging
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """Prometheus histogram, one series of bucket counts per label values."""
+
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name, self.help, self.buckets = name, help, buckets
+        # labels -> [count per bucket..., count over the last bucket, sum]
+        self.series = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, label_names: tuple):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self.series.items()):
+            pairs = format_labels(label_names, labels)
+            count = 0
+            for bound, n in zip(self.buckets + ("+Inf",), series):
+                count += n
+                yield f'{self.name}_bucket{{{pairs},le="{bound}"}} {count}'
+            yield f"{self.name}_sum{{{pairs}}} {series[-1]}"
+            yield f"{self.name}_count{{{pairs}}} {count}"
+
+
+def format_labels(names, values):
+    def escape(value):
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+class Registry:
+    """
+    In-process aggregate of the request metrics, per view and method. Every
+    process (e.g gunicorn worker) keeps its own.
+    """
+
+    labels = ("view", "method")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.duration = Histogram(
+            "http_request_duration_seconds", "Request latency.", SECONDS
+        )
+        self.queries = Histogram(
+            "http_request_db_queries", "Database queries per request.", QUERIES
+        )
+        self.db_time = Histogram(
+            "http_request_db_seconds", "Time spent in database queries.", SECONDS
+        )
+        self.serialize_time = Histogram(
+            "http_request_serialize_seconds",
+            "Time spent serializing and rendering the response body.",
+            SECONDS,
+        )
+        self.responses = {}
+
+    def record(self, labels: tuple, status_code: int, metrics, duration: float):
+        with self.lock:
+            self.duration.observe(labels, duration)
+            self.queries.observe(labels, metrics.queries)
+            self.db_time.observe(labels, metrics.db_time)
+            self.serialize_time.observe(labels, metrics.serialize_time)
+            key = labels + (str(status_code),)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def render(self) -> str:
+        with self.lock:
+            lines = [
+                "# HELP http_responses_total Responses per status code.",
+                "# TYPE http_responses_total counter",
+            ]
+            for key, count in sorted(self.responses.items()):
+                pairs = format_labels(self.labels + ("status",), key)
+                lines.append(f"http_responses_total{{{pairs}}} {count}")
+            for histogram in (
+                self.duration,
+                self.queries,
+                self.db_time,
+                self.serialize_time,
+            ):
+                lines.extend(histogram.render(self.labels))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Query count and timings of the request being served."""
+
+    __slots__ = ("began", "queries", "db_time", "serialize_time", "log", "slow_at")
+
+    def __init__(self, slow_ms: float = 0):
+        self.began = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        # (sql, seconds, stack) of each query for the slow request log, the
+        # stack only of the queries ending once the request is already slow
+        self.log = [] if slow_ms else None
+        self.slow_at = self.began + slow_ms / 1000
+
+
+# Context variables are copied into the threads of `sync_to_async`, so the
+# queries of async views are counted on the request that runs them.
+current = ContextVar("request_metrics", default=None)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ended = time.perf_counter()
+        metrics.queries += 1
+        metrics.db_time += ended - began
+        if metrics.log is not None:
+            slow = ended >= metrics.slow_at
+            stack = traceback.extract_stack() if slow else None
+            metrics.log.append((sql, ended - began, stack))
+
+
+def install(sender, connection, **kwargs):
+    """
+    `connection_created` receiver wrapping the queries of every connection,
+    which are per thread and so cannot be wrapped per request by the
+    middleware of an async request.
+    """
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, execute_wrapper)
+
+
+def timed(func):
+    """Count the time spent in `func` as serialization time of the request."""
+
+    @wraps(func)
+    def inner(*args, **kwargs):
+        metrics = current.get()
+        if metrics is None:
+            return func(*args, **kwargs)
+        began = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.serialize_time += time.perf_counter() - began
+
+    return inner
+
+
+def view_label(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.view_name or match.route
+
+
+def format_stack(stack):
+    # frames of the project, not of Django or other libraries
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame
+        for frame in stack
+        if frame.filename.startswith(base) and "site-packages" not in frame.filename
+    ]
+    return "".join(traceback.format_list(frames))
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, query count and database and serialization times of
+    every request in `registry`, and log the requests slower than
+    SLOW_REQUEST_MS with their queries and where the ones run once the
+    request was over the threshold were run from.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics(settings.SLOW_REQUEST_MS)
+        token = current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(settings.SLOW_REQUEST_MS)
+        token = current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    def finish(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.began
+        method = request.method if request.method in METHODS else "other"
+        labels = (view_label(request), method)
+        registry.record(labels, response.status_code, metrics, duration)
+        if metrics.log is not None and duration * 1000 >= settings.SLOW_REQUEST_MS:
+            self.log_slow_request(request, response, metrics, duration)
+
+    def log_slow_request(self, request, response, metrics, duration):
+        lines = [
+            f"Slow request {request.method} {request.get_full_path()} "
+            f"{response.status_code} {duration * 1000:.1f}ms, "
+            f"{metrics.queries} queries in {metrics.db_time * 1000:.1f}ms"
+        ]
+        for sql, elapsed, stack in metrics.log:
+            lines.append(f"{elapsed * 1000:.1f}ms {sql}")
+            if stack is not None:
+                lines.append(format_stack(stack).rstrip())
+        logger.warning("\n".join(lines))
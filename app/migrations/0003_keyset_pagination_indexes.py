@@ -0,0 +1,56 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_alter_flight_status'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='aircraft',
+            name='deleted_at',
+        ),
+        migrations.RemoveField(
+            model_name='airport',
+            name='deleted_at',
+        ),
+        migrations.RemoveField(
+            model_name='flight',
+            name='deleted_at',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='deleted_at',
+        ),
+        migrations.AlterField(
+            model_name='aircraft',
+            name='serial_number',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='airport',
+            name='icao',
+            field=models.CharField(max_length=10, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'scheduled'), ('departed', 'departed'), ('arrived', 'arrived'), ('cancelled', 'cancelled')], default='pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='aircraft',
+            index=models.Index(fields=['created_at', 'uid'], name='app_aircraf_created_e4e5eb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='airport',
+            index=models.Index(fields=['created_at', 'uid'], name='app_airport_created_b1576f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_dt', 'uid'], name='app_flight_departu_91e085_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:45
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='airport',
+            index=models.Index(django.db.models.functions.text.Upper('icao'), name='app_airport_icao_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure', 'departure_dt'], name='app_flight_departu_c6d583_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['arrival', 'departure_dt'], name='app_flight_arrival_c2fb08_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['aircraft', 'departure_dt'], name='app_flight_aircraf_b23e1d_idx'),
+        ),
+    ]
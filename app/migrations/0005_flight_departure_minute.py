@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:46
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+
+def fill_departure_minute(apps, schema_editor):
+    Flight = apps.get_model("app", "Flight")
+    Flight.objects.update(
+        departure_minute=ExtractHour("departure_dt") * 60
+        + ExtractMinute("departure_dt")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_flight_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='departure_minute',
+            field=models.PositiveSmallIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_departure_minute, migrations.RunPython.noop),
+    ]
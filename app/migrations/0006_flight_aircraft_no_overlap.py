@@ -0,0 +1,35 @@
+from django.db import migrations
+
+CREATE_CONSTRAINT = """
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE app_flight ADD CONSTRAINT app_flight_aircraft_no_overlap
+    EXCLUDE USING gist (aircraft_id WITH =, tstzrange(departure_dt, arrival_dt) WITH &&)
+    WHERE (aircraft_id IS NOT NULL AND status <> 'cancelled');
+"""
+
+DROP_CONSTRAINT = """
+ALTER TABLE app_flight DROP CONSTRAINT IF EXISTS app_flight_aircraft_no_overlap;
+"""
+
+
+def run_on_postgres(sql):
+    # Exclusion constraints are postgres only, other databases rely on the
+    # checks done by the serializers and the importer.
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(sql)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_flight_departure_minute'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgres(CREATE_CONSTRAINT), run_on_postgres(DROP_CONSTRAINT)
+        ),
+    ]
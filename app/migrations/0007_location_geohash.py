@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from app.utils import encode_geohash
+
+
+def fill_geohash(apps, schema_editor):
+    Location = apps.get_model("app", "Location")
+    locations = list(Location.objects.only("lat", "lng"))
+    for location in locations:
+        location.geohash = encode_geohash(float(location.lat), float(location.lng))
+    Location.objects.bulk_update(locations, ["geohash"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_flight_aircraft_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
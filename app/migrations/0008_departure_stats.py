@@ -0,0 +1,36 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_location_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartureStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('flight_count', models.IntegerField(default=0)),
+                ('inflight_seconds', models.BigIntegerField(default=0)),
+                ('scheduled_count', models.IntegerField(default=0)),
+                ('departed_count', models.IntegerField(default=0)),
+                ('arrived_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('departure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departure_stats', to='app.airport')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='departurestats',
+            index=models.Index(fields=['day'], name='app_departu_day_d802d9_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='departurestats',
+            unique_together={('departure', 'day')},
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_departure_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight', models.UUIDField()),
+                ('kind', models.CharField(choices=[('created', 'created'), ('updated', 'updated'), ('deleted', 'deleted')], max_length=10)),
+                ('status', models.CharField(max_length=10)),
+                ('previous_status', models.CharField(max_length=10, null=True)),
+                ('aircraft', models.UUIDField(null=True)),
+                ('departure', models.UUIDField()),
+                ('arrival', models.UUIDField()),
+                ('departure_dt', models.DateTimeField()),
+                ('arrival_dt', models.DateTimeField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='flightchange',
+            index=models.Index(fields=['departure', 'id'], name='app_flightc_departu_d2cff9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightchange',
+            index=models.Index(fields=['arrival', 'id'], name='app_flightc_arrival_de25a7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightchange',
+            index=models.Index(fields=['aircraft', 'id'], name='app_flightc_aircraf_2faed1_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:53
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_flight_change_log'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aircraft',
+            index=models.Index(django.db.models.functions.text.Upper('serial_number'), name='app_aircraft_serial_upper_idx'),
+        ),
+    ]
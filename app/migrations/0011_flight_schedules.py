@@ -0,0 +1,58 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_aircraft_serial_number_upper_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Schedule',
+            fields=[
+                ('uid', models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('days', models.CharField(default='1234567', max_length=7)),
+                ('departure_time', models.TimeField()),
+                ('block_time', models.DurationField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(null=True)),
+                ('materialized_until', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='aircraft',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='app.aircraft'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='arrival',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='schedule_arrivals', to='app.airport'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='departure',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='schedule_departures', to='app.airport'),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='schedule',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='flights', to='app.schedule'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['created_at', 'uid'], name='app_schedul_created_ff735a_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='flight',
+            constraint=models.UniqueConstraint(fields=('schedule', 'departure_dt'), name='app_flight_schedule_unique'),
+        ),
+    ]
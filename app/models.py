@@ -1,8 +1,10 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 import uuid
 from django.contrib.auth.models import AbstractUser
-from .managers import UserManager
+from .managers import FlightManager, UserManager
+from .utils import encode_geohash, minute_of_day
 
 
 class BaseModel(models.Model):
@@ -40,6 +42,12 @@ class Location(models.Model):
     country = models.CharField(max_length=100)
     lat = models.DecimalField(max_digits=12, decimal_places=4)
     lng = models.DecimalField(max_digits=12, decimal_places=4)
+    # grid cell of the point, kept in sync on save for prefix (area) lookups
+    geohash = models.CharField(max_length=12, db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.geohash = encode_geohash(float(self.lat), float(self.lng))
+        return super().save(*args, **kwargs)
 
 
 class Airport(BaseModel):
@@ -48,6 +56,13 @@ class Airport(BaseModel):
     icao = models.CharField(max_length=10, unique=True)
     location = models.OneToOneField(Location, on_delete=models.SET_NULL, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "uid"]),
+            # icao__iexact lookups compile to UPPER("icao") = UPPER(%s)
+            models.Index(Upper("icao"), name="app_airport_icao_upper_idx"),
+        ]
+
     def __str__(self) -> str:
         return self.icao
 
@@ -57,6 +72,39 @@ class Aircraft(BaseModel):
     serial_number = models.CharField(max_length=100, unique=True)
     manufacturer = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "uid"]),
+            # serial_number__iexact lookups compile to UPPER("serial_number") = UPPER(%s)
+            models.Index(Upper("serial_number"), name="app_aircraft_serial_upper_idx"),
+        ]
+
+
+class Schedule(BaseModel):
+
+    """Recurring flight, expanded into flights by schedules.py"""
+
+    aircraft = models.ForeignKey(
+        Aircraft, on_delete=models.SET_NULL, null=True, related_name="schedules"
+    )
+    departure = models.ForeignKey(
+        Airport, on_delete=models.DO_NOTHING, related_name="schedule_departures"
+    )
+    arrival = models.ForeignKey(
+        Airport, on_delete=models.DO_NOTHING, related_name="schedule_arrivals"
+    )
+    # ISO weekdays of operation, 1 (Monday) to 7 (Sunday), e.g "12345"
+    days = models.CharField(max_length=7, default="1234567")
+    departure_time = models.TimeField()
+    block_time = models.DurationField()
+    start_date = models.DateField()
+    end_date = models.DateField(null=True)
+    # occurrences departing from then on are not flights yet
+    materialized_until = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["created_at", "uid"])]
+
 
 class Flight(BaseModel):
 
@@ -79,6 +127,112 @@ class Flight(BaseModel):
     departure_dt = models.DateTimeField()
     arrival_dt = models.DateTimeField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    # schedule the flight was expanded from, see schedules.py
+    schedule = models.ForeignKey(
+        Schedule,
+        on_delete=models.SET_NULL,
+        null=True,
+        editable=False,
+        related_name="flights",
+    )
+    # departure time of day in minutes, kept in sync on save for range searches
+    departure_minute = models.PositiveSmallIntegerField(
+        null=True, editable=False, db_index=True
+    )
+
+    objects = FlightManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["departure_dt", "uid"]),
+            models.Index(fields=["departure", "departure_dt"]),
+            models.Index(fields=["arrival", "departure_dt"]),
+            models.Index(fields=["aircraft", "departure_dt"]),
+        ]
+        constraints = [
+            # an occurrence of a schedule is expanded once
+            models.UniqueConstraint(
+                fields=["schedule", "departure_dt"], name="app_flight_schedule_unique"
+            )
+        ]
+
+    # fields sent with `flights_changed`, see signals.py
+    SNAPSHOT_FIELDS = (
+        "uid",
+        "aircraft_id",
+        "departure_id",
+        "arrival_id",
+        "departure_dt",
+        "arrival_dt",
+        "status",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the stored values so updates can report what they replace
+        if not instance.get_deferred_fields():
+            instance._snapshot = instance.snapshot()
+        return instance
+
+    def snapshot(self):
+        return {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS}
+
+    def save(self, *args, **kwargs):
+        self.departure_minute = minute_of_day(self.departure_dt)
+        return super().save(*args, **kwargs)
 
     def get_inflight_time(self):
         return (self.arrival_dt - self.departure_dt).total_seconds() / 60
+
+
+class DepartureStats(models.Model):
+
+    """Rollup of the flights leaving an airport on a day, see stats.py"""
+
+    departure = models.ForeignKey(
+        Airport, on_delete=models.CASCADE, related_name="departure_stats"
+    )
+    # local date of the departures
+    day = models.DateField()
+    flight_count = models.IntegerField(default=0)
+    inflight_seconds = models.BigIntegerField(default=0)
+    scheduled_count = models.IntegerField(default=0)
+    departed_count = models.IntegerField(default=0)
+    arrived_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("departure", "day")
+        indexes = [models.Index(fields=["day"])]
+
+
+class FlightChange(models.Model):
+
+    """Append-only log of flight schedule and status changes, see feed.py"""
+
+    KIND_CHOICES = (
+        ("created", "created"),
+        ("updated", "updated"),
+        ("deleted", "deleted"),
+    )
+
+    # the id is the resume cursor of the change feed
+    flight = models.UUIDField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10)
+    previous_status = models.CharField(max_length=10, null=True)
+    # flight values after the change, before it for deletions
+    aircraft = models.UUIDField(null=True)
+    departure = models.UUIDField()
+    arrival = models.UUIDField()
+    departure_dt = models.DateTimeField()
+    arrival_dt = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["departure", "id"]),
+            models.Index(fields=["arrival", "id"]),
+            models.Index(fields=["aircraft", "id"]),
+        ]
@@ -0,0 +1,93 @@
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a two column ordering.
+
+    Pages are fetched with `WHERE (a, b) > (last_a, last_b) ORDER BY a, b`
+    so the cost of a page does not depend on how deep the client has paged.
+    The position is handed to the client as an opaque cursor token.
+    """
+
+    ordering = ("created_at", "uid")
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        page_size = settings.PAGE_SIZE
+        value = request.GET.get(self.page_size_query_param)
+        if value:
+            try:
+                page_size = int(value)
+            except ValueError:
+                raise InvalidCursor("Invalid page size")
+            if page_size < 1:
+                raise InvalidCursor("Invalid page size")
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, obj):
+        # pages are model instances, or dicts on `.values()` querysets
+        get = obj.get if isinstance(obj, dict) else obj.__getattribute__
+        position = [str(get(field)) for field in self.ordering]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, token, model):
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if len(position) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise InvalidCursor("Invalid cursor")
+
+    def page_queryset(self, queryset, request):
+        """The rows of the requested page plus one, to tell if there is a next page."""
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        token = request.GET.get(self.cursor_query_param)
+        if token:
+            first, second = self.decode_cursor(token, queryset.model)
+            queryset = queryset.filter(
+                Q(**{f"{self.ordering[0]}__gt": first})
+                | Q(**{self.ordering[0]: first, f"{self.ordering[1]}__gt": second})
+            )
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, page):
+        self.has_next = len(page) > self.page_size
+        page = page[: self.page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        page = [row async for row in self.page_queryset(queryset, request)]
+        return self.set_page(page)
+
+    def get_paginated_data(self, data):
+        return {"status": True, "data": data, "next": self.next_cursor}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+class FlightPagination(KeysetPagination):
+    ordering = ("departure_dt", "uid")
@@ -0,0 +1,250 @@
+import math
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .cache import LocalIndex
+from .models import Flight
+
+
+class Timetable:
+    """
+    Flights as connections (departure, uid, arrival, from, to) sorted by
+    departure time, with times as timestamps. Journeys are searched with the
+    connection scan algorithm: a single pass over the connections departing
+    in the time window, tracking the earliest arrival at each airport for
+    every number of legs.
+
+    Connections are kept in one sorted bucket per departure day. A copy
+    shares the buckets with the original and a bucket is only copied the
+    first time the copy writes to it, so applying a change costs the size of
+    the days it touches rather than the whole timetable.
+    """
+
+    bucket_seconds = 24 * 60 * 60
+
+    def __init__(self, rows=()):
+        self.buckets = {}  # departure day -> connections sorted by departure
+        for row in rows:
+            connection = self.connection(row)
+            self.buckets.setdefault(self.day(connection[0]), []).append(connection)
+        for bucket in self.buckets.values():
+            bucket.sort()
+        self.days = sorted(self.buckets)
+        self.owned = set(self.days)  # buckets not shared with another copy
+
+    @staticmethod
+    def connection(row):
+        return (
+            row["departure_dt"].timestamp(),
+            row["uid"],
+            row["arrival_dt"].timestamp(),
+            row["departure_id"],
+            row["arrival_id"],
+        )
+
+    def day(self, departure: float) -> int:
+        return int(departure // self.bucket_seconds)
+
+    def __iter__(self):
+        for day in self.days:
+            yield from self.buckets[day]
+
+    def copy(self):
+        timetable = Timetable()
+        timetable.buckets = self.buckets.copy()
+        timetable.days = self.days.copy()
+        # neither side may now write to the shared buckets in place
+        self.owned = set()
+        return timetable
+
+    def writable(self, day: int):
+        bucket = self.buckets.get(day)
+        if bucket is None:
+            bucket = self.buckets[day] = []
+            insort(self.days, day)
+        elif day not in self.owned:
+            bucket = self.buckets[day] = bucket.copy()
+        self.owned.add(day)
+        return bucket
+
+    def add(self, row):
+        connection = self.connection(row)
+        insort(self.writable(self.day(connection[0])), connection)
+
+    def remove(self, uid, departure: float):
+        """Remove the flight `uid` if it departs at the `departure` timestamp."""
+        day = self.day(departure)
+        bucket = self.buckets.get(day, ())
+        i = bisect_left(bucket, (departure, uid))
+        if i < len(bucket) and bucket[i][1] == uid:
+            del self.writable(day)[i]
+
+    def prune(self, before: float):
+        """Remove the connections departing before the `before` timestamp."""
+        day = self.day(before)
+        end = bisect_left(self.days, day)
+        for old in self.days[:end]:
+            del self.buckets[old]
+            self.owned.discard(old)
+        del self.days[:end]
+        bucket = self.buckets.get(day)
+        if bucket and bucket[0][0] < before:
+            del self.writable(day)[: bisect_left(bucket, (before,))]
+
+    def scan(self, after, strict: bool = False):
+        """
+        Yield the connections sorted from the `after` tuple on, excluding a
+        connection equal to it when `strict`.
+        """
+        search = bisect_right if strict else bisect_left
+        days = self.days
+        for i in range(bisect_left(days, self.day(after[0])), len(days)):
+            bucket = self.buckets[days[i]]
+            for j in range(search(bucket, after), len(bucket)):
+                yield bucket[j]
+
+    def earliest(self, origin, destination, connections, end, min_connection, max_legs):
+        """
+        Return the earliest arriving journey from `origin` to `destination`
+        as a list of connections, using at most `max_legs` flights and only
+        those of the sorted `connections` that arrive by `end`.
+        """
+        inf = math.inf
+        # best[airport][k]: earliest arrival using at most k flights
+        best = {origin: [-inf] + [inf] * max_legs}
+        parent = {}
+        target = inf
+        for connection in connections:
+            departure, _, arrival, source, to = connection
+            if departure > end or departure >= target:
+                break
+            labels = best.get(source)
+            if labels is None or arrival > end or to == origin:
+                continue
+            # fewest flights after which this one can still be boarded
+            for k in range(max_legs):
+                ready = labels[k] if k == 0 else labels[k] + min_connection
+                if ready <= departure:
+                    break
+            else:
+                continue
+            arrivals = best.get(to)
+            if arrivals is None:
+                arrivals = best[to] = [inf] * (max_legs + 1)
+            for legs in range(k + 1, max_legs + 1):
+                if arrival >= arrivals[legs]:
+                    break
+                arrivals[legs] = arrival
+                parent[to, legs] = (connection, k)
+            if to == destination:
+                target = arrivals[max_legs]
+        if target == inf:
+            return None
+        journey, node = [], (destination, max_legs)
+        while node in parent:
+            connection, legs = parent[node]
+            journey.append(connection)
+            node = (connection[3], legs)
+        return journey[::-1]
+
+    def search(self, origin, destination, start, end, min_connection, max_legs, limit):
+        """
+        Return up to `limit` journeys departing after `start` and arriving by
+        `end`, each the earliest arriving one that leaves later than the first
+        flight of the previous journey.
+        """
+        journeys = []
+        connections = self.scan((start,))
+        while len(journeys) < limit:
+            journey = self.earliest(
+                origin, destination, connections, end, min_connection, max_legs
+            )
+            if journey is None:
+                break
+            journeys.append(journey)
+            connections = self.scan(journey[0], strict=True)
+        return journeys
+
+
+class RouteGraph(LocalIndex):
+    """
+    Timetable of the flights that are not cancelled departing at most
+    ROUTE_HISTORY_HOURS ago, earlier ones are dropped as changes come in.
+    """
+
+    name = "routes:flights"
+
+    @staticmethod
+    def since():
+        return timezone.now() - timedelta(hours=settings.ROUTE_HISTORY_HOURS)
+
+    def build(self):
+        return Timetable(
+            Flight.objects.exclude(status="cancelled")
+            .filter(departure_dt__gte=self.since())
+            .values(*Flight.SNAPSHOT_FIELDS)
+            .iterator()
+        )
+
+    def copy(self, timetable):
+        return timetable.copy()
+
+    def apply(self, timetable, changes):
+        since = self.since()
+        for before, after in changes:
+            # removing the new state too keeps replayed changes idempotent
+            for snapshot in (before, after):
+                if snapshot is not None:
+                    timetable.remove(
+                        snapshot["uid"], snapshot["departure_dt"].timestamp()
+                    )
+            if after is not None:
+                if after["status"] != "cancelled" and after["departure_dt"] >= since:
+                    timetable.add(after)
+        timetable.prune(since.timestamp())
+
+    def search(
+        self,
+        origin,
+        destination,
+        start,
+        end,
+        min_connection,
+        max_legs,
+        limit,
+        pending=(),
+    ):
+        """
+        Return up to `limit` journeys between two airport uids inside the
+        [start, end] datetimes as lists of flight uids. Flights that departed
+        more than ROUTE_HISTORY_HOURS ago are not searched. The `pending`
+        unsaved flights of `schedules.pending` are searched as well and
+        appear in the journeys themselves, in place of a uid.
+        """
+        timetable = self.get()
+        occurrences = {}
+        if pending:
+            # the copy only copies the days the occurrences depart on
+            timetable = timetable.copy()
+            for flight in pending:
+                key = uuid.uuid5(flight.schedule_id, flight.departure_dt.isoformat())
+                occurrences[key] = flight
+                timetable.add({**flight.snapshot(), "uid": key})
+        journeys = timetable.search(
+            origin,
+            destination,
+            max(start, self.since()).timestamp(),
+            end.timestamp(),
+            min_connection.total_seconds(),
+            max_legs,
+            limit,
+        )
+        return [
+            [occurrences.get(connection[1], connection[1]) for connection in journey]
+            for journey in journeys
+        ]
+
+
+graph = RouteGraph()
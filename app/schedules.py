@@ -0,0 +1,254 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from . import signals
+from .cache import LocalIndex
+from .models import Flight, Schedule
+from .scheduling import AircraftSchedule
+from .utils import minute_of_day
+
+logger = logging.getLogger(__name__)
+
+
+def horizon(now: datetime = None):
+    """End of the rolling window schedules are expanded into flights for."""
+    now = now or timezone.now()
+    return now + timedelta(days=settings.SCHEDULE_HORIZON_DAYS)
+
+
+def midnight(day):
+    """Start of the local `day`."""
+    tz = timezone.get_default_timezone()
+    return timezone.make_aware(datetime.combine(day, time.min), tz)
+
+
+def search_limit(now: datetime = None):
+    """
+    End of the window searches expand the occurrences that are not flights
+    yet in, later ones are left out. It is the start of the day
+    SCHEDULE_SEARCH_DAYS days ahead, so it only moves at midnight.
+    """
+    tz = timezone.get_default_timezone()
+    day = timezone.localdate(now or timezone.now(), tz)
+    return midnight(day + timedelta(days=settings.SCHEDULE_SEARCH_DAYS))
+
+
+def search_moved(now: datetime = None):
+    """When the `search_limit` last moved, the start of the current day."""
+    tz = timezone.get_default_timezone()
+    return midnight(timezone.localdate(now or timezone.now(), tz))
+
+
+def departure(schedule: Schedule, day):
+    """Departure datetime of the occurrence of `schedule` on `day`."""
+    tz = timezone.get_default_timezone()
+    return timezone.make_aware(datetime.combine(day, schedule.departure_time), tz)
+
+
+def operating_days(schedule: Schedule, start: datetime, end: datetime):
+    """First and last local dates of `schedule` covering [start, end)."""
+    tz = timezone.get_default_timezone()
+    first = max(schedule.start_date, timezone.localdate(start, tz))
+    last = timezone.localdate(end, tz)
+    if schedule.end_date is not None:
+        last = min(last, schedule.end_date)
+    return first, last
+
+
+def occurrences(schedule: Schedule, start: datetime, end: datetime):
+    """Departure datetimes of `schedule` in [start, end), in order."""
+    first, last = operating_days(schedule, start, end)
+    days = {int(day) for day in schedule.days}
+    day = first
+    while day <= last:
+        if day.isoweekday() in days:
+            departure_dt = departure(schedule, day)
+            if start <= departure_dt < end:
+                yield departure_dt
+        day += timedelta(days=1)
+
+
+def count(schedule: Schedule, start: datetime, end: datetime):
+    """Number of `occurrences` of `schedule` in [start, end), counted by week."""
+    first, last = operating_days(schedule, start, end)
+    if first > last:
+        return 0
+    days = {int(day) for day in schedule.days}
+    weeks, rest = divmod((last - first).days + 1, 7)
+    total = weeks * len(days)
+    for offset in range(rest):
+        total += (first + timedelta(days=weeks * 7 + offset)).isoweekday() in days
+    # the occurrences of the first and last days may fall outside [start, end)
+    for day in {first, last}:
+        if day.isoweekday() in days and not start <= departure(schedule, day) < end:
+            total -= 1
+    return total
+
+
+def flight(schedule: Schedule, departure_dt: datetime, **kwargs):
+    """Unsaved flight of the occurrence of `schedule` departing at `departure_dt`."""
+    return Flight(
+        schedule=schedule,
+        aircraft=schedule.aircraft,
+        departure=schedule.departure,
+        arrival=schedule.arrival,
+        departure_dt=departure_dt,
+        arrival_dt=departure_dt + schedule.block_time,
+        departure_minute=minute_of_day(departure_dt),
+        status="scheduled",
+        **kwargs,
+    )
+
+
+def active(start: datetime, end: datetime):
+    """Schedules with occurrences that are not flights yet in [start, end)."""
+    tz = timezone.get_default_timezone()
+    return Schedule.objects.filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=timezone.localdate(start, tz)),
+        start_date__lte=timezone.localdate(end, tz),
+        materialized_until__lt=end,
+    )
+
+
+class ScheduleIndex(LocalIndex):
+    """
+    Every schedule with its airports and aircraft, so searches expand the
+    occurrences that are not flights yet without a query.
+    """
+
+    name = "schedules"
+
+    def build(self):
+        return list(Schedule.objects.select_related("aircraft", "departure", "arrival"))
+
+    def active(self, start: datetime, end: datetime, departure_id=None):
+        """`active()` from memory, optionally of one departure airport."""
+        tz = timezone.get_default_timezone()
+        first, last = timezone.localdate(start, tz), timezone.localdate(end, tz)
+        return [
+            schedule
+            for schedule in self.get()
+            if schedule.start_date <= last
+            and (schedule.end_date is None or schedule.end_date >= first)
+            and schedule.materialized_until < end
+            and departure_id in (None, schedule.departure_id)
+        ]
+
+
+index = ScheduleIndex()
+
+
+def pending(schedules, start: datetime, end: datetime):
+    """
+    Unsaved flights, with a None uid, of the occurrences of `schedules`
+    departing in [start, end) that are not expanded into flights yet, in
+    departure order, up to the `search_limit`. Lets searches cover the days
+    past the horizon.
+    """
+    end = min(end, search_limit())
+    flights = []
+    for schedule in schedules:
+        since = max(start, schedule.materialized_until)
+        flights.extend(
+            flight(schedule, departure_dt, uid=None)
+            for departure_dt in occurrences(schedule, since, end)
+        )
+    flights.sort(key=lambda f: f.departure_dt)
+    return flights
+
+
+def materialize(schedule: Schedule, until: datetime):
+    """
+    Insert the flights of the occurrences of `schedule` departing before
+    `until` that are not flights yet, with one bulk insert, and move its
+    `materialized_until` watermark. Occurrences double booking the aircraft
+    are skipped. Flights deleted later are not recreated. Returns the number
+    of flights created and skipped.
+    """
+    with transaction.atomic():
+        schedule = (
+            Schedule.objects.select_for_update()
+            .select_related("aircraft", "departure", "arrival")
+            .get(uid=schedule.uid)
+        )
+        if schedule.materialized_until >= until:
+            return 0, 0
+        flights = [
+            flight(schedule, departure_dt)
+            for departure_dt in occurrences(
+                schedule, schedule.materialized_until, until
+            )
+        ]
+        bookings = AircraftSchedule(flights)
+        booked = [f for f in flights if bookings.book(f) is None]
+        try:
+            with transaction.atomic():
+                Flight.objects.bulk_create(booked)
+        except IntegrityError:
+            # a concurrent write booked the aircraft in the meantime, the
+            # watermark stays and the next run retries
+            logger.warning("Schedule %s could not be expanded", schedule.uid)
+            return 0, len(flights)
+        signals.flights_changed.send(
+            sender=Flight, changes=[(None, f.snapshot()) for f in booked]
+        )
+        schedule.materialized_until = until
+        schedule.save(update_fields=["materialized_until"])
+    skipped = len(flights) - len(booked)
+    if skipped:
+        logger.warning(
+            "Schedule %s: %d occurrences skipped, the aircraft is already booked",
+            schedule.uid,
+            skipped,
+        )
+    return len(booked), skipped
+
+
+def materialize_all(until: datetime = None):
+    """`materialize` every schedule up to `until`, the horizon by default."""
+    until = until or horizon()
+    created = skipped = 0
+    for schedule in active(timezone.now(), until).only("uid").iterator():
+        counts = materialize(schedule, until)
+        created, skipped = created + counts[0], skipped + counts[1]
+    return created, skipped
+
+
+def departure_totals(departures, start: datetime, end: datetime):
+    """
+    Add the pending occurrences departing in [start, end], up to the
+    `search_limit`, to the departure search rows of `stats.departure_totals`.
+    """
+    end = min(end + timedelta(microseconds=1), search_limit())
+    if end <= start:
+        return departures
+    rows = {row["departure__uid"]: row for row in departures}
+    added = defaultdict(lambda: [0, timedelta(0)])
+    for schedule in index.active(start, end):
+        n = count(schedule, max(start, schedule.materialized_until), end)
+        if not n:
+            continue
+        added[schedule.departure_id][0] += n
+        added[schedule.departure_id][1] += schedule.block_time * n
+        rows.setdefault(
+            schedule.departure_id,
+            {
+                "departure__uid": schedule.departure_id,
+                "departure__icao": schedule.departure.icao,
+                "departure__name": schedule.departure.name,
+                "flight_count": 0,
+                "inflight_avg": timedelta(0),
+            },
+        )
+    if not added:
+        return departures
+    for uid, (n, inflight_time) in added.items():
+        row = rows[uid]
+        total = row["inflight_avg"] * row["flight_count"] + inflight_time
+        row["flight_count"] += n
+        row["inflight_avg"] = total / row["flight_count"]
+    return sorted(rows.values(), key=lambda row: row["departure__icao"])
@@ -0,0 +1,120 @@
+from bisect import bisect_right
+from collections import defaultdict
+from django.db.models import Exists, OuterRef, Q
+from .models import Flight
+
+CONFLICT_MESSAGE = "Aircraft is already scheduled from {} to {}."
+# exclusion constraint of migration 0006, postgres only
+NO_OVERLAP_CONSTRAINT = "app_flight_aircraft_no_overlap"
+
+
+def is_booking_conflict(error):
+    """Whether the IntegrityError `error` violates the aircraft no overlap constraint."""
+    diag = getattr(error.__cause__, "diag", None)
+    if diag is not None:
+        return diag.constraint_name == NO_OVERLAP_CONSTRAINT
+    return NO_OVERLAP_CONSTRAINT in str(error)
+
+
+def overlapping_flights(aircraft_id, start, end, exclude=None):
+    """Flights still flying with `aircraft_id` that overlap [start, end)."""
+    queryset = Flight.objects.filter(
+        aircraft_id=aircraft_id, departure_dt__lt=end, arrival_dt__gt=start
+    ).exclude(status="cancelled")
+    if exclude is not None:
+        queryset = queryset.exclude(uid=exclude)
+    return queryset
+
+
+def reinstating_conflicts(flights):
+    """
+    Whether taking the flights of the `flights` queryset out of cancellation
+    would double book an aircraft, with a flight still flying or another of
+    `flights`. A single query.
+    """
+    overlapping = (
+        Flight.objects.filter(
+            aircraft_id=OuterRef("aircraft_id"),
+            departure_dt__lt=OuterRef("arrival_dt"),
+            arrival_dt__gt=OuterRef("departure_dt"),
+        )
+        .filter(~Q(status="cancelled") | Q(uid__in=flights.values("uid")))
+        .exclude(uid=OuterRef("uid"))
+    )
+    reinstated = flights.filter(status="cancelled", aircraft__isnull=False)
+    return reinstated.filter(Exists(overlapping)).exists()
+
+
+class IntervalIndex:
+    """
+    Sorted list of disjoint [start, end) intervals. Overlapping intervals are
+    merged on insertion so lookups are a binary search.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def find(self, start, end):
+        """Return the stored interval overlapping [start, end) or None."""
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and self.ends[i] > start:
+            return self.starts[i], self.ends[i]
+        if i + 1 < len(self.starts) and self.starts[i + 1] < end:
+            return self.starts[i + 1], self.ends[i + 1]
+        return None
+
+    def add(self, start, end):
+        lo = bisect_right(self.starts, start)
+        if lo > 0 and self.ends[lo - 1] >= start:
+            lo -= 1
+            start = self.starts[lo]
+        hi = lo
+        while hi < len(self.starts) and self.starts[hi] <= end:
+            end = max(end, self.ends[hi])
+            hi += 1
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+
+class AircraftSchedule:
+    """
+    In-memory view of the aircraft bookings relevant to a batch of flights,
+    loaded with a single query. Flights are checked in order and each flight
+    that is accepted is booked, so later flights of the batch are checked
+    against the database rows and the earlier flights of the batch. The rows
+    of the batch flights and of the `exclude` uids (e.g deleted in the same
+    batch) are not loaded.
+    """
+
+    def __init__(self, flights, exclude=()):
+        self.index = defaultdict(IntervalIndex)
+        exclude = [f.uid for f in flights] + list(exclude)
+        flights = [f for f in flights if f.aircraft_id and f.status != "cancelled"]
+        if not flights:
+            return
+        rows = (
+            Flight.objects.filter(
+                aircraft_id__in={f.aircraft_id for f in flights},
+                departure_dt__lt=max(f.arrival_dt for f in flights),
+                arrival_dt__gt=min(f.departure_dt for f in flights),
+            )
+            .exclude(status="cancelled")
+            .exclude(uid__in=exclude)
+            .values_list("aircraft_id", "departure_dt", "arrival_dt")
+        )
+        for aircraft_id, start, end in rows:
+            self.index[aircraft_id].add(start, end)
+
+    def book(self, flight):
+        """
+        Book the aircraft of `flight`, returning the interval it conflicts
+        with instead if the aircraft is already busy.
+        """
+        if not flight.aircraft_id or flight.status == "cancelled":
+            return None
+        index = self.index[flight.aircraft_id]
+        conflict = index.find(flight.departure_dt, flight.arrival_dt)
+        if conflict is None:
+            index.add(flight.departure_dt, flight.arrival_dt)
+        return conflict
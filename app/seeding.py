@@ -0,0 +1,213 @@
+import heapq
+import itertools
+import math
+import random
+import string
+import uuid
+from django.db import transaction
+from django.utils import timezone
+from . import geo, routes, signals, stats
+from .conditional import touch
+from .models import Aircraft, Airport, Flight, Location
+from .utils import encode_geohash, minute_of_day
+
+# default first departure day of the seeded flights
+START = "2030-01-01 00:00"
+COUNTRIES = ("Nigeria", "Spain", "Germany", "Brazil", "India", "Japan", "Canada")
+MANUFACTURERS = ("Airbus", "Boeing", "Embraer", "Bombardier", "ATR")
+
+
+class Seeder:
+    """
+    Deterministic synthetic airports, aircraft and flights, created with bulk
+    inserts. The same seed, start and counts give the same rows, uids
+    included, and seeding more flights with the same Seeder extends the
+    same timetable.
+
+    A few hub airports get most of the traffic (Zipf weights), every
+    aircraft flies a rotation, leaving from its previous arrival after a
+    turnaround so it is never double booked, and flight times follow the
+    great circle distance. About 2% of the flights are cancelled.
+    """
+
+    CRUISE_KMH = 800
+    TAXI_MINUTES = 30
+    TURNAROUND_MINUTES = (35, 150)
+    # no departures between midnight and 5am
+    CURFEW_END = 5 * 60
+    CANCELLED_RATE = 0.02
+
+    def __init__(self, seed: int = 0, start=None, batch_size: int = 10000):
+        self.rng = random.Random(seed)
+        self.start = start or timezone.now()
+        self.batch_size = batch_size
+        self.airports = []
+        self.aircraft = []
+        self.fleet = None
+
+    def uid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def code(self, length: int, taken: set, alphabet=string.ascii_uppercase):
+        while True:
+            code = "".join(self.rng.choice(alphabet) for _ in range(length))
+            if code not in taken:
+                taken.add(code)
+                return code
+
+    def seed_airports(self, count: int):
+        taken = set(Airport.objects.values_list("icao", flat=True))
+        locations, airports = [], []
+        for i in range(count):
+            lat, lng = self.rng.uniform(-50, 65), self.rng.uniform(-180, 180)
+            city = f"City {len(self.airports) + i}"
+            locations.append(
+                Location(
+                    uid=self.uid(),
+                    area=f"{city} Area",
+                    city=city,
+                    country=self.rng.choice(COUNTRIES),
+                    lat=round(lat, 4),
+                    lng=round(lng, 4),
+                    geohash=encode_geohash(round(lat, 4), round(lng, 4)),
+                )
+            )
+            airports.append(
+                Airport(
+                    uid=self.uid(),
+                    created_at=self.start,
+                    name=f"{city} International",
+                    icao=self.code(4, taken),
+                )
+            )
+        with transaction.atomic():
+            Location.objects.bulk_create(locations, batch_size=self.batch_size)
+            for airport, location in zip(airports, locations):
+                airport.location = location
+            Airport.objects.bulk_create(airports, batch_size=self.batch_size)
+        self.airports += airports
+        signals.invalidate_airports(Airport)
+        return airports
+
+    def seed_aircraft(self, count: int):
+        taken = set(Aircraft.objects.values_list("serial_number", flat=True))
+        alphabet = string.ascii_uppercase + string.digits
+        aircraft = [
+            Aircraft(
+                uid=self.uid(),
+                created_at=self.start,
+                serial_number=self.code(8, taken, alphabet),
+                manufacturer=self.rng.choice(MANUFACTURERS),
+            )
+            for _ in range(count)
+        ]
+        Aircraft.objects.bulk_create(aircraft, batch_size=self.batch_size)
+        self.aircraft += aircraft
+        signals.invalidate_aircraft(Aircraft)
+        return aircraft
+
+    def load(self):
+        """Fly the airports and aircraft of the database when none were seeded."""
+        if not self.airports:
+            self.airports = list(
+                Airport.objects.select_related("location").order_by("icao")
+            )
+        if not self.aircraft:
+            self.aircraft = list(Aircraft.objects.order_by("serial_number"))
+        if len(self.airports) < 2 or not self.aircraft:
+            raise ValueError("Flights need at least two airports and an aircraft")
+
+    def init_fleet(self):
+        self.load()
+        # the i-th airport gets a 1 / (i + 1) share of the traffic
+        weights = (1 / (i + 1) for i in range(len(self.airports)))
+        self.cum_weights = list(itertools.accumulate(weights))
+        self.points = [
+            geo.to_unit_vector(float(a.location.lat), float(a.location.lng))
+            if a.location
+            else (1.0, 0.0, 0.0)
+            for a in self.airports
+        ]
+        # heap of (available at, index, airport index) per aircraft
+        self.fleet = [
+            (
+                self.start + timezone.timedelta(minutes=self.rng.randrange(0, 360)),
+                i,
+                self.pick_airport(),
+            )
+            for i in range(len(self.aircraft))
+        ]
+        heapq.heapify(self.fleet)
+
+    def pick_airport(self, exclude: int = None):
+        while True:
+            index = self.rng.choices(
+                range(len(self.airports)), cum_weights=self.cum_weights
+            )[0]
+            if index != exclude:
+                return index
+
+    def flight_minutes(self, origin: int, destination: int):
+        chord = math.dist(self.points[origin], self.points[destination])
+        km = geo.chord_to_km(chord)
+        return self.TAXI_MINUTES + round(km / self.CRUISE_KMH * 60)
+
+    def next_flight(self):
+        available, index, origin = heapq.heappop(self.fleet)
+        departure_dt = available + timezone.timedelta(
+            minutes=self.rng.randint(*self.TURNAROUND_MINUTES)
+        )
+        minute = minute_of_day(departure_dt)
+        if minute < self.CURFEW_END:
+            departure_dt += timezone.timedelta(
+                minutes=self.CURFEW_END - minute + self.rng.randrange(0, 60)
+            )
+        destination = self.pick_airport(exclude=origin)
+        arrival_dt = departure_dt + timezone.timedelta(
+            minutes=self.flight_minutes(origin, destination)
+        )
+        status = "scheduled"
+        if self.rng.random() < self.CANCELLED_RATE:
+            # the aircraft stays where it was
+            status, arrival, destination = "cancelled", destination, origin
+            ready = departure_dt
+        else:
+            arrival, ready = destination, arrival_dt
+        heapq.heappush(self.fleet, (ready, index, destination))
+        return Flight(
+            uid=self.uid(),
+            created_at=self.start,
+            aircraft=self.aircraft[index],
+            departure=self.airports[origin],
+            arrival=self.airports[arrival],
+            departure_dt=departure_dt,
+            arrival_dt=arrival_dt,
+            status=status,
+            departure_minute=minute_of_day(departure_dt),
+        )
+
+    def seed_flights(self, count: int, progress=None):
+        """
+        Insert `count` flights in transactions of `batch_size` rows, calling
+        `progress(created)` after each.
+        """
+        if self.fleet is None:
+            self.init_fleet()
+        created = 0
+        while created < count:
+            batch = [
+                self.next_flight() for _ in range(min(self.batch_size, count - created))
+            ]
+            with transaction.atomic():
+                Flight.objects.bulk_create(batch)
+            created += len(batch)
+            if progress:
+                progress(created)
+        self.refresh()
+
+    def refresh(self):
+        # bulk_create skips flights_changed, refresh what it maintains
+        # (the change log only records changes made through the API)
+        stats.rebuild()
+        routes.graph.invalidate()
+        touch(Flight, every_row=True)
@@ -1,14 +1,57 @@
+from datetime import timedelta
 from django.utils import timezone
-from django.db.models import Avg, F, fields
 from rest_framework import serializers
-from .models import Aircraft, Airport, Flight, Location
-from .validators import aircraft_validator, icao_validator
+from . import cache
+from .models import Aircraft, Airport, Flight, FlightChange, Location, Schedule
+from .validators import aircraft_schedule_validator, flight_times_validator
+
+
+class ReferenceField(serializers.CharField):
+    """
+    Natural key (airport ICAO, aircraft serial number) resolved to its row
+    through the `cache.ReferenceCache` named `reference`: a normalized exact
+    lookup done once during validation, the instance is then reused by
+    `validate` and `save`.
+    """
+
+    def __init__(self, reference: str, **kwargs):
+        # a name, fields are deep copied and the caches hold locks
+        self.reference = reference
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        reference = getattr(cache, self.reference)
+        obj = reference.get(super().to_internal_value(data))
+        if obj is None:
+            self.fail("does_not_exist")
+        return obj
+
+    def to_representation(self, value):
+        return getattr(value, getattr(cache, self.reference).field)
+
+
+def airport_field(**kwargs):
+    return ReferenceField(
+        "airports",
+        error_messages={"does_not_exist": "Airport With ICAO does not exist."},
+        **kwargs,
+    )
+
+
+def aircraft_field(**kwargs):
+    return ReferenceField(
+        "aircraft",
+        error_messages={
+            "does_not_exist": "Aircraft with serial number does not exist."
+        },
+        **kwargs,
+    )
 
 
 class LocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Location
-        exclude = ("uid",)
+        exclude = ("uid", "geohash")
 
 
 class AirCraftSerializer(serializers.ModelSerializer):
@@ -62,103 +105,121 @@ class FlightListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Flight
-        fields = "__all__"
+        exclude = ("departure_minute", "schedule")
 
 
 class CreateFlightSerializer(serializers.ModelSerializer):
 
-    aircraft = serializers.CharField(validators=[aircraft_validator], required=False)
-    departure = serializers.CharField(validators=[icao_validator])
-    arrival = serializers.CharField(validators=[icao_validator])
+    aircraft = aircraft_field(required=False)
+    departure = airport_field()
+    arrival = airport_field()
 
     def validate(self, attrs):
         if "arrival_dt" in attrs and "departure_dt" in attrs:
             # Date Time Validations on Creation
-            if (
-                attrs["arrival_dt"] < attrs["departure_dt"]
-                or attrs["departure_dt"] < timezone.now()
-            ):
-                raise serializers.ValidationError(
-                    detail="Invalid arrival and depature datetimes"
-                )
+            flight_times_validator(attrs["departure_dt"], attrs["arrival_dt"])
+        self.validate_schedule(attrs)
         return attrs
 
-    def create(self, validated_data):
-        # Get the arrival, departure and aircraft objects
-        arr = Airport.objects.filter(icao__icontains=validated_data["arrival"]).first()
-        dept = Airport.objects.filter(
-            icao__icontains=validated_data["departure"]
-        ).first()
-        validated_data["arrival"] = arr
-        validated_data["departure"] = dept
-        if "aircraft" in validated_data:
-            craft = Aircraft.objects.filter(
-                serial_number__icontains=validated_data["aircraft"]
-            ).first()
-            validated_data["aircraft"] = craft
-
-        return super().create(validated_data)
+    def validate_schedule(self, attrs):
+        # Merge the partial update with the instance to check the final booking
+        instance = self.instance
+        if "aircraft" in attrs:
+            aircraft_id = attrs["aircraft"].uid
+        else:
+            aircraft_id = instance.aircraft_id if instance else None
+        status = attrs.get("status", instance.status if instance else None)
+        departure_dt = attrs.get(
+            "departure_dt", getattr(instance, "departure_dt", None)
+        )
+        arrival_dt = attrs.get("arrival_dt", getattr(instance, "arrival_dt", None))
+        if aircraft_id and departure_dt and arrival_dt and status != "cancelled":
+            aircraft_schedule_validator(
+                aircraft_id,
+                departure_dt,
+                arrival_dt,
+                exclude=instance.uid if instance else None,
+            )
+
+    class Meta:
+        model = Flight
+        exclude = ("departure_minute", "schedule")
+
+
+class ScheduleSerializer(serializers.ModelSerializer):
+
+    aircraft = aircraft_field(required=False, allow_null=True)
+    departure = airport_field()
+    arrival = airport_field()
+
+    def validate_days(self, days):
+        if not days or set(days) - set("1234567"):
+            raise serializers.ValidationError("Expected ISO weekdays, e.g 12345.")
+        return "".join(sorted(set(days)))
+
+    def validate_block_time(self, block_time):
+        if block_time <= timedelta(0):
+            raise serializers.ValidationError("Block time must be positive.")
+        return block_time
+
+    def validate(self, attrs):
+        start_date = attrs.get("start_date", getattr(self.instance, "start_date", None))
+        end_date = attrs.get("end_date", getattr(self.instance, "end_date", None))
+        if end_date is not None and end_date < start_date:
+            raise serializers.ValidationError(detail="Invalid start and end dates")
+        return attrs
 
     def update(self, instance, validated_data):
-        if "arrival" in validated_data:
-            arr = Airport.objects.filter(
-                icao__icontains=validated_data["arrival"]
-            ).first()
-            validated_data["arrival"] = arr
-        if "departure" in validated_data:
-            dept = Airport.objects.filter(
-                icao__icontains=validated_data["departure"]
-            ).first()
-            validated_data["departure"] = dept
-        if "aircraft" in validated_data:
-            craft = Aircraft.objects.filter(
-                serial_number__icontains=validated_data["aircraft"]
-            ).first()
-            validated_data["aircraft"] = craft
+        validated_data["updated_at"] = timezone.now()
         return super().update(instance, validated_data)
 
     class Meta:
-        model = Flight
+        model = Schedule
         fields = "__all__"
+        read_only_fields = ("uid", "created_at", "updated_at", "materialized_until")
 
 
 class DepartureSearchSerializer(serializers.Serializer):
 
-    uid = serializers.SerializerMethodField()
-    icao = serializers.SerializerMethodField()
-    name = serializers.SerializerMethodField()
-    flight_count = serializers.SerializerMethodField()
-    inflight_avg = serializers.SerializerMethodField()
-
-    def get_uid(self, obj):
-        return obj.departure.uid
-
-    def get_icao(self, obj):
-        return obj.departure.icao
+    """Serializes the per departure airport rows of the departure search"""
 
-    def get_name(self, obj):
-        return obj.departure.name
-
-    def get_flight_count(self, obj):
-        return obj.departure.flight_departures.count()
+    uid = serializers.UUIDField(source="departure__uid")
+    icao = serializers.CharField(source="departure__icao")
+    name = serializers.CharField(source="departure__name")
+    flight_count = serializers.IntegerField()
+    inflight_avg = serializers.SerializerMethodField()
 
     def get_inflight_avg(self, obj):
-        qs = obj.departure.flight_departures.aggregate(
-            inflight_avg=Avg(
-                F("arrival_dt") - F("departure_dt"), output_filed=fields.DurationField()
-            )
-        )
-        return qs["inflight_avg"].total_seconds() / 60 if qs["inflight_avg"] else 0
+        avg = obj["inflight_avg"]
+        return avg.total_seconds() / 60 if avg else 0
 
 
 class DepartureFlightSerializer(serializers.ModelSerializer):
 
     inflight_time = serializers.SerializerMethodField()
     aircraft = AirCraftSerializer()
+    # an occurrence of a schedule that is not a flight yet, without a uid
+    pending = serializers.SerializerMethodField()
 
     def get_inflight_time(self, obj):
         return obj.get_inflight_time()
 
+    def get_pending(self, obj):
+        return obj.uid is None
+
     class Meta:
         model = Flight
-        fields = ("uid", "aircraft", "inflight_time", "departure_dt", "arrival_dt")
+        fields = (
+            "uid",
+            "aircraft",
+            "inflight_time",
+            "departure_dt",
+            "arrival_dt",
+            "pending",
+        )
+
+
+class FlightChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FlightChange
+        fields = "__all__"
@@ -0,0 +1,141 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from . import autocomplete, cache, feed, geo, routes, schedules, stats
+from .authentication import user_states
+from .conditional import touch
+from .models import Aircraft, Airport, Flight, Location, Schedule, User
+
+# Sent with sender=Flight and `changes`, a list of (before, after) pairs of
+# `Flight.snapshot()` dicts where before is None for created flights and after
+# is None for deleted ones. Single saves and deletes are converted from the
+# model signals below, bulk writes send it themselves.
+flights_changed = Signal()
+
+# Sent with sender=Flight, `queryset`, the flights about to be changed by one
+# set based statement, and `status`, their new status or None when they are
+# about to be deleted. Sent inside the transaction before the statement runs,
+# receivers read `queryset` with set based queries too, see bulk.py.
+flights_bulk_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_state(sender, instance, **kwargs):
+    user_states.invalidate(instance.uid)
+
+
+def update_autocomplete(index, uids=None):
+    # bulk writes call the receivers below without an instance, rebuild then
+    if uids is None:
+        transaction.on_commit(index.invalidate)
+    else:
+        transaction.on_commit(partial(index.update, uids))
+
+
+def invalidate_references(references):
+    # right away for the lookups of this transaction and again once it
+    # committed, other processes may have cached the rows it replaces under
+    # the first new version in the meantime
+    references.invalidate()
+    transaction.on_commit(references.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Airport)
+def invalidate_airports(sender, instance=None, **kwargs):
+    invalidate_references(cache.airports)
+    transaction.on_commit(geo.airports.invalidate)
+    update_autocomplete(autocomplete.airports, instance and [instance.uid])
+    # the schedule index holds the airports and aircraft of the schedules
+    transaction.on_commit(schedules.index.invalidate)
+    transaction.on_commit(partial(touch, Airport))
+
+
+@receiver([post_save, post_delete], sender=Location)
+def invalidate_locations(sender, instance, signal, created=False, **kwargs):
+    transaction.on_commit(geo.airports.invalidate)
+    if signal is post_delete:
+        # the location of its airport is unset without a save
+        update_autocomplete(autocomplete.airports)
+    elif not created:
+        # a new location is indexed along with the airport saved after it
+        airport = getattr(instance, "airport", None)
+        if airport is not None:
+            update_autocomplete(autocomplete.airports, [airport.uid])
+    transaction.on_commit(partial(touch, Airport))
+
+
+@receiver([post_save, post_delete], sender=Aircraft)
+def invalidate_aircraft(sender, instance=None, **kwargs):
+    invalidate_references(cache.aircraft)
+    update_autocomplete(autocomplete.aircraft, instance and [instance.uid])
+    transaction.on_commit(schedules.index.invalidate)
+    transaction.on_commit(partial(touch, Aircraft))
+
+
+@receiver([post_save, post_delete], sender=Schedule)
+def invalidate_schedules(sender, **kwargs):
+    transaction.on_commit(schedules.index.invalidate)
+    transaction.on_commit(partial(touch, Schedule))
+
+
+@receiver(pre_save, sender=Flight)
+def load_flight_snapshot(sender, instance, **kwargs):
+    if instance._state.adding or hasattr(instance, "_snapshot"):
+        return
+    before = Flight.objects.filter(pk=instance.pk).values(*Flight.SNAPSHOT_FIELDS)
+    instance._snapshot = before.first()
+
+
+@receiver(post_save, sender=Flight)
+def flight_saved(sender, instance, created, **kwargs):
+    before = None if created else getattr(instance, "_snapshot", None)
+    instance._snapshot = instance.snapshot()
+    flights_changed.send(sender=Flight, changes=[(before, instance._snapshot)])
+
+
+@receiver(post_delete, sender=Flight)
+def flight_deleted(sender, instance, **kwargs):
+    before = getattr(instance, "_snapshot", None) or instance.snapshot()
+    flights_changed.send(sender=Flight, changes=[(before, None)])
+
+
+@receiver(flights_changed, sender=Flight)
+def update_routes(sender, changes, **kwargs):
+    transaction.on_commit(partial(routes.graph.update, changes))
+
+
+@receiver(flights_changed, sender=Flight)
+def update_departure_stats(sender, changes, **kwargs):
+    stats.apply_changes(changes)
+
+
+@receiver(flights_changed, sender=Flight)
+def touch_flights(sender, changes, **kwargs):
+    uids = {(before or after)["uid"] for before, after in changes}
+    transaction.on_commit(partial(touch, Flight, uids))
+
+
+@receiver(flights_changed, sender=Flight)
+def log_flight_changes(sender, changes, **kwargs):
+    feed.log_changes(changes)
+
+
+@receiver(flights_bulk_changed, sender=Flight)
+def rebuild_routes(sender, **kwargs):
+    transaction.on_commit(routes.graph.invalidate)
+
+
+@receiver(flights_bulk_changed, sender=Flight)
+def update_departure_stats_in_bulk(sender, queryset, status, **kwargs):
+    stats.apply_bulk(queryset, status)
+
+
+@receiver(flights_bulk_changed, sender=Flight)
+def touch_all_flights(sender, **kwargs):
+    transaction.on_commit(partial(touch, Flight, every_row=True))
+
+
+@receiver(flights_bulk_changed, sender=Flight)
+def log_bulk_flight_changes(sender, queryset, status, **kwargs):
+    feed.log_bulk_changes(queryset, status)
@@ -0,0 +1,202 @@
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DepartureStats, Flight
+
+STATUS_FIELDS = {
+    "scheduled": "scheduled_count",
+    "departed": "departed_count",
+    "arrived": "arrived_count",
+    "cancelled": "cancelled_count",
+}
+
+DEPARTURE_FIELDS = ("departure__uid", "departure__icao", "departure__name")
+
+
+def inflight():
+    return ExpressionWrapper(
+        F("arrival_dt") - F("departure_dt"), output_field=DurationField()
+    )
+
+
+def contribution(snapshot, sign: int):
+    """The rollup key and values a flight snapshot adds (sign 1) or removes."""
+    day = timezone.localdate(snapshot["departure_dt"], timezone.get_default_timezone())
+    key = (snapshot["departure_id"], day)
+    inflight_time = snapshot["arrival_dt"] - snapshot["departure_dt"]
+    values = {
+        "flight_count": sign,
+        "inflight_seconds": sign * int(inflight_time.total_seconds()),
+    }
+    if snapshot["status"] in STATUS_FIELDS:
+        values[STATUS_FIELDS[snapshot["status"]]] = sign
+    return key, values
+
+
+def apply_changes(changes):
+    """Fold `flights_changed` changes into the rollups, one write per rollup."""
+    deltas = defaultdict(Counter)
+    for before, after in changes:
+        for snapshot, sign in ((before, -1), (after, 1)):
+            if snapshot is not None:
+                key, values = contribution(snapshot, sign)
+                deltas[key].update(values)
+    write(deltas)
+
+
+def apply_bulk(queryset, status=None):
+    """
+    `apply_changes` for `flights_bulk_changed`: the deltas of the flights of
+    `queryset` being set to `status`, or deleted, from one aggregate query.
+    """
+    rows = (
+        queryset.annotate(
+            day=TruncDate("departure_dt", tzinfo=timezone.get_default_timezone())
+        )
+        .values("departure_id", "day", "status")
+        .annotate(count=Count("uid"), inflight=Sum(inflight()))
+        .order_by()
+    )
+    deltas = defaultdict(Counter)
+    for row in rows:
+        delta, count = deltas[row["departure_id"], row["day"]], row["count"]
+        if row["status"] in STATUS_FIELDS:
+            delta[STATUS_FIELDS[row["status"]]] -= count
+        if status is None:
+            delta["flight_count"] -= count
+            delta["inflight_seconds"] -= int(row["inflight"].total_seconds())
+        elif status in STATUS_FIELDS:
+            delta[STATUS_FIELDS[status]] += count
+    write(deltas)
+
+
+def write(deltas):
+    for (departure_id, day), delta in deltas.items():
+        delta = {field: value for field, value in delta.items() if value}
+        if delta:
+            increment(departure_id, day, delta)
+
+
+def increment(departure_id, day, delta):
+    rollup = DepartureStats.objects.filter(departure_id=departure_id, day=day)
+    increments = {field: F(field) + value for field, value in delta.items()}
+    if rollup.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            DepartureStats.objects.create(departure_id=departure_id, day=day, **delta)
+    except IntegrityError:
+        # created concurrently since the update
+        rollup.update(**increments)
+
+
+def rebuild():
+    """Recompute every rollup from the flights, returns the number of rollups."""
+    statuses = {
+        field: Count("uid", filter=Q(status=status))
+        for status, field in STATUS_FIELDS.items()
+    }
+    rows = (
+        Flight.objects.annotate(
+            day=TruncDate("departure_dt", tzinfo=timezone.get_default_timezone())
+        )
+        .values("departure_id", "day")
+        .annotate(flight_count=Count("uid"), inflight=Sum(inflight()), **statuses)
+        .order_by()
+    )
+    rollups = [
+        DepartureStats(inflight_seconds=int(row.pop("inflight").total_seconds()), **row)
+        for row in rows
+    ]
+    with transaction.atomic():
+        DepartureStats.objects.all().delete()
+        DepartureStats.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def day_start(day):
+    return timezone.make_aware(
+        datetime.combine(day, time.min), timezone.get_default_timezone()
+    )
+
+
+class DepartureTotals:
+    """
+    Flight count and average in-flight time per departure airport for the
+    flights departing in [start, end], as dicts keyed like the departure
+    search rows. Whole local days (TIME_ZONE) come from the rollups and the
+    flights of the edge days falling outside the interval are subtracted,
+    unless scanning the interval itself covers less time.
+
+    `queries()` are evaluated by the caller, sync or async, and their rows
+    handed to `results()`.
+    """
+
+    def __init__(self, start: datetime, end: datetime):
+        tz = timezone.get_default_timezone()
+        self.start, self.end = start, end
+        self.first, self.last = timezone.localdate(start, tz), timezone.localdate(
+            end, tz
+        )
+        self.days_start = day_start(self.first)
+        self.days_end = day_start(self.last + timedelta(days=1))
+        excluded = (start - self.days_start) + (self.days_end - end)
+        self.scan = end - start <= excluded
+
+    def queries(self):
+        flights = Flight.objects.values(*DEPARTURE_FIELDS).order_by()
+        totals = flights.annotate(flight_count=Count("uid"), inflight=Sum(inflight()))
+        if self.scan:
+            return [
+                totals.filter(departure_dt__gte=self.start, departure_dt__lte=self.end)
+            ]
+        rollups = (
+            DepartureStats.objects.filter(day__range=(self.first, self.last))
+            .values(*DEPARTURE_FIELDS)
+            .annotate(flight_count=Sum("flight_count"), seconds=Sum("inflight_seconds"))
+            .order_by()
+        )
+        outside = totals.filter(
+            Q(departure_dt__gte=self.days_start, departure_dt__lt=self.start)
+            | Q(departure_dt__gt=self.end, departure_dt__lt=self.days_end)
+        )
+        return [rollups, outside]
+
+    def results(self, totals, outside=()):
+        rows = {row["departure__uid"]: row for row in totals}
+        if not self.scan:
+            for row in rows.values():
+                # sums of bigint columns are numeric (Decimal) on postgres
+                row["inflight"] = timedelta(seconds=int(row.pop("seconds")))
+        for row in outside:
+            total = rows.get(row["departure__uid"])
+            if total is None:
+                # rollups are missing, see rebuild_departure_stats
+                continue
+            total["flight_count"] -= row["flight_count"]
+            total["inflight"] -= row["inflight"]
+        results = []
+        for row in sorted(rows.values(), key=lambda row: row["departure__icao"]):
+            count = row.pop("flight_count")
+            if count:
+                inflight_time = row.pop("inflight")
+                results.append(
+                    dict(row, flight_count=count, inflight_avg=inflight_time / count)
+                )
+        return results
+
+
+def departure_totals(start: datetime, end: datetime):
+    totals = DepartureTotals(start, end)
+    return totals.results(*(list(query) for query in totals.queries()))
+
+
+async def adeparture_totals(start: datetime, end: datetime):
+    totals = DepartureTotals(start, end)
+    rows = []
+    for query in totals.queries():
+        rows.append([row async for row in query])
+    return totals.results(*rows)
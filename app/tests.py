@@ -1,11 +1,69 @@
-from django.test import TestCase, RequestFactory
+import json
+import random
+import uuid
+from datetime import time
+from io import StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache as django_cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import (
+    AsyncClient,
+    AsyncRequestFactory,
+    TestCase,
+    RequestFactory,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from .models import Aircraft, Airport, Flight, Location, User
-from .utils import datetime, format_datetime_str
-from .serializers import AirCraftSerializer, AirportSerializer, CreateFlightSerializer
+from django.utils.dateparse import parse_datetime
+from rest_framework.renderers import JSONRenderer
+from . import (
+    async_views,
+    autocomplete,
+    cache,
+    fastpath,
+    geo,
+    metrics,
+    routes,
+    schedules,
+    stats,
+)
+from .asgi import FeedRouter
+from .models import (
+    Aircraft,
+    Airport,
+    DepartureStats,
+    Flight,
+    FlightChange,
+    Location,
+    Schedule,
+    User,
+)
+from .views import FlightView
+from .utils import (
+    datetime,
+    encode_geohash,
+    format_datetime_str,
+    minute_of_day,
+    parse_time_range,
+)
+from .renderers import FastJSONRenderer
+from .scheduling import NO_OVERLAP_CONSTRAINT, IntervalIndex
+from .serializers import (
+    AirCraftSerializer,
+    AirportSerializer,
+    CreateFlightSerializer,
+    DepartureFlightSerializer,
+    FlightListSerializer,
+    ScheduleSerializer,
+)
 
 
 def create_user(data: dict, role: str = "user"):
@@ -15,6 +73,19 @@ def create_user(data: dict, role: str = "user"):
     return user
 
 
+def create_airport(
+    icao: str, name: str = "Airport", lat: str = "7.8968", lng: str = "6.7890"
+):
+    loc = Location.objects.create(
+        area="Test Area",
+        city="Test City",
+        country="Test Country",
+        lat=lat,
+        lng=lng,
+    )
+    return Airport.objects.create(name=name, icao=icao, location=loc)
+
+
 class UtilsTest(TestCase):
     def test_date_formatter(self):
         val1 = "2022-06-05 17:22"
@@ -27,6 +98,14 @@ class UtilsTest(TestCase):
         with self.assertRaises(ValueError):
             format_datetime_str(val3)
 
+    def test_time_range_parser(self):
+        self.assertEqual(parse_time_range("17:30;21:30"), (1050, 1290))
+        self.assertEqual(parse_time_range("22:00;02:00"), (1320, 120))
+        for val in ("17:30", "25:00;02:00", "10:61;11:00", "a:b;c:d"):
+            with self.assertRaises(ValueError):
+                parse_time_range(val)
+        self.assertEqual(minute_of_day(datetime(2022, 6, 5, 17, 22)), 1042)
+
 
 class UserManagerTests(TestCase):
     def setUp(self):
@@ -177,6 +256,799 @@ class SerializerTest(TestCase):
         ser2.save()
 
 
+class ReferenceCacheTest(TestCase):
+    def test_flight_write_uses_cached_references(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        craft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        self.assertEqual(cache.airports.get(" 1ec4 ").uid, departure.uid)
+        self.assertIsNone(cache.airports.get("1EC"))
+        flight_data = {
+            "aircraft": "as12hd4b",
+            "arrival": arrival.icao,
+            "departure": departure.icao.lower(),
+            "departure_dt": timezone.now() + timezone.timedelta(minutes=10),
+            "arrival_dt": timezone.now() + timezone.timedelta(minutes=60),
+        }
+        self.assertTrue(CreateFlightSerializer(data=flight_data).is_valid())
+        # Warm cache: only the aircraft booking check, the INSERT and the
+        # departure stats rollup hit the database
+        ser = CreateFlightSerializer(data=flight_data)
+        with self.assertNumQueries(1):
+            self.assertTrue(ser.is_valid())
+        with CaptureQueriesContext(connection) as ctx:
+            flight = ser.save()
+        for query in ctx.captured_queries:
+            self.assertNotIn('FROM "app_airport"', query["sql"])
+            self.assertNotIn('FROM "app_aircraft"', query["sql"])
+        self.assertEqual(flight.departure_id, departure.uid)
+        self.assertEqual(flight.aircraft_id, craft.uid)
+        # Saving or deleting a reference row invalidates the cache
+        departure.icao = "1EC6"
+        departure.save()
+        self.assertIsNone(cache.airports.get("1EC4"))
+        self.assertEqual(cache.airports.get("1EC6").uid, departure.uid)
+        craft.delete()
+        self.assertIsNone(cache.aircraft.get("AS12HD4B"))
+        # and again once the write committed, retiring the rows other
+        # processes cached from before the commit in the meantime
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            departure.icao = "1EC7"
+            departure.save()
+            stale = Airport.objects.get(uid=departure.uid)
+            stale.icao = "1EC6"
+            version = cache.airports.version.get()
+            django_cache.set(f"{cache.airports.prefix}:{version}:1EC6", stale)
+            cache.airports.local.clear()
+            self.assertEqual(cache.airports.get("1EC6").uid, departure.uid)
+        self.assertTrue(callbacks)
+        self.assertIsNone(cache.airports.get("1EC6"))
+
+    def test_flight_write_resolves_each_reference_once(self):
+        departure = create_airport("EGLL")
+        arrival = create_airport("EGL")
+        craft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        cache.airports.invalidate()
+        cache.aircraft.invalidate()
+        flight_data = {
+            "aircraft": " as12hd4b ",
+            "arrival": "egl",
+            "departure": "EGLL",
+            "departure_dt": timezone.now() + timezone.timedelta(minutes=10),
+            "arrival_dt": timezone.now() + timezone.timedelta(minutes=60),
+        }
+        ser = CreateFlightSerializer(data=flight_data)
+        # Cold cache: one lookup per reference and the aircraft booking check
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(ser.is_valid())
+        self.assertEqual(len(ctx.captured_queries), 4)
+        with CaptureQueriesContext(connection) as ctx:
+            flight = ser.save()
+        for query in ctx.captured_queries:
+            self.assertNotIn('FROM "app_airport"', query["sql"])
+            self.assertNotIn('FROM "app_aircraft"', query["sql"])
+        # exact matches, "EGL" does not pick "EGLL"
+        self.assertEqual(flight.arrival_id, arrival.uid)
+        self.assertEqual(flight.departure_id, departure.uid)
+        self.assertEqual(flight.aircraft_id, craft.uid)
+        ser = CreateFlightSerializer(data={**flight_data, "arrival": "EG"})
+        self.assertFalse(ser.is_valid())
+        self.assertEqual(ser.errors["arrival"], ["Airport With ICAO does not exist."])
+
+
+class FastPathTest(TestCase):
+    def test_fast_path_is_byte_compatible(self):
+        departure = create_airport("1EC4", "Airport \u2028 \u00e9")
+        arrival = Airport.objects.create(name="No Location", icao="1EC5")
+        craft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        start = timezone.now()
+        for i in range(3):
+            Flight.objects.create(
+                aircraft=craft if i else None,
+                departure=departure,
+                arrival=arrival,
+                departure_dt=start + timezone.timedelta(hours=i),
+                arrival_dt=start + timezone.timedelta(hours=i + 1, seconds=7),
+                status="scheduled",
+                updated_at=start if i == 2 else None,
+            )
+        flights = Flight.objects.order_by("departure_dt")
+        cases = [
+            (FlightListSerializer, fastpath.flight_list),
+            (DepartureFlightSerializer, fastpath.departure_flight),
+        ]
+        for serializer_class, values_serializer in cases:
+            expected = JSONRenderer().render(
+                {"status": True, "data": serializer_class(flights, many=True).data}
+            )
+            data = values_serializer.data(flights)
+            self.assertEqual(
+                FastJSONRenderer().render({"status": True, "data": data}), expected
+            )
+            self.assertEqual(
+                JSONRenderer().render({"status": True, "data": data}), expected
+            )
+
+
+class SeedingTest(TestCase):
+    def seed(self, *args):
+        call_command(
+            "seed_flights",
+            "300",
+            "--airports=20",
+            "--aircraft=10",
+            "--batch-size=100",
+            *args,
+            stdout=StringIO(),
+        )
+        return list(
+            Flight.objects.order_by("uid").values_list(
+                "uid", "aircraft_id", "departure_id", "arrival_id", "departure_dt"
+            )
+        )
+
+    def test_seed_flights(self):
+        flights = self.seed()
+        self.assertEqual(len(flights), 300)
+        self.assertEqual(self.seed("--clear"), flights)
+        self.assertNotEqual(self.seed("--clear", "--seed=1"), flights)
+        # every aircraft leaves from where it landed, after landing
+        for craft in Aircraft.objects.all():
+            legs = craft.flights.exclude(status="cancelled").order_by("departure_dt")
+            for previous, flight in zip(legs, legs[1:]):
+                self.assertEqual(flight.departure_id, previous.arrival_id)
+                self.assertGreater(flight.departure_dt, previous.arrival_dt)
+        self.assertEqual(
+            sum(DepartureStats.objects.values_list("flight_count", flat=True)), 300
+        )
+
+
+class SchedulingTest(TestCase):
+    def test_interval_index(self):
+        index = IntervalIndex()
+        for start, end in [(10, 20), (40, 50), (20, 25), (60, 70), (45, 65)]:
+            index.add(start, end)
+        self.assertEqual(index.starts, [10, 40])
+        self.assertEqual(index.ends, [25, 70])
+        self.assertEqual(index.find(0, 11), (10, 25))
+        self.assertEqual(index.find(24, 30), (10, 25))
+        self.assertEqual(index.find(30, 41), (40, 70))
+        self.assertIsNone(index.find(25, 40))
+        self.assertIsNone(index.find(0, 10))
+        self.assertIsNone(index.find(70, 80))
+
+    def test_double_booking(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        craft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        start = timezone.now() + timezone.timedelta(days=1)
+        booked = Flight.objects.create(
+            aircraft=craft,
+            departure=departure,
+            arrival=arrival,
+            departure_dt=start,
+            arrival_dt=start + timezone.timedelta(hours=2),
+        )
+        flight_data = {
+            "aircraft": craft.serial_number,
+            "arrival": arrival.icao,
+            "departure": departure.icao,
+            "departure_dt": start + timezone.timedelta(hours=1),
+            "arrival_dt": start + timezone.timedelta(hours=3),
+        }
+        self.assertFalse(CreateFlightSerializer(data=flight_data).is_valid())
+        # back to back flights and cancelled bookings do not conflict
+        flight_data["departure_dt"] = start + timezone.timedelta(hours=2)
+        ser = CreateFlightSerializer(data=flight_data)
+        self.assertTrue(ser.is_valid())
+        flight = ser.save()
+        # an update is checked against the other flights only
+        ser = CreateFlightSerializer(
+            instance=booked,
+            data={"arrival_dt": start + timezone.timedelta(hours=2, minutes=30)},
+            partial=True,
+        )
+        self.assertFalse(ser.is_valid())
+        ser = CreateFlightSerializer(
+            instance=booked, data={"status": "cancelled"}, partial=True
+        )
+        self.assertTrue(ser.is_valid())
+        ser.save()
+        ser = CreateFlightSerializer(
+            instance=flight,
+            data={"departure_dt": start + timezone.timedelta(minutes=30)},
+            partial=True,
+        )
+        self.assertTrue(ser.is_valid())
+
+
+class GeoTest(TestCase):
+    def test_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+        loc = create_airport("1EC4", lat="51.4700", lng="-0.4543").location
+        self.assertEqual(loc.geohash, encode_geohash(51.47, -0.4543))
+
+    def test_kdtree_matches_brute_force(self):
+        rng = random.Random(7)
+        points = [
+            geo.to_unit_vector(rng.uniform(-90, 90), rng.uniform(-180, 180))
+            for _ in range(2000)
+        ]
+        tree = geo.KDTree(points)
+        for _ in range(20):
+            query = geo.to_unit_vector(rng.uniform(-90, 90), rng.uniform(-180, 180))
+            brute = sorted(
+                (sum((a - b) ** 2 for a, b in zip(point, query)) ** 0.5, i)
+                for i, point in enumerate(points)
+            )
+            found = tree.nearest(query, 5)
+            self.assertEqual([i for _, i in found], [i for _, i in brute[:5]])
+            chord = geo.km_to_chord(500)
+            found = tree.nearest(query, len(points), chord)
+            self.assertEqual([i for _, i in found], [i for c, i in brute if c <= chord])
+
+
+class AutocompleteTest(TestCase):
+    def test_prefix_index_ranking(self):
+        self.assertEqual(
+            autocomplete.normalize("  Z\u00fcrich-Kloten "), "zurich kloten"
+        )
+        self.assertTrue({"a", "ba", "abc", "xb"} <= autocomplete.edits("ab"))
+        # tier 0 codes, tier 1 names, tier 2 words
+        index = autocomplete.PrefixIndex.build(
+            3,
+            (0, 2),
+            [
+                ("egll", "EGLL", [(0, "egll"), (1, "heathrow"), (2, "heathrow")]),
+                ("egl", "EGL", [(0, "egl"), (1, "egl field"), (2, "field")]),
+                ("hea", "HEA", [(0, "hea"), (1, "north hea"), (2, "north")]),
+            ],
+        )
+        self.assertEqual(
+            index.search("egl", 10),
+            [("EGL", "exact"), ("EGLL", "prefix")],
+        )
+        self.assertEqual(
+            index.search("hea", 10),
+            [("HEA", "exact"), ("EGLL", "prefix")],
+        )
+        self.assertEqual(index.search("egl", 1), [("EGL", "exact")])
+        self.assertEqual(index.search("haethrow", 10), [("EGLL", "fuzzy")])
+        self.assertEqual(index.search("feild", 10), [("EGL", "fuzzy")])
+        self.assertEqual(index.search("xyz", 10), [])
+        index.add("egl", "EGL", [(0, "egl"), (1, "gatwick"), (2, "gatwick")])
+        index.remove("egll")
+        self.assertEqual(index.search("gat", 10), [("EGL", "prefix")])
+        self.assertEqual(index.search("heathrow", 10), [])
+        self.assertEqual(index.terms[2], ["gatwick", "north"])
+
+    def test_index_follows_writes(self):
+        autocomplete.airports.invalidate()
+        heathrow = create_airport("EGLL", "London Heathrow")
+        self.assertEqual(
+            [a["icao"] for a in autocomplete.airports.search("lond", 10)], ["EGLL"]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            create_airport("EGKK", "London Gatwick")
+            heathrow.location.city = "Hounslow"
+            heathrow.location.save()
+        data = autocomplete.airports.search("London", 10)
+        self.assertCountEqual([a["icao"] for a in data], ["EGKK", "EGLL"])
+        self.assertEqual(
+            autocomplete.airports.search("hounslow", 10)[0]["icao"], "EGLL"
+        )
+        held = autocomplete.airports.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            heathrow.delete()
+        self.assertEqual(
+            [a["icao"] for a in autocomplete.airports.search("london", 10)], ["EGKK"]
+        )
+        # applied to a copy, the index readers hold does not change
+        self.assertIsNot(autocomplete.airports.get(), held)
+        self.assertEqual(len(held.search("london", 10)), 2)
+        # in place updates, no rebuild
+        self.assertIsNotNone(autocomplete.airports.value)
+        with self.assertNumQueries(0):
+            autocomplete.airports.search("gatwick", 10)
+
+
+class ScheduleTest(TestCase):
+    def test_materialize(self):
+        self.addCleanup(schedules.index.invalidate)
+        craft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        day = timezone.localdate() + timezone.timedelta(days=1)
+        schedule = Schedule.objects.create(
+            aircraft=craft,
+            departure=create_airport("EGLL"),
+            arrival=create_airport("KJFK"),
+            departure_time=time(7, 30),
+            block_time=timezone.timedelta(hours=8),
+            start_date=day,
+        )
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        days = lambda n: start + timezone.timedelta(days=n)  # noqa: E731
+        departures = [
+            days(n) + timezone.timedelta(hours=7, minutes=30) for n in range(9)
+        ]
+        self.assertEqual(
+            list(schedules.occurrences(schedule, start, days(3))), departures[:3]
+        )
+        schedule.days = "6"
+        weekly = list(schedules.occurrences(schedule, start, days(14)))
+        self.assertEqual([d.isoweekday() for d in weekly], [6, 6])
+        schedule.days = "1234567"
+
+        self.assertEqual(schedules.materialize(schedule, days(3)), (3, 0))
+        flights = Flight.objects.filter(schedule=schedule).order_by("departure_dt")
+        self.assertEqual([f.departure_dt for f in flights], departures[:3])
+        self.assertEqual(flights[0].arrival_dt, departures[0] + schedule.block_time)
+        self.assertEqual(flights[0].status, "scheduled")
+        self.assertEqual(flights[0].departure_minute, 450)
+        self.assertEqual(
+            sum(DepartureStats.objects.values_list("flight_count", flat=True)), 3
+        )
+        self.assertEqual(schedules.materialize(schedule, days(3)), (0, 0))
+        # deleted flights are not recreated, double bookings are skipped
+        flights[0].delete()
+        Flight.objects.create(
+            aircraft=craft,
+            departure=schedule.arrival,
+            arrival=schedule.departure,
+            departure_dt=departures[4],
+            arrival_dt=departures[4] + timezone.timedelta(hours=1),
+        )
+        with self.assertLogs("app.schedules", "WARNING"):
+            self.assertEqual(schedules.materialize(schedule, days(6)), (2, 1))
+        self.assertEqual(Flight.objects.filter(schedule=schedule).count(), 4)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.materialized_until, days(6))
+        # later occurrences are generated on the fly
+        pending = schedules.pending([schedule], start, days(9))
+        self.assertEqual([f.departure_dt for f in pending], departures[6:9])
+        self.assertEqual({f.uid for f in pending}, {None})
+
+    def test_count_and_search_limit(self):
+        self.addCleanup(schedules.index.invalidate)
+        today = timezone.localdate()
+        schedule = Schedule.objects.create(
+            departure=create_airport("EGLL"),
+            arrival=create_airport("KJFK"),
+            days="135",
+            departure_time=time(7, 30),
+            block_time=timezone.timedelta(hours=8),
+            start_date=today + timezone.timedelta(days=3),
+            end_date=today + timezone.timedelta(days=60),
+        )
+        now = timezone.now()
+        rng = random.Random(7)
+        for _ in range(50):
+            start = now + timezone.timedelta(hours=rng.randrange(24 * 70))
+            end = start + timezone.timedelta(hours=rng.randrange(24 * 30))
+            self.assertEqual(
+                schedules.count(schedule, start, end),
+                len(list(schedules.occurrences(schedule, start, end))),
+            )
+        # long intervals stop at the search limit
+        schedule.end_date = None
+        schedule.save()
+        end = now + timezone.timedelta(days=365 * 400)
+        limit = schedules.search_limit()
+        pending = schedules.pending([schedule], now, end)
+        self.assertLess(pending[-1].departure_dt, limit)
+        [row] = schedules.departure_totals([], now, end)
+        self.assertEqual(row["flight_count"], len(pending))
+        self.assertEqual(row["inflight_avg"], schedule.block_time)
+
+
+class RouteTest(TestCase):
+    def test_connection_scan(self):
+        start = timezone.make_aware(datetime(2030, 1, 1, 6, 0))
+        hours = lambda h: start + timezone.timedelta(hours=h)  # noqa: E731
+        flights = [
+            # uid, from, to, departure, arrival
+            (1, "A", "B", 0, 2),
+            (2, "B", "C", 2.5, 4),  # 30 minutes connection
+            (3, "B", "C", 3, 5),
+            (4, "A", "C", 1, 7),
+            (5, "C", "D", 6, 8),
+            (6, "A", "B", 4, 6),
+            (7, "B", "C", 7, 8),
+        ]
+        timetable = routes.Timetable(
+            {
+                "uid": uid,
+                "departure_id": source,
+                "arrival_id": to,
+                "departure_dt": hours(departure),
+                "arrival_dt": hours(arrival),
+            }
+            for uid, source, to, departure, arrival in flights
+        )
+
+        def search(origin, destination, connection=45, legs=3, end=24):
+            journeys = timetable.search(
+                origin,
+                destination,
+                start.timestamp(),
+                hours(end).timestamp(),
+                connection * 60,
+                legs,
+                5,
+            )
+            return [[c[1] for c in journey] for journey in journeys]
+
+        self.assertEqual(search("A", "C"), [[1, 3], [4], [6, 7]])
+        self.assertEqual(search("A", "C", connection=30), [[1, 2], [4], [6, 7]])
+        self.assertEqual(search("A", "C", legs=1), [[4]])
+        self.assertEqual(search("A", "D"), [[1, 3, 5]])
+        self.assertEqual(search("A", "D", legs=2), [])
+        self.assertEqual(search("A", "C", end=7), [[1, 3], [4]])
+        timetable.remove(3, hours(3).timestamp())
+        self.assertEqual(search("A", "C"), [[4], [6, 7]])
+        # a copy only copies the days it writes to
+        original = timetable
+        timetable = original.copy()
+        timetable.add(
+            {
+                "uid": 8,
+                "departure_id": "A",
+                "arrival_id": "C",
+                "departure_dt": hours(48),
+                "arrival_dt": hours(49),
+            }
+        )
+        timetable.remove(4, hours(1).timestamp())
+        self.assertEqual(search("A", "C", end=72), [[1, 7], [6, 7], [8]])
+        self.assertEqual([c[1] for c in original], [1, 4, 2, 6, 5, 7])
+        self.assertEqual(len(timetable.days), 2)
+        timetable.prune(hours(5).timestamp())
+        self.assertEqual([c[1] for c in timetable], [5, 7, 8])
+        self.assertEqual(len(original.days), 1)
+
+    def test_graph_updates(self):
+        ams, lhr = create_airport("EHAM"), create_airport("EGLL")
+        now = timezone.now()
+
+        def create_flight(hours):
+            return Flight.objects.create(
+                departure=ams,
+                arrival=lhr,
+                departure_dt=now + timezone.timedelta(hours=hours),
+                arrival_dt=now + timezone.timedelta(hours=hours + 1),
+            )
+
+        departed, upcoming = create_flight(-48), create_flight(2)
+        routes.graph.invalidate()
+        # another process sharing the version
+        other = routes.RouteGraph()
+        timetable = other.get()
+        self.assertEqual([c[1] for c in timetable], [upcoming.uid])
+        with self.captureOnCommitCallbacks(execute=True):
+            later = create_flight(4)
+            departed.departure_dt = now - timezone.timedelta(hours=47)
+            departed.save()
+        # catches up with the changes of the writing process without a query
+        with self.assertNumQueries(0):
+            self.assertEqual([c[1] for c in other.get()], [upcoming.uid, later.uid])
+        # applied to a copy, the structure readers hold does not change
+        self.assertEqual([c[1] for c in timetable], [upcoming.uid])
+        routes.graph.invalidate()
+        with self.assertNumQueries(1):
+            other.get()
+
+
+class FeedTest(TestCase):
+    def setUp(self):
+        self.user = create_user({"email": "user@nuvolar.com", "password": "user"})
+        self.departure = create_airport("1EC4")
+        self.arrival = create_airport("1EC5")
+        self.other = create_airport("1EC6")
+        self.start = timezone.now() + timezone.timedelta(days=1)
+
+    def create_flight(self, departure, arrival):
+        return Flight.objects.create(
+            departure=departure,
+            arrival=arrival,
+            departure_dt=self.start,
+            arrival_dt=self.start + timezone.timedelta(hours=2),
+            status="scheduled",
+        )
+
+    def test_change_log(self):
+        flight = self.create_flight(self.departure, self.arrival)
+        flight.status = "departed"
+        flight.save()
+        # changes to other fields are not logged
+        flight.updated_at = timezone.now()
+        flight.save()
+        self.create_flight(self.other, self.arrival)
+        flight.delete()
+        changes = FlightChange.objects.order_by("id")
+        self.assertEqual(
+            [(c.kind, c.status, c.previous_status) for c in changes],
+            [
+                ("created", "scheduled", None),
+                ("updated", "departed", "scheduled"),
+                ("created", "scheduled", None),
+                ("deleted", "departed", "departed"),
+            ],
+        )
+        self.client.force_login(self.user)
+        route = reverse("flight-changes")
+        resp = self.client.get(route + "?airport=1ec4&page_size=2")
+        data = resp.json()
+        self.assertEqual([c["kind"] for c in data["data"]], ["created", "updated"])
+        resp = self.client.get(route + f"?airport=1ec4&after={data['next']}")
+        self.assertEqual([c["kind"] for c in resp.json()["data"]], ["deleted"])
+        resp = self.client.get(route + "?airport=zzzz")
+        self.assertEqual(resp.status_code, 404)
+
+    @override_settings(FEED_POLL_INTERVAL=0.01)
+    def test_asgi_stream(self):
+        first = self.create_flight(self.departure, self.arrival)
+        async_to_sync(self.stream)(first)
+
+    async def stream(self, first):
+        def request(query, headers=()):
+            scope = {
+                "type": "http",
+                "path": "/api/flight/changes/stream/",
+                "query_string": query.encode(),
+                "headers": list(headers),
+            }
+            return ApplicationCommunicator(FeedRouter(None), scope)
+
+        async def events(communicator, count):
+            frames = []
+            while len(frames) < count:
+                message = await communicator.receive_output(1)
+                frames += message["body"].decode().strip().split("\n\n")
+            return [dict(line.split(": ", 1) for line in f.split("\n")) for f in frames]
+
+        communicator = request("airport=1EC4")
+        await communicator.send_input({"type": "http.request"})
+        self.assertEqual((await communicator.receive_output(1))["status"], 401)
+
+        token = str(await sync_to_async(AccessToken.for_user)(self.user))
+        live = request(f"airport=1EC4&token={token}")
+        await live.send_input({"type": "http.request"})
+        start = await live.receive_output(1)
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+        # resuming from a cursor replays the backlog first
+        first_id = await sync_to_async(
+            lambda: FlightChange.objects.get(flight=first.uid).id
+        )()
+        resume = request(
+            "airport=1EC4",
+            [
+                (b"authorization", f"Bearer {token}".encode()),
+                (b"last-event-id", str(first_id - 1).encode()),
+            ],
+        )
+        await resume.send_input({"type": "http.request"})
+        await resume.receive_output(1)
+        [backlog] = await events(resume, 1)
+        self.assertEqual(backlog["id"], str(first_id))
+
+        await sync_to_async(self.create_flight)(self.other, self.arrival)
+        flight = await sync_to_async(self.create_flight)(self.arrival, self.departure)
+        [created] = await events(live, 1)
+        self.assertEqual(created["event"], "created")
+        self.assertEqual(json.loads(created["data"])["flight"], str(flight.uid))
+        [created] = await events(resume, 1)
+        self.assertEqual(json.loads(created["data"])["flight"], str(flight.uid))
+        for communicator in (live, resume):
+            await communicator.send_input({"type": "http.disconnect"})
+            await communicator.wait(1)
+
+
+class AsyncViewTest(TestCase):
+    def setUp(self):
+        self.user = create_user({"email": "user@nuvolar.com", "password": "user"})
+        self.admin = create_user(
+            {"email": "admin@nuvolar.com", "password": "admin"}, role="admin"
+        )
+        self.departure = create_airport("1EC4")
+        self.arrival = create_airport("1EC5")
+        self.aircraft = Aircraft.objects.create(
+            serial_number="JtFRIOPL", manufacturer="nuvolar"
+        )
+        start = format_datetime_str("2030-01-01 08:00")
+        self.flights = [
+            Flight.objects.create(
+                aircraft=self.aircraft if i % 2 else None,
+                departure=self.departure,
+                arrival=self.arrival,
+                departure_dt=start + timezone.timedelta(hours=i * 5),
+                arrival_dt=start + timezone.timedelta(hours=i * 5 + 2),
+            )
+            for i in range(6)
+        ]
+        self.factory = AsyncRequestFactory()
+
+    def get(self, view, path, user=None, headers=None, **kwargs):
+        headers = dict(headers or {})
+        if user is not None:
+            headers["Authorization"] = f"Bearer {AccessToken.for_user(user)}"
+        request = self.factory.get(path, headers=headers)
+        return async_to_sync(view)(request, **kwargs)
+
+    def test_responses_match_sync_views(self):
+        self.client.force_login(self.user)
+        interval = "interval=2030-01-01 10:00;2030-01-02 18:00"
+        cases = [
+            (async_views.flight_search, "/api/flight/search/?dept=1ec4", {}),
+            (async_views.flight_search, "/api/flight/search/?dept_rng=07:00;14:00", {}),
+            (async_views.departure_search, f"/api/departures/search/?{interval}", {}),
+            (
+                async_views.departure_flights,
+                f"/api/departures/flights/{self.departure.uid}/?{interval}",
+                {"uid": str(self.departure.uid)},
+            ),
+            (async_views.flight, "/api/flight/?page_size=4", {}),
+            (async_views.flight, "/api/flight/?fields=uid,arrival&expand=", {}),
+            (async_views.airport, "/api/airport/?expand=", {}),
+            (async_views.flight_search, "/api/flight/search/?arr=1ec5&fields=x", {}),
+            (
+                async_views.flight,
+                f"/api/flight/{self.flights[1].uid}/",
+                {"uid": str(self.flights[1].uid)},
+            ),
+            (async_views.airport, "/api/airport/", {}),
+            (
+                async_views.aircraft,
+                f"/api/aircraft/{self.aircraft.uid}/",
+                {"uid": str(self.aircraft.uid)},
+            ),
+        ]
+        for view, path, kwargs in cases:
+            with self.subTest(path=path):
+                expected = self.client.get(path)
+                resp = self.get(view, path, self.user, **kwargs)
+                self.assertEqual(resp.status_code, expected.status_code)
+                self.assertEqual(json.loads(resp.content), expected.json())
+                self.assertEqual(resp["ETag"], expected["ETag"])
+        with override_settings(FAST_READ_PATH=False):
+            resp = self.get(async_views.flight_search, "/api/flight/search/?arr=1ec5")
+        self.assertEqual(len(json.loads(resp.content)["data"]), 6)
+        resp = self.get(async_views.flight_search, "/api/flight/search/")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.get(async_views.aircraft, "/api/aircraft/x/", self.user, uid="x")
+        self.assertEqual(resp.status_code, 404)
+
+    def test_pagination_and_conditional_get(self):
+        path = "/api/flight/?page_size=4"
+        resp = self.get(async_views.flight, path, self.user)
+        etag, data = resp["ETag"], json.loads(resp.content)
+        self.assertEqual(len(data["data"]), 4)
+        resp = self.get(async_views.flight, f"{path}&cursor={data['next']}", self.user)
+        data = json.loads(resp.content)
+        self.assertEqual(len(data["data"]), 2)
+        self.assertIsNone(data["next"])
+        resp = self.get(async_views.flight, f"{path}&cursor=bad", self.user)
+        self.assertEqual(resp.status_code, 400)
+        with self.assertNumQueries(1):  # the user
+            resp = self.get(
+                async_views.flight,
+                path,
+                self.user,
+                {"If-None-Match": etag},
+            )
+        self.assertEqual(resp.status_code, 304)
+
+    def test_authentication_and_writes(self):
+        view = async_views.reads(async_views.flight, FlightView.as_view())
+        path = f"/api/flight/{self.flights[0].uid}/"
+        uid = str(self.flights[0].uid)
+        resp = self.get(view, path, uid=uid)
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(resp["WWW-Authenticate"], 'Bearer realm="api"')
+        resp = self.get(view, path, headers={"Authorization": "Bearer x"}, uid=uid)
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(self.get(view, path, self.user, uid=uid).status_code, 200)
+        # writes are handled by the DRF view
+        request = self.factory.put(
+            path,
+            {"status": "departed"},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {AccessToken.for_user(self.user)}"},
+        )
+        self.assertEqual(async_to_sync(view)(request, uid=uid).status_code, 403)
+        request = self.factory.put(
+            path,
+            {"status": "departed"},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {AccessToken.for_user(self.admin)}"},
+        )
+        self.assertEqual(async_to_sync(view)(request, uid=uid).status_code, 200)
+        self.flights[0].refresh_from_db()
+        self.assertEqual(self.flights[0].status, "departed")
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.user = create_user({"email": "user@nuvolar.com", "password": "user"})
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        departure, arrival = create_airport("1EC4"), create_airport("1EC5")
+        start = timezone.now() + timezone.timedelta(days=1)
+        Flight.objects.create(
+            departure=departure,
+            arrival=arrival,
+            departure_dt=start,
+            arrival_dt=start + timezone.timedelta(hours=1),
+        )
+        admin = create_user({"email": "admin@nuvolar.com", "password": "a"}, "admin")
+        self.admin_headers = {"Authorization": f"Bearer {AccessToken.for_user(admin)}"}
+        metrics.registry.reset()
+
+    def sample(self, name, **labels):
+        resp = self.client.get(reverse("metrics"), headers=self.admin_headers)
+        body = resp.content.decode()
+        pairs = ",".join(f'{key}="{value}"' for key, value in labels.items())
+        prefix = f"{name}{{{pairs}}} "
+        lines = body.splitlines()
+        return [float(line[len(prefix) :]) for line in lines if line.startswith(prefix)]
+
+    def test_request_metrics(self):
+        resp = self.client.get(reverse("flight"), headers=self.headers)
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.get(reverse("flight") + "?cursor=bad", headers=self.headers)
+        self.assertEqual(resp.status_code, 400)
+        labels = {"view": "flight", "method": "GET"}
+        for status_code in (200, 400):
+            total = self.sample("http_responses_total", **labels, status=status_code)
+            self.assertEqual(total, [1])
+        # the user lookup of the JWT authentication and the page
+        self.assertEqual(self.sample("http_request_db_queries_sum", **labels), [3])
+        self.assertEqual(
+            self.sample("http_request_db_queries_bucket", **labels, le=1), [1]
+        )
+        self.assertEqual(
+            self.sample("http_request_duration_seconds_count", **labels), [2]
+        )
+        self.assertGreater(
+            self.sample("http_request_serialize_seconds_sum", **labels)[0], 0
+        )
+
+    def test_async_requests(self):
+        async def get(path):
+            return await AsyncClient().get(path, headers=self.headers)
+
+        resp = async_to_sync(get)("/api/flight/search/?dept=1ec4")
+        self.assertEqual(resp.status_code, 200)
+        labels = {"view": "flight-search", "method": "GET"}
+        self.assertEqual(self.sample("http_request_db_queries_sum", **labels), [2])
+
+    @override_settings(SLOW_REQUEST_MS=0.001)
+    def test_slow_request_log(self):
+        with self.assertLogs("app.metrics", "WARNING") as logs:
+            self.client.get("/api/flight/search/?dept=1ec4", headers=self.headers)
+        self.assertIn(
+            "Slow request GET /api/flight/search/?dept=1ec4 200", logs.output[0]
+        )
+        self.assertIn('FROM "app_flight"', logs.output[0])
+        self.assertIn("in flight_search", logs.output[0])
+        self.assertNotIn("site-packages", logs.output[0])
+        # stacks are only recorded once the request is over the threshold
+        request = metrics.RequestMetrics(slow_ms=60000)
+        token = metrics.current.set(request)
+        try:
+            Flight.objects.count()
+        finally:
+            metrics.current.reset(token)
+        self.assertEqual([stack for _, _, stack in request.log], [None])
+
+    def test_metrics_endpoint_is_for_admins(self):
+        resp = self.client.get(reverse("metrics"))
+        self.assertEqual(resp.status_code, 401)
+        resp = self.client.get(reverse("metrics"), headers=self.headers)
+        self.assertEqual(resp.status_code, 403)
+        resp = self.client.get(reverse("metrics"), headers=self.admin_headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], metrics.CONTENT_TYPE)
+
+
 class APITest(APITestCase):
     def setUp(self) -> None:
         self.user_login = {"email": "user@nuvolar.com", "password": "user"}
@@ -233,6 +1105,45 @@ class APITest(APITestCase):
         with self.assertRaises(Airport.DoesNotExist):
             Airport.objects.get(uid=port.uid)
 
+    def test_stateless_jwt_authentication(self):
+        resp = self.client.post(reverse("token_obtain_pair"), self.user_login)
+        self.assertEqual(AccessToken(resp.data["access"])["role"], "user")
+        resp = self.client.post(
+            reverse("token_refresh"), {"refresh": resp.data["refresh"]}
+        )
+        access = resp.data["access"]
+        self.assertEqual(AccessToken(access)["role"], "user")
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {access}"}
+
+        def count_queries(method, url, status_code):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = getattr(self.client, method)(url, **headers)
+            self.assertEqual(resp.status_code, status_code)
+            return len(ctx.captured_queries)
+
+        # the user state is loaded once, then permission checks need no query
+        self.assertEqual(count_queries("get", self.aircraft, 200), 2)
+        self.assertEqual(count_queries("get", self.aircraft, 200), 1)
+        self.assertEqual(count_queries("post", reverse("batch"), 403), 0)
+        request = AsyncRequestFactory().get(
+            self.aircraft, headers={"Authorization": f"Bearer {access}"}
+        )
+        resp = async_to_sync(async_views.aircraft)(request)
+        self.assertEqual(resp.status_code, 200)
+        # deactivation and role changes revoke the tokens
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(count_queries("get", self.aircraft, 401), 1)
+        self.user.is_active = True
+        self.user.role = "admin"
+        self.user.save()
+        resp = self.client.get(self.aircraft, **headers)
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(resp.data["code"], "role_changed")
+        self.user.delete()
+        resp = self.client.get(self.aircraft, **headers)
+        self.assertEqual(resp.data["code"], "user_not_found")
+
     def test_aircraft_crud(self):
         # Not Logged In Test
         resp = self.client.get(self.aircraft)
@@ -340,6 +1251,45 @@ class APITest(APITestCase):
         with self.assertRaises(Flight.DoesNotExist):
             Flight.objects.get(uid=flight.uid)
 
+    def test_flight_concurrent_booking(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        aircraft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="N")
+        dt = timezone.now() + timezone.timedelta(days=1)
+        flight = Flight.objects.create(
+            departure=departure,
+            arrival=arrival,
+            departure_dt=dt,
+            arrival_dt=dt + timezone.timedelta(hours=2),
+        )
+        flight_data = {
+            "aircraft": aircraft.serial_number,
+            "departure": departure.icao,
+            "arrival": arrival.icao,
+            "departure_dt": str(dt + timezone.timedelta(days=1)),
+            "arrival_dt": str(dt + timezone.timedelta(days=1, hours=2)),
+        }
+        # the exclusion constraint rejects a booking made concurrently
+        conflict = IntegrityError(
+            'conflicting key value violates exclusion constraint "'
+            + NO_OVERLAP_CONSTRAINT
+            + '"'
+        )
+        self.client.force_authenticate(self.admin)
+        detail = reverse("flight-dets", args=[flight.uid])
+        with mock.patch.object(Flight, "save", side_effect=conflict):
+            resp = self.client.post(reverse("flight"), flight_data)
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(resp.data["message"], "Conflicting booking.")
+            resp = self.client.put(detail, {"aircraft": aircraft.serial_number})
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(resp.data["message"], "Conflicting booking.")
+        self.assertEqual(Flight.objects.count(), 1)
+        # other integrity errors are not reported as booking conflicts
+        with mock.patch.object(Flight, "save", side_effect=IntegrityError("fk")):
+            with self.assertRaises(IntegrityError):
+                self.client.post(reverse("flight"), flight_data)
+
     def test_flight_search(self):
         by_arrival = "/api/flight/search/?arr=1ec4"
         by_dept = "/api/flight/search/?dept=1ec9"
@@ -352,3 +1302,857 @@ class APITest(APITestCase):
         self.assertEqual(resp1.status_code, 200)
         self.assertEqual(resp2.status_code, 200)
         self.assertEqual(resp3.status_code, 200)
+
+    def test_flight_pagination(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        start = timezone.now() + timezone.timedelta(days=1)
+        for i in range(5):
+            # two flights share each departure time to exercise the uid tie-break
+            Flight.objects.create(
+                departure=departure,
+                arrival=arrival,
+                departure_dt=start + timezone.timedelta(hours=i // 2),
+                arrival_dt=start + timezone.timedelta(hours=i // 2 + 1),
+            )
+        self.client.login(**self.user_login)
+        seen = []
+        url = reverse("flight") + "?page_size=2"
+        resp = self.client.get(url)
+        while True:
+            self.assertEqual(resp.status_code, 200)
+            self.assertLessEqual(len(resp.data["data"]), 2)
+            seen += [row["uid"] for row in resp.data["data"]]
+            if not resp.data["next"]:
+                break
+            resp = self.client.get(url + "&cursor=" + resp.data["next"])
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+        expected = Flight.objects.order_by("departure_dt", "uid")
+        self.assertEqual(seen, [str(f.uid) for f in expected])
+        # Invalid cursor and page size
+        resp = self.client.get(reverse("flight") + "?cursor=bad")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get(reverse("flight") + "?page_size=0")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_flight_list_query_count(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        craft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        start = timezone.now() + timezone.timedelta(days=1)
+        self.client.force_authenticate(self.user)
+
+        def count_queries(url):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            return len(ctx.captured_queries)
+
+        counts = []
+        for i in range(3):
+            Flight.objects.create(
+                aircraft=craft,
+                departure=departure,
+                arrival=arrival,
+                departure_dt=start + timezone.timedelta(hours=i),
+                arrival_dt=start + timezone.timedelta(hours=i + 1),
+            )
+            # the values() fast path and the serializer of with_related()
+            for fast in (True, False):
+                with override_settings(FAST_READ_PATH=fast):
+                    counts.append(
+                        (
+                            count_queries(reverse("flight")),
+                            count_queries("/api/flight/search/?dept=1ec4"),
+                        )
+                    )
+        self.assertEqual(counts, [(1, 1)] * 6)
+
+    def test_fieldsets(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        craft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        start = timezone.now() + timezone.timedelta(days=1)
+        flight = Flight.objects.create(
+            aircraft=craft,
+            departure=departure,
+            arrival=arrival,
+            departure_dt=start,
+            arrival_dt=start + timezone.timedelta(hours=1),
+        )
+        self.client.force_authenticate(self.user)
+
+        def get(url):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            return resp, ctx.captured_queries[-1]["sql"]
+
+        url = reverse("flight") + "?fields=uid,status,aircraft&expand="
+        for fast in (True, False):
+            with override_settings(FAST_READ_PATH=fast):
+                resp, sql = get(url)
+            self.assertEqual(
+                resp.json()["data"],
+                [
+                    {
+                        "uid": str(flight.uid),
+                        "status": flight.status,
+                        "aircraft": str(craft.uid),
+                    }
+                ],
+            )
+            self.assertNotIn("JOIN", sql)
+            self.assertNotIn("arrival_dt", sql)
+        url = "/api/flight/search/?dept=1ec4&fields=uid,aircraft&expand=aircraft"
+        for fast in (True, False):
+            with override_settings(FAST_READ_PATH=fast):
+                resp, sql = get(url)
+            self.assertEqual(
+                resp.json()["data"],
+                [{"uid": str(flight.uid), "aircraft": AirCraftSerializer(craft).data}],
+            )
+            self.assertNotIn("airport", sql.split(" FROM ")[0])
+        # relations are expanded unless left out of `expand`
+        resp, _ = get(reverse("flight-dets", args=[flight.uid]) + "?expand=departure")
+        data = resp.json()["data"]
+        self.assertEqual(data["departure"]["icao"], "1EC4")
+        self.assertEqual(data["arrival"], str(arrival.uid))
+        resp, _ = get(reverse("flight-dets", args=[flight.uid]) + "?fields=departure")
+        self.assertEqual(
+            resp.json()["data"]["departure"]["location"]["city"], "Test City"
+        )
+        resp, sql = get(reverse("airport") + "?fields=icao,location&expand=")
+        self.assertEqual(
+            resp.json()["data"],
+            [
+                {"icao": airport.icao, "location": airport.location_id}
+                for airport in Airport.objects.order_by("created_at", "uid")
+            ],
+        )
+        self.assertNotIn("JOIN", sql)
+        resp, _ = get(
+            reverse("aircraft-dets", args=[craft.uid]) + "?fields=manufacturer"
+        )
+        self.assertEqual(resp.json()["data"], {"manufacturer": "Nuvola"})
+        for query in ("fields=uid,nope", "expand=status", "expand=nope"):
+            resp = self.client.get(reverse("flight") + "?" + query)
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(resp.data["status"], False)
+
+    def test_departure_search(self):
+        departure = create_airport("1EC4", "Airport1")
+        other = create_airport("1EC6", "Airport3")
+        arrival = create_airport("1EC5", "Airport2")
+        start = timezone.make_aware(datetime(2030, 1, 1, 10, 0))
+        for i, minutes in enumerate([60, 120]):
+            Flight.objects.create(
+                departure=departure,
+                arrival=arrival,
+                departure_dt=start + timezone.timedelta(hours=i),
+                arrival_dt=start + timezone.timedelta(hours=i, minutes=minutes),
+            )
+        Flight.objects.create(
+            departure=other,
+            arrival=arrival,
+            departure_dt=start,
+            arrival_dt=start + timezone.timedelta(minutes=30),
+        )
+        # outside of the requested interval
+        Flight.objects.create(
+            departure=departure,
+            arrival=arrival,
+            departure_dt=start + timezone.timedelta(days=2),
+            arrival_dt=start + timezone.timedelta(days=2, minutes=600),
+        )
+        self.client.force_authenticate(self.user)
+        url = "/api/departures/search/?interval=2030-01-01 00:00;2030-01-01 23:59"
+        # loaded on the first search of the process
+        schedules.index.invalidate()
+        schedules.index.get()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        # the day rollups and the flights of the day after 23:59
+        self.assertEqual(len(ctx.captured_queries), 2)
+        expected = [
+            {
+                "uid": str(departure.uid),
+                "icao": "1EC4",
+                "name": "Airport1",
+                "flight_count": 2,
+                "inflight_avg": 90.0,
+            },
+            {
+                "uid": str(other.uid),
+                "icao": "1EC6",
+                "name": "Airport3",
+                "flight_count": 1,
+                "inflight_avg": 30.0,
+            },
+        ]
+        self.assertEqual([dict(row) for row in resp.data["data"]], expected)
+        # short intervals are read from the flights
+        url = "/api/departures/search/?interval=2030-01-01 10:30;2030-01-01 11:30"
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual([row["flight_count"] for row in resp.data["data"]], [1])
+        # the rollups follow updates and deletes, and match a rebuild
+        flight = Flight.objects.get(departure=other)
+        flight.departure = departure
+        flight.save()
+        Flight.objects.filter(departure_dt=start + timezone.timedelta(hours=1)).get(
+            departure=departure
+        ).delete()
+        url = "/api/departures/search/?interval=2029-12-31 00:00;2030-01-03 23:59"
+        expected = [dict(expected[0], flight_count=3, inflight_avg=230.0)]
+        self.assertEqual(
+            [dict(row) for row in self.client.get(url).data["data"]], expected
+        )
+        call_command("rebuild_departure_stats", stdout=StringIO())
+        self.assertEqual(
+            [dict(row) for row in self.client.get(url).data["data"]], expected
+        )
+        resp = self.client.get("/api/departures/search/?interval=2030-01-01")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_flight_search_time_range(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        day = timezone.make_aware(datetime(2030, 1, 1))
+        flights = {}
+        for hour, minute in [(1, 0), (10, 0), (17, 30), (21, 30), (23, 15)]:
+            dt = day + timezone.timedelta(hours=hour, minutes=minute)
+            flights[(hour, minute)] = Flight.objects.create(
+                departure=departure,
+                arrival=arrival,
+                departure_dt=dt,
+                arrival_dt=dt + timezone.timedelta(hours=1),
+            )
+        self.assertEqual(flights[(17, 30)].departure_minute, 1050)
+        self.client.force_authenticate(self.user)
+
+        def search(rng):
+            resp = self.client.get("/api/flight/search/?dept_rng=" + rng)
+            self.assertEqual(resp.status_code, 200)
+            return sorted(row["departure_dt"][11:16] for row in resp.data["data"])
+
+        self.assertEqual(search("17:30;21:30"), ["17:30", "21:30"])
+        self.assertEqual(search("22:00;02:00"), ["01:00", "23:15"])
+        resp = self.client.get("/api/flight/search/?dept_rng=25:00;02:00")
+        self.assertEqual(resp.status_code, 400)
+        # updates keep the stored minute in sync
+        flight = flights[(10, 0)]
+        flight.departure_dt = day + timezone.timedelta(hours=22, minutes=30)
+        flight.save()
+        self.assertEqual(search("22:00;02:00"), ["01:00", "22:30", "23:15"])
+
+    def test_flight_import(self):
+        create_airport("1EC4")
+        create_airport("1EC5")
+        Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        route = reverse("flight-import")
+        dt = timezone.now() + timezone.timedelta(days=1)
+        rows = [
+            {
+                "aircraft": "as12hd4b",
+                "departure": "1ec4",
+                "arrival": "1EC5",
+                "departure_dt": str(dt),
+                "arrival_dt": str(dt + timezone.timedelta(hours=2)),
+                "status": "scheduled",
+            },
+            {
+                "departure": "1EC4",
+                "arrival": "XXXX",
+                "departure_dt": str(dt),
+                "arrival_dt": str(dt - timezone.timedelta(hours=2)),
+            },
+            {"departure": "1EC4", "arrival": "1EC5", "departure_dt": "tomorrow"},
+        ]
+        self.client.force_authenticate(self.user)
+        resp = self.client.post(route, rows, format="json")
+        self.assertEqual(resp.status_code, 403)
+        self.client.force_authenticate(self.admin)
+        for batch_size in ("-5", "0", "two"):
+            resp = self.client.post(f"{route}?batch_size={batch_size}", rows, "json")
+            self.assertEqual(resp.status_code, 400)
+        resp = self.client.post(route + "?batch_size=2", rows, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["data"]["created"], 1)
+        errors = {e["row"]: e["errors"] for e in resp.data["data"]["errors"]}
+        self.assertEqual(set(errors), {1, 2})
+        self.assertIn("arrival", errors[1])
+        self.assertEqual(set(errors[2]), {"departure_dt", "arrival_dt"})
+        flight = Flight.objects.get()
+        self.assertEqual(flight.departure.icao, "1EC4")
+        self.assertEqual(flight.aircraft.serial_number, "AS12HD4B")
+        self.assertEqual(flight.departure_minute, minute_of_day(dt))
+
+        header = "departure,arrival,departure_dt,arrival_dt\n"
+        line = f"1EC5,1EC4,{dt},{dt + timezone.timedelta(hours=1)}\n"
+        resp = self.client.generic(
+            "POST", route, header + line * 3, content_type="text/csv"
+        )
+        self.assertEqual(resp.data["data"], {"created": 3, "errors": []})
+        # rows 0 and 3 double book the aircraft, with the database and row 2
+        later = dict(rows[0], departure_dt=str(dt + timezone.timedelta(hours=3)))
+        later["arrival_dt"] = str(dt + timezone.timedelta(hours=4))
+        overlap = dict(later, departure_dt=str(dt + timezone.timedelta(hours=3.5)))
+        lines = [
+            json.dumps(rows[0]),
+            "{not json}",
+            json.dumps(later),
+            json.dumps(overlap),
+        ]
+        resp = self.client.generic(
+            "POST", route, "\n".join(lines), content_type="application/x-ndjson"
+        )
+        self.assertEqual(resp.data["data"]["created"], 1)
+        errors = {e["row"]: e["errors"] for e in resp.data["data"]["errors"]}
+        self.assertEqual(set(errors), {0, 1, 3})
+        self.assertIn("aircraft", errors[0])
+        self.assertIn("aircraft", errors[3])
+        self.assertEqual(Flight.objects.count(), 5)
+        # only a violation of the no overlap constraint is a conflicting booking
+        spare = dict(rows[0], departure_dt=str(dt + timezone.timedelta(hours=9)))
+        spare["arrival_dt"] = str(dt + timezone.timedelta(hours=10))
+        for message, expected in [
+            (
+                'violates exclusion constraint "app_flight_aircraft_no_overlap"',
+                {"aircraft": ["Conflicting booking."]},
+            ),
+            (
+                "FOREIGN KEY constraint failed",
+                {"non_field_errors": ["Conflicting write."]},
+            ),
+        ]:
+            error = IntegrityError(message)
+            with mock.patch.object(Flight.objects, "bulk_create", side_effect=error):
+                resp = self.client.post(route, [spare], format="json")
+            self.assertEqual(resp.data["data"]["errors"][0]["errors"], expected)
+        with self.assertRaisesMessage(CommandError, "--batch-size must be >= 1"):
+            call_command("import_flights", "flights.csv", "--batch-size=0")
+
+    def test_batch(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        aircraft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="N")
+        dt = timezone.now() + timezone.timedelta(days=1)
+
+        def create_flight(**kwargs):
+            return Flight.objects.create(
+                departure=departure,
+                arrival=arrival,
+                departure_dt=dt,
+                arrival_dt=dt + timezone.timedelta(hours=2),
+                status="scheduled",
+                **kwargs,
+            )
+
+        def op(op, resource, obj=None, **data):
+            operation = {"op": op, "resource": resource, "data": data}
+            if obj is not None:
+                operation["uid"] = str(getattr(obj, "uid", obj))
+            return operation
+
+        booked, unassigned, doomed = (
+            create_flight(aircraft=aircraft),
+            create_flight(),
+            create_flight(),
+        )
+        route = reverse("batch")
+        operations = [
+            # the aircraft moves to a flight overlapping the one it leaves
+            op("update", "flight", booked, status="cancelled"),
+            op("update", "flight", unassigned, aircraft="as12hd4b", status="departed"),
+            op("delete", "flight", doomed),
+            op("create", "aircraft", serial_number="new1", manufacturer="N"),
+            op("update", "airport", departure, name="Renamed"),
+            # refers to the aircraft created above
+            op(
+                "create",
+                "flight",
+                aircraft="NEW1",
+                departure="1EC5",
+                arrival="1EC4",
+                departure_dt=str(dt),
+                arrival_dt=str(dt + timezone.timedelta(hours=1)),
+                status="scheduled",
+            ),
+        ]
+        self.client.force_authenticate(self.user)
+        resp = self.client.post(route, operations, format="json")
+        self.assertEqual(resp.status_code, 403)
+        self.client.force_authenticate(self.admin)
+        resp = self.client.post(route, operations, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(all(result["status"] for result in resp.data["data"]))
+        created = Flight.objects.get(uid=resp.data["data"][5]["uid"])
+        self.assertEqual(created.aircraft.serial_number, "NEW1")
+        self.assertEqual(created.departure_minute, minute_of_day(dt))
+        self.assertIsNone(unassigned.updated_at)
+        unassigned.refresh_from_db()
+        self.assertEqual(unassigned.aircraft_id, aircraft.uid)
+        self.assertEqual(unassigned.status, "departed")
+        self.assertIsNotNone(unassigned.updated_at)
+        self.assertEqual(Airport.objects.get(uid=departure.uid).name, "Renamed")
+        self.assertFalse(Flight.objects.filter(uid=doomed.uid).exists())
+        self.assertEqual(
+            sorted(FlightChange.objects.values_list("kind", flat=True)),
+            ["created"] * 4 + ["deleted", "updated", "updated"],
+        )
+
+        # one invalid operation rolls back the others
+        operations = [
+            op("update", "airport", arrival, name="Renamed"),
+            op("update", "flight", booked, status="scheduled"),
+            op("update", "flight", created, arrival="XXXX"),
+            op("delete", "aircraft", "missing"),
+        ]
+        resp = self.client.post(route, operations, format="json")
+        self.assertEqual(resp.status_code, 400)
+        statuses = [result["status"] for result in resp.data["data"]]
+        self.assertEqual(statuses, [True, True, True, False])
+        operations[3] = op("delete", "aircraft", uuid.uuid4())
+        resp = self.client.post(route, operations, format="json")
+        statuses = [result["status"] for result in resp.data["data"]]
+        self.assertEqual(statuses, [True, False, False, False])
+        self.assertIn("aircraft", resp.data["data"][1]["errors"])
+        self.assertIn("arrival", resp.data["data"][2]["errors"])
+        self.assertEqual(Airport.objects.get(uid=arrival.uid).name, "Airport")
+
+        # the queries do not grow with the number of operations
+        flights = [create_flight() for _ in range(10)]
+        few = [op("update", "flight", f, status="departed") for f in flights[:2]]
+        many = [op("update", "flight", f, status="departed") for f in flights[2:]]
+        with CaptureQueriesContext(connection) as few_queries:
+            self.client.post(route, few, format="json")
+        with CaptureQueriesContext(connection) as many_queries:
+            self.client.post(route, many, format="json")
+        self.assertEqual(len(many_queries), len(few_queries))
+        self.assertEqual(Flight.objects.filter(status="departed").count(), 11)
+
+    def test_flight_bulk(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        aircraft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="N")
+        dt = timezone.now() + timezone.timedelta(days=1)
+
+        def create_flight(departure, arrival, status="scheduled", **kwargs):
+            return Flight.objects.create(
+                departure=departure,
+                arrival=arrival,
+                departure_dt=dt,
+                arrival_dt=dt + timezone.timedelta(hours=2),
+                status=status,
+                **kwargs,
+            )
+
+        def rollups():
+            # rebuild() leaves out the emptied rollups
+            rows = DepartureStats.objects.exclude(flight_count=0)
+            return sorted(rows.values_list(*stats.STATUS_FIELDS.values(), "day"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booked = create_flight(departure, arrival, aircraft=aircraft)
+            create_flight(departure, arrival)
+            create_flight(departure, arrival, status="departed")
+            other = create_flight(arrival, departure)
+        route = reverse("flight-bulk")
+        self.client.force_authenticate(self.user)
+        resp = self.client.put(route + "?dept=1ec4", {"status": "cancelled"})
+        self.assertEqual(resp.status_code, 403)
+        self.client.force_authenticate(self.admin)
+        resp = self.client.put(route, {"status": "cancelled"})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.put(route + "?dept=1ec4", {"status": "lost"})
+        self.assertEqual(resp.status_code, 400)
+        detail = reverse("flight-dets", args=[booked.uid])
+        etag = self.client.get(detail)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.put(route + "?dept=1ec4", {"status": "cancelled"})
+        self.assertEqual(resp.data["data"], {"count": 3})
+        cancelled = Flight.objects.filter(status="cancelled")
+        self.assertEqual(cancelled.count(), 3)
+        self.assertEqual(len({flight.updated_at for flight in cancelled}), 1)
+        self.assertEqual(
+            sorted(
+                FlightChange.objects.filter(kind="updated").values_list(
+                    "previous_status", "status"
+                )
+            ),
+            [("departed", "cancelled")] + [("scheduled", "cancelled")] * 2,
+        )
+        self.assertEqual(
+            self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+        expected = rollups()
+        stats.rebuild()
+        self.assertEqual(rollups(), expected)
+        resp = self.client.put(route + "?dept=1ec4", {"status": "cancelled"})
+        self.assertEqual(resp.data["data"], {"count": 0})
+
+        # the aircraft was booked again meanwhile
+        Flight.objects.filter(uid=other.uid).update(aircraft=aircraft)
+        resp = self.client.put(route + "?dept=1ec4", {"status": "scheduled"})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.put(
+            route + "?dept=1ec4&aircraft=as12hd4b", {"status": "cancelled"}
+        )
+        self.assertEqual(resp.data["data"], {"count": 0})
+
+        # row lock, rollups aggregate, rollup update, change log SELECT and
+        # INSERT, DELETE and the savepoint
+        with self.assertNumQueries(8):
+            resp = self.client.delete(route + "?dept=1ec4")
+        self.assertEqual(resp.data["data"], {"count": 3})
+        self.assertEqual(
+            list(Flight.objects.values_list("uid", flat=True)), [other.uid]
+        )
+        self.assertEqual(FlightChange.objects.filter(kind="deleted").count(), 3)
+        expected = rollups()
+        stats.rebuild()
+        self.assertEqual(rollups(), expected)
+
+    def test_flight_export(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        craft = Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        start = timezone.make_aware(datetime(2030, 1, 1, 10, 0))
+        for i in range(3):
+            Flight.objects.create(
+                aircraft=craft if i else None,
+                departure=departure if i < 2 else arrival,
+                arrival=arrival if i < 2 else departure,
+                departure_dt=start + timezone.timedelta(days=i),
+                arrival_dt=start + timezone.timedelta(days=i, hours=2),
+                status="scheduled",
+            )
+        route = reverse("flight-export")
+        resp = self.client.get(route)
+        self.assertEqual(resp.status_code, 401)
+        self.client.force_authenticate(self.user)
+        resp = self.client.get(route + "?dept=1ec4")
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        content = b"".join(resp.streaming_content)
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["departure"] for row in rows], ["1EC4", "1EC4"])
+        self.assertEqual(rows[0]["aircraft"], None)
+        self.assertEqual(rows[1]["aircraft"], "AS12HD4B")
+        self.assertEqual(rows[0]["departure_dt"], start.isoformat())
+        resp = self.client.get(
+            route + "?fmt=csv&start=2030-01-02 00:00&end=2030-01-03 23:00"
+        )
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines[0],
+            "uid,aircraft,departure,arrival,departure_dt,"
+            "arrival_dt,status,created_at,updated_at",
+        )
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[2].split(",")[2:4], ["1EC5", "1EC4"])
+        resp = self.client.get(route + "?fmt=xml")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get(route + "?start=yesterday")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_airport_nearby(self):
+        create_airport("EGLL", "Heathrow", "51.4700", "-0.4543")
+        create_airport("EGKK", "Gatwick", "51.1537", "-0.1821")
+        create_airport("LFPG", "Charles de Gaulle", "49.0097", "2.5479")
+        create_airport("KJFK", "John F Kennedy", "40.6413", "-73.7781")
+        route = reverse("airport-nearby")
+        resp = self.client.get(route + "?lat=51.5&lng=-0.12&k=2")
+        self.assertEqual(resp.status_code, 401)
+        self.client.force_authenticate(self.user)
+        resp = self.client.get(route + "?lat=51.5&lng=-0.12&k=2")
+        data = resp.json()["data"]
+        self.assertEqual([a["icao"] for a in data], ["EGLL", "EGKK"])
+        self.assertAlmostEqual(data[0]["distance_km"], 23.2, delta=0.5)
+        resp = self.client.get(route + "?lat=51.5&lng=-0.12&radius=400")
+        self.assertEqual(
+            [a["icao"] for a in resp.json()["data"]], ["EGLL", "EGKK", "LFPG"]
+        )
+        # writes rebuild the index once they committed
+        with self.captureOnCommitCallbacks(execute=True):
+            create_airport("EGLC", "London City", "51.5048", "0.0495")
+            resp = self.client.get(route + "?lat=51.5&lng=-0.12&k=1")
+            self.assertEqual(resp.json()["data"][0]["icao"], "EGLL")
+        resp = self.client.get(route + "?lat=51.5&lng=-0.12&k=1")
+        self.assertEqual(resp.json()["data"][0]["icao"], "EGLC")
+        with self.captureOnCommitCallbacks(execute=True):
+            Airport.objects.get(icao="EGLC").delete()
+        resp = self.client.get(route + "?lat=51.5&lng=-0.12&k=1")
+        self.assertEqual(resp.json()["data"][0]["icao"], "EGLL")
+        for query in ["lat=91&lng=0", "lat=abc&lng=0", "lng=0", "lat=0&lng=0&k=0"]:
+            resp = self.client.get(route + "?" + query)
+            self.assertEqual(resp.status_code, 400)
+
+    def test_schedules(self):
+        create_airport("EGLL")
+        create_airport("KJFK")
+        Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Nuvola")
+        self.addCleanup(schedules.index.invalidate)
+        schedules.index.invalidate()
+        route = reverse("schedule")
+        today = timezone.localdate()
+        data = {
+            "departure": "egll",
+            "arrival": "KJFK",
+            "aircraft": "as12hd4b",
+            "days": "531",
+            "departure_time": "07:30",
+            "block_time": "08:00:00",
+            "start_date": str(today + timezone.timedelta(days=1)),
+        }
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(route, data).status_code, 403)
+        self.client.force_authenticate(self.admin)
+        for invalid in [
+            {"days": "18"},
+            {"block_time": "00:00:00"},
+            {"departure": "EGL"},
+            {"end_date": str(today)},
+        ]:
+            resp = self.client.post(route, {**data, **invalid})
+            self.assertEqual(resp.status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(route, data)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data["days"], "135")
+        self.assertEqual(resp.data["aircraft"], "AS12HD4B")
+        schedule = Schedule.objects.get(uid=resp.data["uid"])
+        self.assertEqual(
+            resp.data["materialized_until"],
+            ScheduleSerializer(schedule).data["materialized_until"],
+        )
+        # expanded into flights up to the horizon
+        flights = Flight.objects.filter(schedule=schedule)
+        self.assertTrue(flights.exists())
+        self.assertLessEqual(max(f.departure_dt for f in flights), schedules.horizon())
+        self.assertEqual(
+            {f.departure_dt.isoweekday() for f in flights} - {1, 3, 5}, set()
+        )
+        self.client.force_authenticate(self.user)
+        resp = self.client.get(reverse("schedule-dets", args=[schedule.uid]))
+        self.assertEqual(resp.json()["data"]["departure"], "EGLL")
+
+        # past the horizon, the occurrences are generated by the searches
+        first = today + timezone.timedelta(days=28)
+        interval = f"{first} 00:00;{first + timezone.timedelta(days=7)} 00:00"
+        url = reverse("departure-flights", args=[schedule.departure_id])
+        schedules.index.get()  # loaded on the first search after a write
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {"interval": interval}).json()["data"]
+        self.assertEqual(len(data), 3)
+        self.assertEqual({item["uid"] for item in data}, {None})
+        self.assertEqual({item["pending"] for item in data}, {True})
+        self.assertEqual(data[0]["aircraft"]["serial_number"], "AS12HD4B")
+        self.assertEqual(data[0]["inflight_time"], 480)
+        resp = self.client.get(reverse("departure-search"), {"interval": interval})
+        self.assertEqual(resp.json()["data"][0]["flight_count"], 3)
+        self.assertEqual(resp.json()["data"][0]["inflight_avg"], 480)
+        # materialized occurrences are not generated again
+        first = today + timezone.timedelta(days=1)
+        interval = f"{first} 00:00;{first + timezone.timedelta(days=7)} 00:00"
+        data = self.client.get(url, {"interval": interval}).json()["data"]
+        self.assertEqual(len(data), 3)
+        self.assertNotIn(None, {item["uid"] for item in data})
+        self.assertEqual({item["pending"] for item in data}, {False})
+
+    def test_autocomplete(self):
+        create_airport("EGLL", "London Heathrow")
+        create_airport("EGKK", "London Gatwick")
+        create_airport("EGL", "Egl Field")
+        Aircraft.objects.create(serial_number="AS12HD4B", manufacturer="Airbus")
+        autocomplete.airports.invalidate()
+        autocomplete.aircraft.invalidate()
+        route = reverse("airport-autocomplete")
+        resp = self.client.get(route + "?q=egl")
+        self.assertEqual(resp.status_code, 401)
+        self.client.force_authenticate(self.user)
+        resp = self.client.get(route + "?q=egl")
+        data = resp.json()["data"]
+        self.assertEqual([a["icao"] for a in data], ["EGL", "EGLL", "EGKK"])
+        self.assertEqual([a["match"] for a in data], ["exact", "prefix", "fuzzy"])
+        self.assertEqual(
+            set(data[0]), {"uid", "icao", "name", "city", "country", "match"}
+        )
+        resp = self.client.get(route + "?q=london%20gat")
+        self.assertEqual([a["icao"] for a in resp.json()["data"]], ["EGKK"])
+        resp = self.client.get(route + "?q=lodnon&limit=1")
+        self.assertEqual(resp.json()["data"][0]["match"], "fuzzy")
+        self.assertEqual(len(resp.json()["data"]), 1)
+        resp = self.client.get(reverse("aircraft-autocomplete") + "?q=airb")
+        self.assertEqual(resp.json()["data"][0]["serial_number"], "AS12HD4B")
+        for query in ["", "?q=%20", "?q=egl&limit=0", "?q=egl&limit=a"]:
+            resp = self.client.get(route + query)
+            self.assertEqual(resp.status_code, 400)
+
+    def test_flight_routes(self):
+        routes.graph.invalidate()
+        ams = create_airport("EHAM")
+        lhr = create_airport("EGLL")
+        jfk = create_airport("KJFK")
+        start = timezone.make_aware(datetime(2030, 1, 1, 8, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Flight.objects.create(
+                departure=ams,
+                arrival=lhr,
+                departure_dt=start,
+                arrival_dt=start + timezone.timedelta(hours=1),
+                status="scheduled",
+            )
+            second = Flight.objects.create(
+                departure=lhr,
+                arrival=jfk,
+                departure_dt=start + timezone.timedelta(hours=2),
+                arrival_dt=start + timezone.timedelta(hours=10),
+                status="scheduled",
+            )
+        route = reverse("flight-routes")
+        query = "?dept=eham&arr=kjfk&start=2030-01-01 00:00&end=2030-01-02 00:00"
+        resp = self.client.get(route + query)
+        self.assertEqual(resp.status_code, 401)
+        self.client.force_authenticate(self.user)
+        resp = self.client.get(route + query)
+        data = resp.json()["data"]
+        self.assertEqual(len(data), 1)
+        self.assertEqual(
+            [leg["uid"] for leg in data[0]["legs"]], [str(first.uid), str(second.uid)]
+        )
+        self.assertEqual(data[0]["arrival_dt"], data[0]["legs"][1]["arrival_dt"])
+        resp = self.client.get(route + query + "&min_connection=90")
+        self.assertEqual(resp.json()["data"], [])
+        resp = self.client.get(route + query + "&max_legs=1")
+        self.assertEqual(resp.json()["data"], [])
+        # saves and deletes update the graph
+        with self.captureOnCommitCallbacks(execute=True):
+            second.status = "cancelled"
+            second.save()
+        self.assertEqual(self.client.get(route + query).json()["data"], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            direct = Flight.objects.create(
+                departure=ams,
+                arrival=jfk,
+                departure_dt=start,
+                arrival_dt=start + timezone.timedelta(hours=9),
+                status="scheduled",
+            )
+        data = self.client.get(route + query).json()["data"]
+        self.assertEqual([leg["uid"] for leg in data[0]["legs"]], [str(direct.uid)])
+        with self.captureOnCommitCallbacks(execute=True):
+            direct.delete()
+        self.assertEqual(self.client.get(route + query).json()["data"], [])
+        resp = self.client.get(route + "?dept=eham&arr=kjfk&start=tomorrow")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get(route + query.replace("kjfk", "zzzz"))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_flight_routes_pending(self):
+        self.addCleanup(schedules.index.invalidate)
+        routes.graph.invalidate()
+        ams = create_airport("EHAM")
+        lhr = create_airport("EGLL")
+        jfk = create_airport("KJFK")
+        day = timezone.localdate() + timezone.timedelta(days=2)
+        start = timezone.make_aware(datetime.combine(day, time(8, 0)))
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Flight.objects.create(
+                departure=ams,
+                arrival=lhr,
+                departure_dt=start,
+                arrival_dt=start + timezone.timedelta(hours=1),
+            )
+            Schedule.objects.create(
+                departure=lhr,
+                arrival=jfk,
+                departure_time=time(10, 0),
+                block_time=timezone.timedelta(hours=8),
+                start_date=day,
+            )
+        route = reverse("flight-routes")
+        query = (
+            f"?dept=eham&arr=kjfk&start={day} 00:00"
+            f"&end={day + timezone.timedelta(days=1)} 00:00"
+        )
+        self.client.force_authenticate(self.user)
+        # the second leg is an occurrence of the schedule, not a flight yet
+        [journey] = self.client.get(route + query).json()["data"]
+        self.assertEqual(
+            [leg["uid"] for leg in journey["legs"]], [str(first.uid), None]
+        )
+        pending = start + timezone.timedelta(hours=10)
+        self.assertEqual(parse_datetime(journey["arrival_dt"]), pending)
+        # searched on a copy, the shared timetable only has the flight
+        self.assertEqual([c[1] for c in routes.graph.get()], [first.uid])
+
+    def test_conditional_get(self):
+        departure = create_airport("1EC4")
+        arrival = create_airport("1EC5")
+        start = timezone.now() + timezone.timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            flight = Flight.objects.create(
+                departure=departure,
+                arrival=arrival,
+                departure_dt=start,
+                arrival_dt=start + timezone.timedelta(hours=2),
+            )
+        self.client.force_authenticate(self.user)
+        route = reverse("flight-dets", args=[flight.uid])
+        resp = self.client.get(route)
+        etag = resp["ETag"]
+        self.assertTrue(resp.has_header("Last-Modified"))
+        with self.assertNumQueries(0):
+            resp = self.client.get(route, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b"")
+        resp = self.client.get(route, HTTP_IF_MODIFIED_SINCE=resp["Last-Modified"])
+        self.assertEqual(resp.status_code, 304)
+        # the list has its own validators
+        resp = self.client.get(reverse("flight"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        # writes to the flight and to the rows it embeds change the ETag
+        with self.captureOnCommitCallbacks(execute=True):
+            flight.status = "departed"
+            flight.save()
+        resp = self.client.get(route, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["data"]["status"], "departed")
+        etag = resp["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            departure.name = "Renamed"
+            departure.save()
+        resp = self.client.get(route, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        # other flights do not
+        etag = resp["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Flight.objects.create(
+                departure=arrival,
+                arrival=departure,
+                departure_dt=start,
+                arrival_dt=start + timezone.timedelta(hours=2),
+            )
+        resp = self.client.get(route, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get(self.airport)
+        resp = self.client.get(self.airport, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp.status_code, 304)
+        # the departure searches change with the day, as their search limit
+        interval = f"{start:%Y-%m-%d} 00:00;{start:%Y-%m-%d} 23:59"
+        route = reverse("departure-search") + f"?interval={interval}"
+        resp = self.client.get(route)
+        etag, last_modified = resp["ETag"], resp["Last-Modified"]
+        resp = self.client.get(route, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        tomorrow = timezone.now() + timezone.timedelta(days=1)
+        with mock.patch.object(timezone, "now", return_value=tomorrow):
+            resp = self.client.get(route, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 200)
+            resp = self.client.get(route, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(resp.status_code, 200)
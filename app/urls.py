@@ -1,25 +1,78 @@
 from .views import (
     AirCraftView,
     AirPortView,
+    aircraft_autocomplete,
+    airport_autocomplete,
+    airport_nearby,
+    batch,
     FlightView,
+    ScheduleView,
+    flight_bulk,
     departure_flights,
     departure_search,
+    flight_changes,
+    flight_changes_stream,
+    flight_export,
+    flight_import,
+    flight_routes,
     flight_search,
+    metrics,
 )
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt import views as jwt_views
 
+aircraft_view = AirCraftView.as_view()
+airport_view = AirPortView.as_view()
+flight_view = FlightView.as_view()
+schedule_view = ScheduleView.as_view()
+flight_search_view = flight_search
+departure_search_view = departure_search
+departure_flights_view = departure_flights
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    aircraft_view = async_views.reads(async_views.aircraft, aircraft_view)
+    airport_view = async_views.reads(async_views.airport, airport_view)
+    flight_view = async_views.reads(async_views.flight, flight_view)
+    flight_search_view = async_views.flight_search
+    departure_search_view = async_views.departure_search
+    departure_flights_view = async_views.departure_flights
 
 urlpatterns = [
     path("login/", jwt_views.TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("refresh_token/", jwt_views.TokenRefreshView.as_view(), name="token_refresh"),
-    path("aircraft/", AirCraftView.as_view(), name="aircraft"),
-    path("aircraft/<str:uid>/", AirCraftView.as_view(), name="aircraft-dets"),
-    path("airport/", AirPortView.as_view(), name="airport"),
-    path("airport/<str:uid>/", AirPortView.as_view(), name="airport-dets"),
-    path("flight/", FlightView.as_view(), name="flight"),
-    path("flight/search/", flight_search, name="flight-search"),
-    path("flight/<str:uid>/", FlightView.as_view(), name="flight-dets"),
-    path("departures/search/", departure_search, name="departure-search"),
-    path("departures/flights/<str:uid>/", departure_flights, name="departure-flights"),
+    path("batch/", batch, name="batch"),
+    path("aircraft/", aircraft_view, name="aircraft"),
+    path("aircraft/autocomplete/", aircraft_autocomplete, name="aircraft-autocomplete"),
+    path("aircraft/<str:uid>/", aircraft_view, name="aircraft-dets"),
+    path("airport/", airport_view, name="airport"),
+    path("airport/nearby/", airport_nearby, name="airport-nearby"),
+    path("airport/autocomplete/", airport_autocomplete, name="airport-autocomplete"),
+    path("airport/<str:uid>/", airport_view, name="airport-dets"),
+    path("flight/", flight_view, name="flight"),
+    path("flight/search/", flight_search_view, name="flight-search"),
+    path("flight/routes/", flight_routes, name="flight-routes"),
+    path("flight/changes/", flight_changes, name="flight-changes"),
+    path(
+        "flight/changes/stream/",
+        flight_changes_stream,
+        name="flight-changes-stream",
+    ),
+    path("flight/bulk/", flight_bulk, name="flight-bulk"),
+    path("flight/import/", flight_import, name="flight-import"),
+    path("flight/export/", flight_export, name="flight-export"),
+    path("flight/<str:uid>/", flight_view, name="flight-dets"),
+    path("schedule/", schedule_view, name="schedule"),
+    path("schedule/<str:uid>/", schedule_view, name="schedule-dets"),
+    path("departures/search/", departure_search_view, name="departure-search"),
+    path(
+        "departures/flights/<str:uid>/",
+        departure_flights_view,
+        name="departure-flights",
+    ),
 ]
+
+if settings.METRICS:
+    urlpatterns.append(path("metrics/", metrics, name="metrics"))
@@ -1,5 +1,5 @@
 from datetime import datetime
-from django.utils.timezone import make_aware
+from django.utils.timezone import is_aware, localtime, make_aware
 
 
 def format_datetime_str(val: str):
@@ -7,3 +7,58 @@ def format_datetime_str(val: str):
     date_time = datetime.strptime(val, form)
     date_time = make_aware(date_time)
     return date_time
+
+
+def parse_interval(val: str):
+    """Parse a `YYYY-MM-DD HH:MM;YYYY-MM-DD HH:MM` interval into datetimes."""
+    interval = val.split(";")
+    return format_datetime_str(interval[0]), format_datetime_str(interval[1])
+
+
+def minute_of_day(val: datetime, tz=None):
+    if is_aware(val):
+        val = localtime(val, tz)
+    return val.hour * 60 + val.minute
+
+
+def parse_time_range(val: str):
+    """
+    Parse a `HH:MM;HH:MM` range into minutes of the day. The end may be
+    before the start for ranges wrapping around midnight e.g `22:00;02:00`.
+    """
+    start, end = val.split(";")
+    minutes = []
+    for part in (start, end):
+        hour, minute = part.split(":")
+        hour, minute = int(hour), int(minute)
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError("Invalid time")
+        minutes.append(hour * 60 + minute)
+    return minutes[0], minutes[1]
+
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode_geohash(lat: float, lng: float, precision: int = 9):
+    """
+    Encode a point as a geohash. Points sharing a prefix lie in the same grid
+    cell, 9 characters is a cell of about 5m by 5m.
+    """
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, char, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, rng = (lng, lng_range) if even else (lat, lat_range)
+        mid = (rng[0] + rng[1]) / 2
+        char <<= 1
+        if value >= mid:
+            char |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[char])
+            bits, char = 0, 0
+    return "".join(chars)
@@ -1,14 +1,17 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Aircraft, Airport
+from .scheduling import CONFLICT_MESSAGE, overlapping_flights
 
 
-def icao_validator(icao: str):
-    airport = Airport.objects.filter(icao__iexact=icao)
-    if not airport:
-        raise serializers.ValidationError("Airport With ICAO does not exist.")
+def flight_times_validator(departure_dt, arrival_dt):
+    if arrival_dt < departure_dt or departure_dt < timezone.now():
+        raise serializers.ValidationError(
+            detail="Invalid arrival and depature datetimes"
+        )
 
 
-def aircraft_validator(ser_no: str):
-    aircraft = Aircraft.objects.filter(serial_number__iexact=ser_no)
-    if not aircraft:
-        raise serializers.ValidationError("Aircraft with serial number does not exist.")
+def aircraft_schedule_validator(aircraft_id, departure_dt, arrival_dt, exclude=None):
+    conflict = overlapping_flights(aircraft_id, departure_dt, arrival_dt, exclude)
+    conflict = conflict.values_list("departure_dt", "arrival_dt")[:1]
+    if conflict:
+        raise serializers.ValidationError(detail=CONFLICT_MESSAGE.format(*conflict[0]))
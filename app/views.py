@@ -1,10 +1,17 @@
+import csv
+import uuid
 from rest_framework import generics
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from datetime import timedelta
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
 from django.db.models import Q
-import datetime
 from .serializers import (
     AirCraftSerializer,
     AirportSerializer,
@@ -12,10 +19,32 @@ from .serializers import (
     FlightListSerializer,
     CreateFlightSerializer,
     DepartureSearchSerializer,
+    FlightChangeSerializer,
+    ScheduleSerializer,
 )
 from .permissions import IsUser, IsAdmin
-from .models import Aircraft, Airport, Flight
-from .utils import format_datetime_str
+from . import autocomplete, bulk, cache, fastpath, feed, geo, routes, schedules, stats
+from .batch import Batch
+from .conditional import Conditional
+from .exporter import EXPORT_FORMATS, export_rows
+from .fieldsets import Fieldset, InvalidFieldset
+from .importer import STATUSES, FlightImporter, read_csv, read_ndjson
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry
+from .models import Aircraft, Airport, Flight, Schedule
+from .pagination import FlightPagination, InvalidCursor, KeysetPagination
+from .scheduling import is_booking_conflict, reinstating_conflicts
+from .utils import format_datetime_str, parse_interval, parse_time_range
+
+aircraft_resource = Conditional(Aircraft)
+airport_resource = Conditional(Airport)
+flight_resource = Conditional(Flight, Airport, Aircraft, per_row=True)
+flights_resource = Conditional(Flight, Airport, Aircraft)
+schedule_resource = Conditional(Schedule, Airport, Aircraft)
+# the departure and route searches also cover the occurrences of schedules,
+# up to a search limit moving every day
+departures_resource = Conditional(
+    Flight, Airport, Aircraft, Schedule, moved=schedules.search_moved
+)
 
 
 class AirCraftView(generics.ListCreateAPIView):
@@ -25,6 +54,7 @@ class AirCraftView(generics.ListCreateAPIView):
     """
 
     serializer_class = AirCraftSerializer
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         method = self.request.method
@@ -34,19 +64,29 @@ class AirCraftView(generics.ListCreateAPIView):
             perms = [IsAdmin]
         return [permission() for permission in perms]
 
+    @method_decorator(aircraft_resource)
     def get(self, request, uid: str = None):
         try:
+            fieldset = Fieldset.from_params(request.GET, AirCraftSerializer)
+            queryset = fieldset.queryset(
+                Aircraft.objects.all(), AirCraftSerializer, *KeysetPagination.ordering
+            )
             if uid:
-                obj = Aircraft.objects.get(uid=uid)
-                ser = AirCraftSerializer(obj)
+                obj = queryset.get(uid=uid)
+                ser = fieldset.serializer(AirCraftSerializer, obj)
             else:
-                queryset = Aircraft.objects.all()
-                ser = AirCraftSerializer(queryset, many=True)
+                page = self.paginate_queryset(queryset)
+                ser = fieldset.serializer(AirCraftSerializer, page, many=True)
+                return self.get_paginated_response(ser.data)
         except (Aircraft.DoesNotExist, ValidationError):
             return Response(
                 {"status": False, "message": "Aircraft Not Found."},
                 status.HTTP_404_NOT_FOUND,
             )
+        except (InvalidCursor, InvalidFieldset) as e:
+            return Response(
+                {"status": False, "message": str(e)}, status.HTTP_400_BAD_REQUEST
+            )
         return Response({"status": True, "data": ser.data})
 
     def put(self, request, uid: str):
@@ -83,6 +123,7 @@ class AirPortView(generics.ListCreateAPIView):
     """API FOR AIRPORT CRUD"""
 
     serializer_class = AirportSerializer
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         method = self.request.method
@@ -92,19 +133,31 @@ class AirPortView(generics.ListCreateAPIView):
             perms = [IsAdmin]
         return [permission() for permission in perms]
 
+    @method_decorator(airport_resource)
     def get(self, request, uid: str = None):
         try:
+            fieldset = Fieldset.from_params(request.GET, AirportSerializer)
+            queryset = fieldset.queryset(
+                Airport.objects.select_related("location"),
+                AirportSerializer,
+                *KeysetPagination.ordering,
+            )
             if uid:
-                obj = Airport.objects.get(uid=uid)
-                ser = AirportSerializer(obj)
+                obj = queryset.get(uid=uid)
+                ser = fieldset.serializer(AirportSerializer, obj)
             else:
-                queryset = Airport.objects.all()
-                ser = AirportSerializer(queryset, many=True)
+                page = self.paginate_queryset(queryset)
+                ser = fieldset.serializer(AirportSerializer, page, many=True)
+                return self.get_paginated_response(ser.data)
         except (Airport.DoesNotExist, ValidationError):
             return Response(
                 {"status": False, "message": "Aircraft Not Found."},
                 status.HTTP_404_NOT_FOUND,
             )
+        except (InvalidCursor, InvalidFieldset) as e:
+            return Response(
+                {"status": False, "message": str(e)}, status.HTTP_400_BAD_REQUEST
+            )
         return Response({"status": True, "data": ser.data})
 
     def put(self, request, uid: str):
@@ -136,11 +189,21 @@ class AirPortView(generics.ListCreateAPIView):
         return Response({"status": True, "message": "Deleted"})
 
 
+def conflicting_booking():
+    # the exclusion constraint caught a booking made by a concurrent request
+    # after the serializer checked the aircraft's schedule
+    return Response(
+        {"status": False, "message": "Conflicting booking."},
+        status.HTTP_400_BAD_REQUEST,
+    )
+
+
 class FlightView(generics.ListCreateAPIView):
 
     """API FOR FLIGHT CRUD"""
 
     serializer_class = CreateFlightSerializer
+    pagination_class = FlightPagination
 
     def get_permissions(self):
         method = self.request.method
@@ -150,19 +213,47 @@ class FlightView(generics.ListCreateAPIView):
             perms = [IsAdmin]
         return [permission() for permission in perms]
 
+    def create(self, request, *args, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().create(request, *args, **kwargs)
+        except IntegrityError as e:
+            if not is_booking_conflict(e):
+                raise
+            return conflicting_booking()
+
+    @method_decorator(flight_resource)
     def get(self, request, uid: str = None):
         try:
+            fieldset = Fieldset.from_params(request.GET, FlightListSerializer)
+            if not uid and settings.FAST_READ_PATH:
+                serializer = fastpath.flight_list.narrow(fieldset)
+                flights = serializer.values(
+                    Flight.objects.all(), *FlightPagination.ordering
+                )
+                page = self.paginate_queryset(flights)
+                return self.get_paginated_response(serializer.many(page))
+            queryset = fieldset.queryset(
+                Flight.objects.with_related(),
+                FlightListSerializer,
+                *FlightPagination.ordering,
+            )
             if uid:
-                obj = Flight.objects.get(uid=uid)
-                ser = FlightListSerializer(obj)
+                obj = queryset.get(uid=uid)
+                ser = fieldset.serializer(FlightListSerializer, obj)
             else:
-                queryset = Flight.objects.all()
-                ser = FlightListSerializer(queryset, many=True)
+                page = self.paginate_queryset(queryset)
+                ser = fieldset.serializer(FlightListSerializer, page, many=True)
+                return self.get_paginated_response(ser.data)
         except (Flight.DoesNotExist, ValidationError):
             return Response(
                 {"status": False, "message": "Aircraft Not Found."},
                 status.HTTP_404_NOT_FOUND,
             )
+        except (InvalidCursor, InvalidFieldset) as e:
+            return Response(
+                {"status": False, "message": str(e)}, status.HTTP_400_BAD_REQUEST
+            )
         return Response({"status": True, "data": ser.data})
 
     def put(self, request, uid: str):
@@ -180,7 +271,13 @@ class FlightView(generics.ListCreateAPIView):
                 {"status": False, "message": "serializer error", "data": ser.errors},
                 status.HTTP_400_BAD_REQUEST,
             )
-        ser.save()
+        try:
+            with transaction.atomic():
+                ser.save()
+        except IntegrityError as e:
+            if not is_booking_conflict(e):
+                raise
+            return conflicting_booking()
         return Response({"status": True, "message": "updated"})
 
     def delete(self, request, uid: str):
@@ -194,71 +291,300 @@ class FlightView(generics.ListCreateAPIView):
         return Response({"status": True, "message": "Deleted"})
 
 
-@api_view(["GET"])
-def flight_search(request):
-    dept = request.GET.get("dept")  # search by departure icao
-    arr = request.GET.get("arr")  # search by arrival icao
-    dept_rng = request.GET.get("dept_rng")  # search by depature datetime range
-    flights = None
-    try:
-        if dept:
-            flights = Flight.objects.filter(departure__icao__iexact=dept)
-        elif arr:
-            flights = Flight.objects.filter(arrival__icao__iexact=arr)
-        elif dept_rng:
-            times = dept_rng.split(";")
-            start = times[0]
-            end = times[1]
-            start_time = datetime.time(
-                int(start.split(":")[0]), int(start.split(":")[1])
+class ScheduleView(generics.ListCreateAPIView):
+
+    """API FOR RECURRING SCHEDULE CRUD"""
+
+    serializer_class = ScheduleSerializer
+    pagination_class = KeysetPagination
+
+    def get_permissions(self):
+        method = self.request.method
+        if method == "GET":
+            perms = [IsUser | IsAdmin]
+        else:
+            perms = [IsAdmin]
+        return [permission() for permission in perms]
+
+    @method_decorator(schedule_resource)
+    def get(self, request, uid: str = None):
+        queryset = Schedule.objects.select_related("aircraft", "departure", "arrival")
+        try:
+            if uid:
+                ser = ScheduleSerializer(queryset.get(uid=uid))
+            else:
+                page = self.paginate_queryset(queryset)
+                ser = ScheduleSerializer(page, many=True)
+                return self.get_paginated_response(ser.data)
+        except (Schedule.DoesNotExist, ValidationError):
+            return Response(
+                {"status": False, "message": "Schedule Not Found."},
+                status.HTTP_404_NOT_FOUND,
+            )
+        except InvalidCursor as e:
+            return Response(
+                {"status": False, "message": str(e)}, status.HTTP_400_BAD_REQUEST
             )
-            end_time = datetime.time(int(end.split(":")[0]), int(end.split(":")[1]))
-            flights = Flight.objects.filter(
-                departure_dt__time__gte=start_time, departure_dt__time__lte=end_time
+        return Response({"status": True, "data": ser.data})
+
+    def perform_create(self, serializer):
+        # the first flights are created right away, later ones by
+        # `materialize_schedules`
+        schedule = serializer.save()
+        schedules.materialize(schedule, schedules.horizon())
+        schedule.refresh_from_db(fields=["materialized_until"])
+
+    def put(self, request, uid: str):
+        # flights the schedule was already expanded into are left as they are
+        try:
+            obj = Schedule.objects.get(uid=uid)
+        except (Schedule.DoesNotExist, ValidationError):
+            return Response(
+                {"status": False, "message": "Not Found"}, status.HTTP_404_NOT_FOUND
             )
-        else:
+        ser = ScheduleSerializer(
+            data=request.data, instance=obj, partial=True, context={"request": request}
+        )
+        if not ser.is_valid():
+            return Response(
+                {"status": False, "message": "serializer error", "data": ser.errors},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        ser.save()
+        return Response({"status": True, "message": "updated"})
+
+    def delete(self, request, uid: str):
+        try:
+            Schedule.objects.filter(uid=uid).delete()
+        except ValidationError:
             return Response(
-                {"status": False, "message": "No seach Parameters Entered"},
+                {"status": False, "message": "Invalid UUID"},
                 status.HTTP_400_BAD_REQUEST,
             )
-    except (TypeError, IndexError):
+        return Response({"status": True, "message": "Deleted"})
+
+
+@api_view(["GET"])
+@permission_classes([IsUser | IsAdmin])
+@airport_resource
+def airport_nearby(request):
+    try:
+        lat = float(request.GET["lat"])
+        lng = float(request.GET["lng"])
+        radius = request.GET.get("radius")  # km
+        radius = float(radius) if radius else None
+        k = int(request.GET.get("k") or settings.NEARBY_MAX_RESULTS)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError
+        if (radius is not None and not radius > 0) or k < 1:
+            raise ValueError
+    except (KeyError, ValueError):
+        return Response(
+            {"status": False, "message": "Invalid coordinates"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    nearest = geo.airports.nearest(
+        lat, lng, min(k, settings.NEARBY_MAX_RESULTS), radius
+    )
+    airports = Airport.objects.select_related("location").in_bulk(
+        [uid for uid, _ in nearest]
+    )
+    data = []
+    for uid, distance in nearest:
+        if uid in airports:
+            item = AirportSerializer(airports[uid]).data
+            item["distance_km"] = round(distance, 3)
+            data.append(item)
+    return Response({"status": True, "data": data})
+
+
+def autocomplete_response(request, index):
+    query = request.GET.get("q", "")
+    try:
+        limit = int(request.GET.get("limit") or settings.AUTOCOMPLETE_MAX_RESULTS)
+        if not query.strip() or len(query) > 100 or limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {"status": False, "message": "Invalid query"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    data = index.search(query, min(limit, settings.AUTOCOMPLETE_MAX_RESULTS))
+    return Response({"status": True, "data": data})
+
+
+@api_view(["GET"])
+@permission_classes([IsUser | IsAdmin])
+@airport_resource
+def airport_autocomplete(request):
+    return autocomplete_response(request, autocomplete.airports)
+
+
+@api_view(["GET"])
+@permission_classes([IsUser | IsAdmin])
+@aircraft_resource
+def aircraft_autocomplete(request):
+    return autocomplete_response(request, autocomplete.aircraft)
+
+
+def flight_search_filter(params):
+    """
+    Filter of the flight search: by departure ICAO, arrival ICAO or departure
+    time range, in that order. None without any of them.
+    """
+    dept = params.get("dept")  # search by departure icao
+    arr = params.get("arr")  # search by arrival icao
+    dept_rng = params.get("dept_rng")  # search by depature datetime range
+    if dept:
+        return Q(departure__icao__iexact=dept)
+    if arr:
+        return Q(arrival__icao__iexact=arr)
+    if dept_rng:
+        start, end = parse_time_range(dept_rng)
+        if start <= end:
+            return Q(departure_minute__gte=start) & Q(departure_minute__lte=end)
+        # the range wraps around midnight
+        return Q(departure_minute__gte=start) | Q(departure_minute__lte=end)
+    return None
+
+
+@api_view(["GET"])
+@flights_resource
+def flight_search(request):
+    try:
+        query = flight_search_filter(request.GET)
+        fieldset = Fieldset.from_params(request.GET, FlightListSerializer)
+    except InvalidFieldset as e:
+        return Response(
+            {"status": False, "message": str(e)}, status.HTTP_400_BAD_REQUEST
+        )
+    except (TypeError, ValueError):
         return Response(
             {"status": False, "message": "Invalid time range"},
             status.HTTP_400_BAD_REQUEST,
         )
-    ser = FlightListSerializer(flights, many=True)
+    if query is None:
+        return Response(
+            {"status": False, "message": "No seach Parameters Entered"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    flights = Flight.objects.with_related().filter(query)
+    if settings.FAST_READ_PATH:
+        data = fastpath.flight_list.narrow(fieldset).data(flights)
+        return Response({"status": True, "data": data})
+    flights = fieldset.queryset(flights, FlightListSerializer)
+    ser = fieldset.serializer(FlightListSerializer, flights, many=True)
     return Response({"status": True, "data": ser.data})
 
 
 @api_view(["GET"])
+@permission_classes([IsUser | IsAdmin])
+@departures_resource
+def flight_routes(request):
+    """
+    Itineraries of up to `max_legs` flights from `dept` to `arr` departing
+    after `start` and arriving by `end`, with at least `min_connection`
+    minutes between legs. Each itinerary is the earliest arriving one that
+    leaves later than the previous itinerary. Legs can be schedule
+    occurrences that are not flights yet, without a uid.
+    """
+    try:
+        start = format_datetime_str(request.GET["start"])
+        end = format_datetime_str(request.GET["end"])
+        min_connection = timedelta(
+            minutes=int(
+                request.GET.get("min_connection", settings.ROUTE_MIN_CONNECTION)
+            )
+        )
+        max_legs = int(request.GET.get("max_legs", settings.ROUTE_MAX_LEGS))
+        limit = int(request.GET.get("limit", settings.ROUTE_MAX_RESULTS))
+        if min_connection < timedelta(0) or max_legs < 1 or limit < 1:
+            raise ValueError
+    except (KeyError, ValueError):
+        return Response(
+            {"status": False, "message": "Invalid search parameters"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    departure = cache.airports.get(request.GET.get("dept", ""))
+    arrival = cache.airports.get(request.GET.get("arr", ""))
+    if departure is None or arrival is None:
+        return Response(
+            {"status": False, "message": "Airport Not Found."},
+            status.HTTP_404_NOT_FOUND,
+        )
+    journeys = routes.graph.search(
+        departure.uid,
+        arrival.uid,
+        start,
+        end,
+        min_connection,
+        min(max_legs, settings.ROUTE_MAX_LEGS),
+        min(limit, settings.ROUTE_MAX_RESULTS),
+        schedules.pending(schedules.index.active(start, end), start, end),
+    )
+    flights = Flight.objects.with_related().filter(
+        uid__in={
+            leg
+            for journey in journeys
+            for leg in journey
+            if not isinstance(leg, Flight)
+        }
+    )
+    if settings.FAST_READ_PATH:
+        legs = {item["uid"]: item for item in fastpath.flight_list.data(flights)}
+    else:
+        legs = {
+            item["uid"]: item for item in FlightListSerializer(flights, many=True).data
+        }
+    data = []
+    for journey in journeys:
+        flights = [
+            FlightListSerializer(leg).data
+            if isinstance(leg, Flight)
+            else legs[str(leg)]
+            for leg in journey
+        ]
+        data.append(
+            {
+                "departure_dt": flights[0]["departure_dt"],
+                "arrival_dt": flights[-1]["arrival_dt"],
+                "legs": flights,
+            }
+        )
+    return Response({"status": True, "data": data})
+
+
+@api_view(["GET"])
+@departures_resource
 def departure_search(request):
     try:
-        interval = request.GET.get("interval").split(";")
-        dept_str = interval[0]
-        arr_str = interval[1]
-        dept_dt = format_datetime_str(dept_str)
-        arr_dt = format_datetime_str(arr_str)
+        dept_dt, arr_dt = parse_interval(request.GET.get("interval"))
     except (ValueError, IndexError, AttributeError):
         return Response(
             {"status": False, "message": "Invalid interval"},
             status.HTTP_400_BAD_REQUEST,
         )
-    query = Q(departure_dt__gte=dept_dt) & Q(departure_dt__lte=arr_dt)
-    departures = (
-        Flight.objects.select_related("departure").filter(query).distinct("departure")
-    )
+    departures = stats.departure_totals(dept_dt, arr_dt)
+    departures = schedules.departure_totals(departures, dept_dt, arr_dt)
     ser = DepartureSearchSerializer(departures, many=True)
     return Response({"status": True, "data": ser.data})
 
 
+def pending_departures(uid: str, dept_dt, arr_dt):
+    """
+    Unsaved flights of the schedule occurrences departing from `uid` in the
+    interval that are not flights yet.
+    """
+    active = schedules.index.active(dept_dt, arr_dt, uuid.UUID(uid))
+    pending = schedules.pending(active, dept_dt, arr_dt)
+    return [flight for flight in pending if flight.arrival_dt <= arr_dt]
+
+
 @api_view(["GET"])
+@departures_resource
 def departure_flights(request, uid: str):
     try:
-        interval = request.GET.get("interval").split(";")
-        dept_str = interval[0]
-        arr_str = interval[1]
-        dept_dt = format_datetime_str(dept_str)
-        arr_dt = format_datetime_str(arr_str)
+        dept_dt, arr_dt = parse_interval(request.GET.get("interval"))
     except (ValueError, IndexError, AttributeError):
         return Response(
             {"status": False, "message": "Invalid interval"},
@@ -268,5 +594,254 @@ def departure_flights(request, uid: str):
         Q(departure_dt__gte=dept_dt) & Q(arrival_dt__lte=arr_dt) & Q(departure__uid=uid)
     )
     flights = Flight.objects.select_related("aircraft").filter(query)
-    ser = DepartureFlightSerializer(flights, many=True)
-    return Response({"status": True, "data": ser.data})
+    try:
+        pending = pending_departures(uid, dept_dt, arr_dt)
+    except ValueError:
+        pending = []
+    if settings.FAST_READ_PATH:
+        data = fastpath.departure_flight.data(flights)
+    else:
+        data = DepartureFlightSerializer(flights, many=True).data
+    data += DepartureFlightSerializer(pending, many=True).data
+    return Response({"status": True, "data": data})
+
+
+@api_view(["POST"])
+@permission_classes([IsAdmin])
+def flight_import(request):
+    """
+    Bulk import flights from a JSON array, a CSV or NDJSON request body
+    (`text/csv`, `application/x-ndjson`) or a `file` upload of either.
+    """
+    try:
+        batch_size = request.GET.get("batch_size")
+        batch_size = int(batch_size) if batch_size else None
+        if batch_size is not None and batch_size < 1:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {"status": False, "message": "Invalid batch size"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    content_type = request.content_type.split(";")[0].strip()
+    if content_type == "text/csv":
+        rows = read_csv(request.stream or [])
+    elif content_type == "application/x-ndjson":
+        rows = read_ndjson(request.stream or [])
+    elif "file" in request.FILES:
+        upload = request.FILES["file"]
+        reader = read_csv if upload.name.lower().endswith(".csv") else read_ndjson
+        rows = reader(upload)
+    else:
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response(
+                {"status": False, "message": "Expected a list of flights"},
+                status.HTTP_400_BAD_REQUEST,
+            )
+    try:
+        result = FlightImporter(batch_size).run(rows)
+    except (UnicodeDecodeError, csv.Error):
+        return Response(
+            {"status": False, "message": "Invalid file"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(
+        {
+            "status": not result["errors"],
+            "message": f"{result['created']} flights imported",
+            "data": result,
+        }
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAdmin])
+def batch(request):
+    """
+    Apply a list of create / update / delete operations on aircraft,
+    airports and flights in one transaction, all or none of them.
+    """
+    operations = request.data
+    if not isinstance(operations, list) or not operations:
+        return Response(
+            {"status": False, "message": "Expected a list of operations"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    if len(operations) > settings.BATCH_MAX_OPERATIONS:
+        return Response(
+            {
+                "status": False,
+                "message": f"At most {settings.BATCH_MAX_OPERATIONS} operations",
+            },
+            status.HTTP_400_BAD_REQUEST,
+        )
+    runner = Batch(operations, context={"request": request})
+    if not runner.run():
+        return Response(
+            {
+                "status": False,
+                "message": runner.message or "No operation was applied",
+                "data": runner.results,
+            },
+            status.HTTP_400_BAD_REQUEST,
+        )
+    return Response({"status": True, "data": runner.results})
+
+
+def flight_filter(params):
+    """
+    Filter of the export and bulk endpoints: a departure datetime range
+    (`start`, `end`), departure / arrival ICAO and aircraft serial number.
+    """
+    query = Q()
+    if params.get("start"):
+        query &= Q(departure_dt__gte=format_datetime_str(params["start"]))
+    if params.get("end"):
+        query &= Q(departure_dt__lte=format_datetime_str(params["end"]))
+    if params.get("dept"):
+        query &= Q(departure__icao__iexact=params["dept"])
+    if params.get("arr"):
+        query &= Q(arrival__icao__iexact=params["arr"])
+    if params.get("aircraft"):
+        query &= Q(aircraft__serial_number__iexact=params["aircraft"])
+    return query
+
+
+@api_view(["PUT", "DELETE"])
+@permission_classes([IsAdmin])
+def flight_bulk(request):
+    """
+    Set the status of (PUT) or delete (DELETE) every flight matching the
+    filter params of `flight_filter`, each with a single statement.
+    """
+    try:
+        query = flight_filter(request.GET)
+    except ValueError:
+        return Response(
+            {"status": False, "message": "Invalid datetime"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    if not query:
+        return Response(
+            {"status": False, "message": "No filter Parameters Entered"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    flights = Flight.objects.filter(query)
+    if request.method == "DELETE":
+        count = bulk.delete(flights)
+        return Response(
+            {
+                "status": True,
+                "message": f"{count} flights deleted",
+                "data": {"count": count},
+            }
+        )
+    new_status = request.data.get("status") if isinstance(request.data, dict) else None
+    if new_status not in STATUSES:
+        return Response(
+            {"status": False, "message": "Invalid status"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    if new_status != "cancelled" and reinstating_conflicts(flights):
+        return Response(
+            {
+                "status": False,
+                "message": "Reinstating cancelled flights would double book an aircraft",
+            },
+            status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        count = bulk.update_status(flights, new_status)
+    except IntegrityError:
+        # a concurrent write booked one of the aircraft in the meantime
+        return conflicting_booking()
+    return Response(
+        {
+            "status": True,
+            "message": f"{count} flights updated",
+            "data": {"count": count},
+        }
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsUser | IsAdmin])
+def flight_export(request):
+    """
+    Stream flights as NDJSON or CSV (`?fmt=`), optionally filtered by the
+    params of `flight_filter`.
+    """
+    fmt = request.GET.get("fmt", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        return Response(
+            {"status": False, "message": "Invalid export format"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        query = flight_filter(request.GET)
+    except ValueError:
+        return Response(
+            {"status": False, "message": "Invalid datetime"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+    flights = Flight.objects.filter(query).order_by("departure_dt", "uid")
+    render, content_type = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(
+        render(export_rows(flights, settings.EXPORT_CHUNK_SIZE)),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f'attachment; filename="flights.{fmt}"'
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsUser | IsAdmin])
+def flight_changes(request):
+    """
+    Page of the flight change log after the `after` cursor, optionally for
+    one `airport` or `aircraft`. `next` is the cursor of the following page.
+    """
+    try:
+        subscription = feed.Subscription.from_params(request.GET)
+        page_size = KeysetPagination().get_page_size(request)
+    except feed.FeedError as e:
+        return Response({"status": False, "message": str(e)}, e.status)
+    except InvalidCursor as e:
+        return Response(
+            {"status": False, "message": str(e)}, status.HTTP_400_BAD_REQUEST
+        )
+    changes = list(subscription.queryset()[:page_size])
+    ser = FlightChangeSerializer(changes, many=True)
+    after = changes[-1].id if changes else subscription.after
+    return Response({"status": True, "data": ser.data, "next": after})
+
+
+@require_GET
+def flight_changes_stream(request):
+    """
+    Stream of the flight change log as Server-Sent Events. This view holds a
+    thread per subscriber, under ASGI core/asgi.py serves the path instead.
+    """
+    try:
+        feed.authenticate(
+            request.headers.get("Authorization"), request.GET.get("token")
+        )
+        subscription = feed.Subscription.from_params(
+            request.GET, request.headers.get("Last-Event-ID")
+        )
+    except feed.FeedError as e:
+        return JsonResponse({"status": False, "message": str(e)}, status=e.status)
+    response = StreamingHttpResponse(
+        feed.stream(subscription), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def metrics(request):
+    """Request metrics of this process, in the Prometheus text format."""
+    return HttpResponse(registry.render(), content_type=METRICS_CONTENT_TYPE)
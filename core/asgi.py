@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once the app registry is ready, serves the flight change feed
+# without holding a thread per subscriber
+from app.asgi import FeedRouter  # noqa: E402
+
+application = FeedRouter(django_application)
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "app.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -89,17 +90,100 @@ DATABASES = {
 
 USER_ID_FIELD = "uid"
 
+# Cache shared by every process (reference cache, versions of the in-memory
+# indexes, ETag clocks). Multi process deployments must set REDIS_URL, the
+# default in-memory cache is private to each process.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+
+# Default number of rows per page on the list endpoints
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+
+# Airport and aircraft lookups cache (seconds / entries per process)
+REFERENCE_CACHE_TTL = int(os.getenv("REFERENCE_CACHE_TTL", "300"))
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "4096"))
+
+# Rows inserted per transaction by the bulk flight import
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+# Days ahead recurring schedules are expanded into flights for, see
+# `python manage.py materialize_schedules`
+SCHEDULE_HORIZON_DAYS = int(os.getenv("SCHEDULE_HORIZON_DAYS", "14"))
+# Days ahead searches generate the occurrences past the horizon for
+SCHEDULE_SEARCH_DAYS = int(os.getenv("SCHEDULE_SEARCH_DAYS", "365"))
+
+# Upper bound on the operations of a batch request
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "1000"))
+
+# Rows fetched per round trip by the streaming flight export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# Serialize flight lists from `.values()` rows instead of model serializers
+FAST_READ_PATH = os.getenv("FAST_READ_PATH", "TRUE") == "TRUE"
+
+# Upper bound on the airports returned by the nearby airport search
+NEARBY_MAX_RESULTS = int(os.getenv("NEARBY_MAX_RESULTS", "100"))
+
+# Upper bound on the suggestions returned by the autocomplete endpoints
+AUTOCOMPLETE_MAX_RESULTS = int(os.getenv("AUTOCOMPLETE_MAX_RESULTS", "10"))
+
+# Flight change feed: seconds between polls of the change log, between
+# keepalive comments and during which skipped ids are read again, changes
+# read per query and changes queued for a subscriber before it is dropped
+FEED_POLL_INTERVAL = float(os.getenv("FEED_POLL_INTERVAL", "1"))
+FEED_HEARTBEAT = float(os.getenv("FEED_HEARTBEAT", "15"))
+FEED_GAP_TIMEOUT = float(os.getenv("FEED_GAP_TIMEOUT", "10"))
+FEED_BATCH_SIZE = int(os.getenv("FEED_BATCH_SIZE", "500"))
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "1000"))
+
+# Serve the read-only endpoints with the async views of app/async_views.py,
+# for ASGI deployments (core/asgi.py)
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "FALSE") == "TRUE"
+
+# Route search: default minimum connection time in minutes, the upper
+# bounds on the legs per itinerary and the itineraries per search, and how
+# many hours back departed flights are kept in the timetable. Every worker
+# keeps the timetable in memory, one sorted list per departure day; a flight
+# write copies the lists of the days it touches in each worker, so its cost
+# grows with the flights per day and not with the history kept
+ROUTE_MIN_CONNECTION = int(os.getenv("ROUTE_MIN_CONNECTION", "45"))
+ROUTE_MAX_LEGS = int(os.getenv("ROUTE_MAX_LEGS", "4"))
+ROUTE_MAX_RESULTS = int(os.getenv("ROUTE_MAX_RESULTS", "10"))
+ROUTE_HISTORY_HOURS = int(os.getenv("ROUTE_HISTORY_HOURS", "24"))
+
+# Per view latency, query count and database / serialization time metrics
+# served at /api/metrics/, and the duration in milliseconds over which a
+# request is logged with its queries and their stacks (0 disables the log)
+METRICS = os.getenv("METRICS", "TRUE") == "TRUE"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+# Seconds / entries per process of the cached active flag and role of the
+# users, checked against the role claim of their JWTs instead of loading them
+AUTH_STATE_TTL = int(os.getenv("AUTH_STATE_TTL", "30"))
+AUTH_STATE_CACHE_SIZE = int(os.getenv("AUTH_STATE_CACHE_SIZE", "10000"))
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "app.authentication.StatelessJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "app.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=5),
     "USER_ID_FIELD": "uid",
+    "TOKEN_OBTAIN_SERIALIZER": "app.authentication.RoleTokenObtainPairSerializer",
+    "TOKEN_USER_CLASS": "app.authentication.TokenUser",
 }
 
 
@@ -127,8 +211,6 @@ TIME_ZONE = "UTC"
 
 USE_I18N = True
 
-USE_L10N = True
-
 USE_TZ = True
 
 